@@ -0,0 +1,5 @@
+"""
+Benchmarks for the Product service
+
+Each module can be run on its own with python -m benchmarks.<module>
+"""
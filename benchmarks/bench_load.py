@@ -0,0 +1,322 @@
+"""
+Load test of the REST API
+
+Boots the service against a database, seeds it with flask seed-products
+and drives a mix of requests from concurrent clients, each with its own
+keep-alive connection. Reports requests/sec and p50/p95/p99 latency per
+endpoint. Results can be saved as a JSON baseline and compared with a
+later run, which fails when an endpoint regressed more than a threshold.
+
+The database is a new SQLite file unless DATABASE_URI is set, e.g. to a
+PostgreSQL database. The server is gunicorn with gunicorn.conf.py when it
+is installed, otherwise the threaded Werkzeug server; --url tests a server
+that is already running instead.
+
+Usage:
+    python -m benchmarks.bench_load --products 10000 --clients 16 --duration 20 --save baseline.json
+    python -m benchmarks.bench_load --mix list=20,get=60,create=10,update=5,delete=5 --compare baseline.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+
+ENDPOINTS = {
+    "list": "GET /products",
+    "get": "GET /products/<id>",
+    "create": "POST /products",
+    "update": "PUT /products/<id>",
+    "delete": "DELETE /products/<id>",
+}
+DEFAULT_MIX = "list=20,get=50,create=15,update=10,delete=5"
+PERCENTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+HEADERS = {"Content-Type": "application/json", "Accept-Encoding": "identity"}
+
+
+def parse_mix(text: str) -> dict:
+    """Parses name=weight pairs of the request mix"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}, use {', '.join(ENDPOINTS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(times: list, fraction: float) -> float:
+    """Returns a percentile of sorted times"""
+    return times[min(len(times) - 1, int(len(times) * fraction))] if times else 0.0
+
+
+def product_body(rng: random.Random) -> bytes:
+    """Returns the JSON of a new Product"""
+    return json.dumps({
+        "name": f"load test {rng.randrange(1_000_000)}",
+        "description": "created by the load test",
+        "price": f"{rng.uniform(1, 500):.2f}",
+        "available": rng.random() < 0.8,
+        "category": rng.choice(["CLOTHS", "FOOD", "HOUSEWARES", "AUTOMOTIVE", "TOOLS"]),
+    }).encode("utf-8")
+
+
+class Client(threading.Thread):
+    """Sends requests of the mix on one connection until the deadline"""
+
+    def __init__(self, number: int, url: str, mix: dict, ids: list, warmup_end: float, deadline: float):
+        super().__init__(daemon=True)
+        self.rng = random.Random(number)
+        self.address = urlsplit(url)
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.ids = ids
+        self.warmup_end = warmup_end
+        self.deadline = deadline
+        self.created = []
+        self.connection = None
+        self.times = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+
+    def request(self, method: str, path: str, body: bytes = None) -> tuple:
+        """Sends a request, reconnecting when the server closed the connection"""
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.address.hostname, self.address.port, timeout=30)
+            try:
+                self.connection.request(method, path, body, HEADERS)
+                response = self.connection.getresponse()
+                data = response.read()
+                if response.will_close:
+                    self.connection.close()
+                    self.connection = None
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+        return None, None
+
+    def create(self) -> int:
+        """Creates a Product of this client and returns its status"""
+        status, data = self.request("POST", "/products", product_body(self.rng))
+        if status == 201:
+            self.created.append(json.loads(data)["id"])
+        return status
+
+    def send(self, name: str) -> bool:
+        """Sends one request of an endpoint and checks its status"""
+        if name == "list":
+            return self.request("GET", "/products")[0] == 200
+        if name == "get":
+            return self.request("GET", f"/products/{self.rng.choice(self.ids)}")[0] == 200
+        if name == "create":
+            return self.create() == 201
+        if name == "update":
+            product_id = self.rng.choice(self.ids)
+            return self.request("PUT", f"/products/{product_id}", product_body(self.rng))[0] == 200
+        # only the Products of this client are deleted, so the others never see a 404
+        return self.request("DELETE", f"/products/{self.created.pop()}")[0] == 204
+
+    def run(self):
+        while True:
+            name = self.rng.choices(self.names, self.weights)[0]
+            if name == "delete" and not self.created:
+                self.create()
+            start = time.perf_counter()
+            if start >= self.deadline:
+                break
+            try:
+                ok = self.send(name)
+            except (http.client.HTTPException, OSError):
+                ok = False
+            if start >= self.warmup_end:
+                self.times[name].append(time.perf_counter() - start)
+                self.errors[name] += not ok
+        if self.connection is not None:
+            self.connection.close()
+
+
+def free_port() -> int:
+    """Returns a port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def flask_command(*args) -> list:
+    """Returns the command line of a flask command of the service"""
+    return [sys.executable, "-m", "flask", "--app", "service:create_app", *args]
+
+
+def start_server(env: dict, port: int, server: str) -> subprocess.Popen:
+    """Starts the service in a new process"""
+    if server == "gunicorn":
+        command = ["gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}", "service:app"]
+    else:
+        command = flask_command("run", "--port", str(port), "--with-threads", "--no-reload", "--no-debugger")
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(url: str, timeout: float = 30):
+    """Waits until the service answers /health"""
+    address = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = http.client.HTTPConnection(address.hostname, address.port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"the service did not start at {url}")
+        time.sleep(0.1)
+
+
+def sample_ids(url: str, count: int) -> list:
+    """Returns the ids of up to count Products, following the list cursor"""
+    address = urlsplit(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port, timeout=30)
+    ids = []
+    path = "/products?fields=id&limit=1000"
+    while path and len(ids) < count:
+        connection.request("GET", path, headers=HEADERS)
+        response = connection.getresponse()
+        ids.extend(product["id"] for product in json.loads(response.read()))
+        cursor = response.getheader("X-Next-Cursor")
+        path = f"/products?fields=id&limit=1000&cursor={cursor}" if cursor else None
+    connection.close()
+    return ids[:count]
+
+
+def run_load(url: str, mix: dict, clients: int, duration: float, warmup: float, ids: list) -> dict:
+    """Drives the load and returns the results per endpoint"""
+    start = time.perf_counter()
+    threads = [Client(number, url, mix, ids, start + warmup, start + warmup + duration) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for name in ENDPOINTS:
+        times = sorted(time for thread in threads for time in thread.times[name])
+        if not times:
+            continue
+        results[name] = {
+            "requests": len(times),
+            "errors": sum(thread.errors[name] for thread in threads),
+            "rps": len(times) / duration,
+            **{key: percentile(times, fraction) for key, fraction in PERCENTILES.items()},
+        }
+    every = sorted(time for thread in threads for times in thread.times.values() for time in times)
+    results["total"] = {
+        "requests": len(every),
+        "errors": sum(result["errors"] for result in results.values()),
+        "rps": len(every) / duration,
+        **{key: percentile(every, fraction) for key, fraction in PERCENTILES.items()},
+    }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns the regressions of the results against a baseline"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result["rps"] < before["rps"] * (1 - threshold):
+            regressions.append(f"{name}: {before['rps']:,.0f} -> {result['rps']:,.0f} req/sec")
+        for key in PERCENTILES:
+            if result[key] > before[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {before[key] * 1000:.1f} -> {result[key] * 1000:.1f}ms")
+    return regressions
+
+
+def report(results: dict):
+    """Prints the results per endpoint"""
+    print(f"{'endpoint':<26}{'requests':>10}{'errors':>8}{'req/sec':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, result in results.items():
+        print(
+            f"{ENDPOINTS.get(name, name):<26}{result['requests']:>10}{result['errors']:>8}{result['rps']:>10,.0f}"
+            + "".join(f"{result[key] * 1000:>9.1f}" for key in PERCENTILES)
+        )
+
+
+def main():  # pylint: disable=too-many-locals
+    """Runs the benchmark and prints a report"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10000, help="products to seed")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds of load before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"endpoint weights, {DEFAULT_MIX}")
+    parser.add_argument("--server", choices=["gunicorn", "werkzeug"],
+                        default="gunicorn" if shutil.which("gunicorn") else "werkzeug", help="server to boot")
+    parser.add_argument("--url", help="test a running service instead of booting one")
+    parser.add_argument("--save", metavar="FILE", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression that fails the comparison")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        url = args.url
+        if not url:
+            env = dict(os.environ)
+            env.setdefault("DATABASE_URI", f"sqlite:///{os.path.join(directory, 'bench.db')}")
+            subprocess.run(flask_command("db-init"), env=env, check=True)
+            if args.products:
+                subprocess.run(flask_command("seed-products", "--count", str(args.products)), env=env, check=True)
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            server = start_server(env, port, args.server)
+        try:
+            wait_ready(url)
+            ids = sample_ids(url, 10000)
+            if not ids:
+                parser.error("there are no products to read, seed some with --products")
+            print(f"{args.clients} clients for {args.duration:.0f}s against {args.server if server else url}")
+            results = run_load(url, args.mix, args.clients, args.duration, args.warmup, ids)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    report(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({
+                "settings": {
+                    "products": args.products, "clients": args.clients, "duration": args.duration,
+                    "mix": args.mix, "server": args.server if server else url, "python": platform.python_version(),
+                },
+                "results": results,
+            }, file, indent=2)
+        print(f"saved the results to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions above {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark of the model layer
+
+Times the hot paths of service/models.py one at a time: serialize(),
+deserialize(), Category lookups, the Decimal parsing of find_by_price and
+every find_by_* query on an in-memory SQLite database of each size. The
+databases are filled by the seeder with a fixed seed and the queries look
+for values of known rows, so every run times the same work.
+
+Each case is run enough times to take at least 0.2 seconds, like timeit,
+and the median and best of several such samples are reported. The report
+can be saved as JSON to track over time, and compared with a saved one.
+
+Usage:
+    python -m benchmarks.bench_models --sizes 1000,100000,1000000 --save models.json
+    python -m benchmarks.bench_models --sizes 1000 --compare models.json --threshold 0.1
+"""
+import gc
+import os
+import sys
+import json
+import timeit
+import sqlite3
+import logging
+import argparse
+import platform
+import statistics
+from decimal import Decimal
+
+# the configuration is read on import, the cases always run on in-memory SQLite
+os.environ["DATABASE_URI"] = "sqlite:///:memory:"
+
+# pylint: disable=wrong-import-position
+from service import create_app  # noqa: E402
+from service.models import Category, Product, db, to_price  # noqa: E402
+from service.common import seeder  # noqa: E402
+
+SEED = 42
+
+
+def measure(function, samples: int) -> dict:
+    """Returns the median and best seconds per call of function"""
+    timer = timeit.Timer(function)
+    number, elapsed = timer.autorange()
+    # a single call that is slow already is not repeated as often
+    samples = samples if elapsed < 2 else 2
+    times = [elapsed / number] + [total / number for total in timer.repeat(samples - 1, number)]
+    return {"calls": number * samples, "median": statistics.median(times), "best": min(times)}
+
+
+def cpu_cases(product: Product) -> dict:
+    """Returns the cases that do not depend on the size of the table"""
+    data = product.serialize()
+    return {
+        "serialize": product.serialize,
+        "serialize fields": lambda: product.serialize(("id", "name", "price")),
+        "deserialize": lambda: Product().deserialize(data),
+        "Category getattr": lambda: getattr(Category, "TOOLS"),
+        "Category[name]": lambda: Category["TOOLS"],
+        "Decimal(str)": lambda: Decimal("12.50"),
+        "to_price str": lambda: to_price("12.50"),
+        "to_price quoted": lambda: to_price('"12.50"'),
+        "to_price Decimal": lambda: to_price(Decimal("12.50")),
+    }
+
+
+def query_cases(product: Product) -> dict:
+    """Returns the finder cases, looking for the values of a known Product"""
+    name, price = product.name, str(product.price)
+    return {
+        # a hit of the read-through cache, which most reads by id are
+        "find": lambda: (Product.find(product.id), db.session.expunge_all()),
+        "find_by_name": lambda: Product.find_by_name(name).all(),
+        "find_by_price": lambda: Product.find_by_price(price).all(),
+        "find_by_availability": lambda: Product.find_by_availability(False).all(),
+        "find_by_category": lambda: Product.find_by_category(Category.TOOLS).all(),
+        "find_by_filters": lambda: Product.find_by_filters(category=Category.FOOD, available=True).all(),
+    }
+
+
+def run_cases(cases: dict, rows, samples: int, results: dict):
+    """Measures cases and prints a line for each"""
+    for label, function in cases.items():
+        gc.collect()
+        result = measure(function, samples)
+        result["rows"] = rows
+        key = label if rows is None else f"{label} @{rows}"
+        results[key] = result
+        print(f"{label:<24}{rows or '-':>10}{result['calls']:>9}{result['median'] * 1e6:>14,.1f}"
+              f"{result['best'] * 1e6:>14,.1f}{1 / result['median']:>14,.0f}", flush=True)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns the cases that got slower than a baseline by more than threshold"""
+    return [
+        f"{key}: {baseline[key]['median'] * 1e6:,.1f} -> {result['median'] * 1e6:,.1f} us"
+        for key, result in results.items()
+        if key in baseline and result["median"] > baseline[key]["median"] * (1 + threshold)
+    ]
+
+
+def main():
+    """Runs the benchmark and prints a report"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="rows of the tables, comma separated")
+    parser.add_argument("--samples", type=int, default=5, help="samples to take the median of")
+    parser.add_argument("--save", metavar="FILE", help="save the report as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="compare with a saved report")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that fails the comparison")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results = {}
+    print(f"{'case':<24}{'rows':>10}{'calls':>9}{'median us':>14}{'best us':>14}{'calls/sec':>14}")
+    for number, size in enumerate(sizes):
+        # a new in-memory database of each size, quiet so that the log is not what is timed
+        app = create_app()
+        app.logger.setLevel(logging.WARNING)
+        with app.app_context():
+            Product.create_tables(app)
+            seeder.seed_products(size, seed=SEED)
+            product = db.session.get(Product, 1)
+            if number == 0:
+                run_cases(cpu_cases(product), None, args.samples, results)
+            run_cases(query_cases(product), size, args.samples, results)
+            db.session.remove()
+            db.engine.dispose()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({
+                "settings": {"sizes": sizes, "samples": args.samples, "seed": SEED,
+                             "python": platform.python_version(), "sqlite": sqlite3.sqlite_version},
+                "results": results,
+            }, file, indent=2)
+        print(f"saved the report to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no case slower by more than {args.threshold:.0%} than {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark of the Product list serializers
+
+Compares Product.serialize() followed by jsonify() with the compiled
+row encoder of service.common.serializers, with and without orjson.
+
+Usage:
+    python -m benchmarks.bench_serializers --rows 100000
+"""
+import time
+import argparse
+from service import create_app
+from service.common.serializers import COLUMNS, ProductEncoder, orjson
+from tests.factories import ProductFactory
+
+
+def timed(function, repeat: int) -> tuple:
+    """Returns the best time of repeat runs of function and its result"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    """Runs the benchmark and prints a report"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000, help="number of products to encode")
+    parser.add_argument("--repeat", type=int, default=3, help="runs to take the best of")
+    args = parser.parse_args()
+    # only the JSON provider of the app is used, the database never is
+    app = create_app(overrides={"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "SQLALCHEMY_ENGINE_OPTIONS": {}})
+
+    products = ProductFactory.build_batch(args.rows)
+    rows = [tuple(getattr(product, name) for name in COLUMNS) for product in products]
+
+    baseline, expected = timed(
+        lambda: app.json.response([product.serialize() for product in products]).get_data(), args.repeat
+    )
+    print(f"{'serializer':<28}{'seconds':>10}{'rows/sec':>14}{'speedup':>10}")
+    print(f"{'serialize() + jsonify()':<28}{baseline:>10.3f}{args.rows / baseline:>14,.0f}{1:>10.1f}x")
+
+    backends = [("row encoder (stdlib)", False)]
+    if orjson is not None:
+        backends.append(("row encoder (orjson)", True))
+    for label, use_orjson in backends:
+        encoder = ProductEncoder(COLUMNS, use_orjson)
+        elapsed, body = timed(lambda: encoder.encode_list(rows), args.repeat)  # pylint: disable=cell-var-from-loop
+        if body != expected:
+            raise SystemExit(f"{label} output differs from jsonify()")
+        print(f"{label:<28}{elapsed:>10.3f}{args.rows / elapsed:>14,.0f}{baseline / elapsed:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark of the service startup
+
+Starts fresh interpreters, like a gunicorn worker that boots cold, and
+reports how long importing the service, creating the app and serving the
+first requests take. Cold boot is the import plus create_app().
+
+Usage:
+    python -m benchmarks.bench_startup --runs 10 --target 0.2 [--check]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Runs in every fresh interpreter and prints its timings as JSON
+CHILD = """
+import json, time
+start = time.perf_counter()
+import service
+imported = time.perf_counter()
+app = service.create_app()
+created = time.perf_counter()
+client = app.test_client()
+client.get("/health")
+health = time.perf_counter()
+client.get("/products?limit=1")
+products = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "create_app": created - imported,
+    "boot": created - start,
+    "first /health": health - created,
+    "first /products": products - health,
+}))
+"""
+
+
+def run_child(env: dict) -> dict:
+    """Times one cold start in a new interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """Runs the benchmark and prints a report"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10, help="number of cold starts")
+    parser.add_argument("--target", type=float, default=0.2, help="cold boot target in seconds")
+    parser.add_argument("--check", action="store_true", help="exit with an error when the target is missed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URI", f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        # the tables are created once, as a deployment would before starting workers
+        subprocess.run(
+            [sys.executable, "-m", "flask", "--app", "service:create_app", "db-init"], env=env, check=True
+        )
+        runs = [run_child(env) for _ in range(args.runs)]
+
+    print(f"{'phase':<20}{'median ms':>12}{'p95 ms':>10}{'max ms':>10}")
+    for phase in runs[0]:
+        times = sorted(run[phase] for run in runs)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        print(f"{phase:<20}{statistics.median(times) * 1000:>12.1f}{p95 * 1000:>10.1f}{times[-1] * 1000:>10.1f}")
+
+    boot = statistics.median(run["boot"] for run in runs)
+    verdict = "meets" if boot <= args.target else "misses"
+    print(f"cold boot {boot * 1000:.1f}ms {verdict} the {args.target * 1000:.0f}ms target")
+    if args.check and boot > args.target:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
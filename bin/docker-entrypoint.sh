@@ -0,0 +1,6 @@
+#!/bin/sh
+# Creates the missing tables before the service starts, so that a fresh
+# deploy has a schema. flask db-init never touches existing data.
+set -e
+flask db-init
+exec gunicorn "$@"
@@ -0,0 +1,129 @@
+"""
+Gunicorn Configuration
+
+gunicorn reads this file from the working directory when it starts, e.g.
+
+    gunicorn service:app
+
+Every setting can be overridden from the environment:
+
+    GUNICORN_BIND           address to listen on (0.0.0.0:$PORT)
+    WEB_CONCURRENCY         worker processes (2 x CPUs + 1, or CPUs + 1 with threads)
+    GUNICORN_MAX_WORKERS    upper bound of the automatic number of workers (16)
+    GUNICORN_THREADS        threads per worker, more than 1 selects gthread (1)
+    GUNICORN_WORKER_CLASS   worker class (sync, gthread or gevent)
+    GUNICORN_PRELOAD        load the app once in the master (true)
+    GUNICORN_MAX_REQUESTS   requests before a worker is recycled, 0 never (1000)
+    GUNICORN_MAX_REQUESTS_JITTER   random extra requests so workers do not recycle together (100)
+    GUNICORN_TIMEOUT        seconds before a silent worker is killed (30), sync
+                            workers end change streams after half of it
+    GUNICORN_KEEPALIVE      seconds to wait for the next request on a connection (5)
+    LOG_LEVEL               gunicorn log level (info)
+
+The app is loaded once in the master and forked, so the workers share its
+memory copy-on-write. Each worker then starts its own connection pool.
+"""
+import gc
+import os
+
+
+def env_flag(name: str, default: str) -> bool:
+    """Returns a boolean setting from the environment"""
+    return os.getenv(name, default).lower() in ["true", "yes", "1"]
+
+
+def cpu_count() -> int:
+    """Returns the number of CPUs this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return os.cpu_count() or 1
+
+
+# Server socket
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8080')}")
+
+# Worker processes
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync")
+if os.getenv("WEB_CONCURRENCY"):
+    workers = int(os.environ["WEB_CONCURRENCY"])
+else:
+    # threads already overlap the waits on the database
+    workers = cpu_count() + 1 if threads > 1 else cpu_count() * 2 + 1
+    workers = min(workers, int(os.getenv("GUNICORN_MAX_WORKERS", "16")))
+
+# Every thread of a worker may hold a connection, so the pool of each worker
+# needs one per thread before it overflows
+os.environ.setdefault("DB_POOL_SIZE", str(threads))
+
+# Recycle workers to bound the growth of their memory
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = timeout
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# A sync worker does not tell the master that it is alive while it serves a
+# request, so the streams of GET /products/changes end well before the
+# timeout kills it, and EventSource clients reconnect with Last-Event-ID
+if worker_class == "sync" and timeout > 0:
+    stream_timeout = min(float(os.getenv("CHANGES_STREAM_TIMEOUT", "300")), timeout / 2)
+    os.environ["CHANGES_STREAM_TIMEOUT"] = str(stream_timeout)
+
+# Logging
+loglevel = os.getenv("LOG_LEVEL", "info")
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+# Load the app in the master before forking the workers
+preload_app = env_flag("GUNICORN_PRELOAD", "true")
+if preload_app:
+    # no collections in the master, so the objects of the app are not
+    # written to and stay shared with the workers
+    gc.disable()
+
+
+######################################################################
+# S E R V E R   H O O K S
+######################################################################
+def pre_fork(server, worker):  # pylint: disable=unused-argument
+    """Moves everything the master allocated out of reach of the collector"""
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """Gives the new worker its own connections and threads"""
+    if preload_app:
+        # pylint: disable=import-outside-toplevel
+        from service.models import db, Product
+        from service.common import log_handlers
+
+        app = server.app.wsgi()
+        with app.app_context():
+            # the connections of the master must not be shared with a worker,
+            # close=False leaves them alone for the master to close
+            db.engine.dispose(close=False)
+        if Product.cache is not None:
+            Product.cache.clear()
+        log_handlers.restart_listener()
+        gc.enable()
+    if worker_class == "gevent":
+        try:
+            # lets psycopg2 wait for the database without blocking the other greenlets
+            from psycogreen.gevent import patch_psycopg  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            server.log.warning("psycogreen is not installed, database calls will block the gevent worker")
+        else:
+            patch_psycopg()
+
+
+def child_exit(server, worker):  # pylint: disable=unused-argument
+    """Folds the metrics file of a worker that exited into the archived totals"""
+    # pylint: disable=import-outside-toplevel
+    from service import config
+    from service.common import metrics
+
+    if config.METRICS_DIR:
+        metrics.archive_worker(config.METRICS_DIR, worker.pid)
@@ -20,39 +20,70 @@ Package: service
 Package for the application models and service routes
 This module creates and configures the Flask app and sets up the logging
 and SQL database
+
+Importing the package has no side effects: create_app() builds an app
+without connecting to the database, and the tables are created by the
+explicit "flask db-init" step. The default app, service.app, is only
+created when it is first used, e.g. by gunicorn "service:app".
 """
-import sys
 from flask import Flask
 from service import config
-from service.common import log_handlers
 
-# NOTE: Do not change the order of this code
-# The Flask app must be created
-# BEFORE you import modules that depend on it !!!
 
-# Create the Flask aoo
-app = Flask(__name__)  # pylint: disable=invalid-name
+def create_app(config_object=config, overrides: dict = None) -> Flask:
+    """Creates and configures the Flask app
+
+    :param config_object: the object or module to load the configuration from
+    :param overrides: settings that replace those of config_object
+
+    """
+    # Create the Flask app
+    app = Flask(__name__)  # pylint: disable=redefined-outer-name
+
+    # Load Configurations
+    app.config.from_object(config_object)
+    app.config.update(overrides or {})
+
+    # The modules are imported here so that importing the package stays cheap
+    # pylint: disable=import-outside-toplevel, cyclic-import
+    from service import routes, models
+    from service.common import error_handlers, cli_commands, log_handlers, metrics, query_stats
+    from service.common import assets, compression
+
+    app.register_blueprint(routes.api)
+    app.register_blueprint(error_handlers.errors)
+    app.register_blueprint(cli_commands.commands)
+    app.register_blueprint(assets.assets)
+
+    # Set up logging for production
+    log_handlers.init_logging(app, "gunicorn.error")
+
+    # Record request metrics for /metrics
+    metrics.init_metrics(app)
+
+    # Count the SQL statements of each request
+    query_stats.init_query_stats(app)
 
-# Load Configurations
-app.config.from_object(config)
+    # Compress the responses. The after_request hooks run in the reverse order
+    # of their registration, so this one runs before those above: the metrics
+    # record the compressed size and include the time spent compressing
+    compression.init_compression(app)
 
-# Dependencies require we import the routes AFTER the Flask app is created
-# pylint: disable=wrong-import-position, wrong-import-order, cyclic-import
-from service import routes, models        # noqa: F401, E402
-from service.common import error_handlers, cli_commands  # noqa: F401, E402
+    app.logger.info(70 * "*")
+    app.logger.info("  P E T   S E R V I C E   R U N N I N G  ".center(70, "*"))
+    app.logger.info(70 * "*")
 
-# Set up logging for production
-log_handlers.init_logging(app, "gunicorn.error")
+    # Binds the database without connecting to it, the engine
+    # only opens a connection when the first request needs one
+    models.init_db(app)
 
-app.logger.info(70 * "*")
-app.logger.info("  P E T   S E R V I C E   R U N N I N G  ".center(70, "*"))
-app.logger.info(70 * "*")
+    app.logger.info("Service initialized!")
+    return app
 
-try:
-    models.init_db(app)  # make our sqlalchemy tables
-except Exception as error:  # pylint: disable=broad-except
-    app.logger.critical("%s: Cannot continue", error)
-    # gunicorn requires exit code 4 to stop spawning workers when they die
-    sys.exit(4)
 
-app.logger.info("Service initialized!")
+def __getattr__(name: str):
+    """Creates the default app the first time service.app is used"""
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,140 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Static Assets
+
+"flask build-static" copies the static files to static/dist under names
+that carry a hash of their content, e.g. css/site.css becomes
+css/site.3f2a9c1e0b7d.css, next to gzip and brotli compressed copies, and
+points index.html at them. Fingerprinted files never change, so they are
+served with a Cache-Control that lets browsers keep them for a year.
+"""
+import os
+import json
+import shutil
+import hashlib
+import mimetypes
+from functools import lru_cache
+from flask import Blueprint, abort, send_from_directory
+from flask import current_app as app
+from service.common.compression import ENCODINGS, compress, negotiate
+
+# The files of static/dist are served by this blueprint instead of the static route
+assets = Blueprint("assets", __name__)
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+INDEX = "index.html"
+
+# File name extensions of the precompressed copies
+EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+
+# Types that are already compressed
+COMPRESSED_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp")
+
+
+def fingerprint(path: str) -> str:
+    """Returns the name of a file with a hash of its content, e.g. css/site.3f2a9c1e0b7d.css"""
+    with open(path, "rb") as file:
+        digest = hashlib.sha256(file.read()).hexdigest()[:12]
+    root, extension = os.path.splitext(path)
+    return f"{root}.{digest}{extension}"
+
+
+def write_file(path: str, data: bytes):
+    """Writes a file and its precompressed copies"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+    if mimetypes.guess_type(path)[0] in COMPRESSED_TYPES:
+        return
+    for encoding in ENCODINGS:
+        with open(path + EXTENSIONS[encoding], "wb") as file:
+            file.write(compress(data, encoding, level=9, quality=11))
+
+
+def build(static_folder: str) -> dict:
+    """Fingerprints and precompresses the static files and returns the manifest"""
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {}
+    for directory, subdirectories, files in os.walk(static_folder):
+        subdirectories[:] = [name for name in subdirectories if os.path.join(directory, name) != dist]
+        for name in files:
+            path = os.path.relpath(os.path.join(directory, name), static_folder)
+            if path == INDEX:
+                continue
+            target = fingerprint(os.path.join(static_folder, path))
+            target = os.path.relpath(target, static_folder).replace(os.sep, "/")
+            manifest[path.replace(os.sep, "/")] = target
+            with open(os.path.join(static_folder, path), "rb") as file:
+                write_file(os.path.join(dist, target), file.read())
+
+    # the page keeps its name, its references get the fingerprinted ones
+    with open(os.path.join(static_folder, INDEX), encoding="utf-8") as file:
+        html = file.read()
+    for path, target in manifest.items():
+        html = html.replace(f'"static/{path}"', f'"static/{DIST}/{target}"')
+    write_file(os.path.join(dist, INDEX), html.encode("utf-8"))
+
+    with open(os.path.join(dist, MANIFEST), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+@lru_cache(maxsize=None)
+def is_built(static_folder: str) -> bool:
+    """Checks if the assets of a static folder were built"""
+    return os.path.exists(os.path.join(static_folder, DIST, MANIFEST))
+
+
+def send_asset(filename: str, max_age: int = None):
+    """Sends a built asset in the best precompressed encoding the client accepts"""
+    directory = os.path.join(app.static_folder, DIST)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encoding = negotiate(tuple(
+        encoding for encoding in ENCODINGS
+        if os.path.isfile(os.path.join(directory, filename + EXTENSIONS[encoding]))
+    ))
+    path = filename + EXTENSIONS[encoding] if encoding else filename
+    response = send_from_directory(directory, path, mimetype=mimetype, max_age=max_age)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+######################################################################
+# S E R V E   B U I L T   A S S E T S
+######################################################################
+@assets.route(f"/static/{DIST}/<path:filename>")
+def fingerprinted(filename):
+    """Serves a fingerprinted asset that browsers may keep forever"""
+    if filename in (MANIFEST, INDEX):
+        abort(404)
+    response = send_asset(filename, max_age=app.config.get("ASSET_MAX_AGE", 31536000))
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def send_index():
+    """Sends the home page, the built one when there is one"""
+    if is_built(app.static_folder):
+        # the page keeps its name, so browsers have to revalidate it
+        return send_asset(INDEX, max_age=0)
+    return app.send_static_file(INDEX)
@@ -0,0 +1,125 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Cache
+
+This module contains a small in-process cache used to keep hot rows
+out of the database. Any object with the same get / set / delete / clear /
+generation methods can be used in its place.
+
+A reader that misses takes a generation() before it reads the database and
+passes it to set(), which drops the value if the key was deleted since: the
+row it read may be older than the write that deleted the key, and storing it
+would serve the old row until it expires.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A thread-safe cache bounded by size with LRU eviction and a time-to-live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, timer=time.monotonic):
+        """
+        :param maxsize: the most entries to keep, 0 disables the cache
+        :param ttl: the number of seconds an entry stays valid
+        :param timer: the clock used to expire entries
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = OrderedDict()
+        # the generation of the last delete of each key, as many as there are
+        # entries, and the newest one that was forgotten
+        self._generation = 0
+        self._deleted = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Returns the value stored under key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires <= self._timer():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self) -> int:
+        """Returns the generation to pass to set() for a value about to be read"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, since: int = None):
+        """Stores a value, evicting the least recently used entries when full
+
+        :param since: the generation() taken before the value was read, the
+            value is not stored if the key was deleted after it
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if since is not None and (since < self._forgotten or self._deleted.get(key, -1) > since):
+                return
+            self._entries[key] = (value, self._timer() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Removes the entry stored under key if there is one"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+            self._deleted[key] = self._generation
+            self._deleted.move_to_end(key)
+            while len(self._deleted) > max(self.maxsize, 1):
+                self._forgotten = self._deleted.popitem(last=False)[1]
+
+    def clear(self):
+        """Removes every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._deleted.clear()
+            self._forgotten = self._generation
+
+    def stats(self) -> dict:
+        """Returns the counters of this cache"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,136 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Change Feed
+
+This module wakes up the Server-Sent Event streams of GET /products/changes
+when Products change. Every change is a row of the product_change table
+whose id is its sequence number, written by a trigger in the statement of
+the change, so a stream only has to be told that something changed and
+then reads the rows past the last sequence number it sent.
+
+The worker that made a change wakes its own streams when it commits. On
+PostgreSQL the trigger also sends a NOTIFY, and one thread per worker
+process LISTENs and wakes the streams of that worker, so the changes of
+every gunicorn worker reach every stream. Other databases have no such
+channel: there the streams of other workers see a change when they check
+the table at their next heartbeat.
+"""
+import os
+import select
+import logging
+import threading
+
+logger = logging.getLogger("flask.app")
+
+# The PostgreSQL channel of the NOTIFY of every change
+CHANNEL = "product_changes"
+
+# Seconds the listener waits before it connects again after an error
+RECONNECT_DELAY = 5
+
+
+class ChangeNotifier:
+    """Lets the streams of this process wait for the next change"""
+
+    def __init__(self):
+        # counts the commits of changes, so that one published while a
+        # stream reads the table is not missed
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def publish(self):
+        """Wakes up the streams waiting for changes"""
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation: int, timeout: float) -> bool:
+        """Waits until a change is published after generation
+
+        :return: False if there was none before the timeout
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.generation != generation, timeout)
+
+
+notifier = ChangeNotifier()
+
+
+class ListenerState:  # pylint: disable=too-few-public-methods
+    """The LISTEN thread and the process it was started in"""
+
+    def __init__(self):
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+
+# The listener of this process, see start_listener()
+LISTENER_STATE = ListenerState()
+
+
+def can_listen(engine) -> bool:
+    """Checks if the database of an engine sends notifications"""
+    return engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+
+def start_listener(engine):
+    """Starts the LISTEN thread of this process once, if the database has one"""
+    if not can_listen(engine):
+        return
+    state = LISTENER_STATE
+    with state.lock:
+        # a forked gunicorn worker does not inherit the thread of its parent
+        if state.thread is not None and state.pid == os.getpid() and state.thread.is_alive():
+            return
+        state.thread = threading.Thread(target=listen, args=(engine,), name="change-listener", daemon=True)
+        state.pid = os.getpid()
+        state.thread.start()
+
+
+def listen(engine):
+    """Publishes the notifications of the channel, connecting again after errors"""
+    while True:
+        proxy = None
+        try:
+            # a connection of its own, taken out of the pool for good
+            proxy = engine.raw_connection()
+            proxy.detach()
+            connection = proxy.dbapi_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            logger.info("Listening for product changes on %s", CHANNEL)
+            while True:
+                # blocks on the socket until a notification arrives, without polling the database
+                if select.select([connection], [], [], 60) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    connection.notifies.pop(0)
+                    notifier.publish()
+        except Exception as error:  # pylint: disable=broad-except
+            logger.warning("Change listener failed, connecting again in %ds: %s", RECONNECT_DELAY, error)
+            if proxy is not None:
+                proxy.close()
+            threading.Event().wait(RECONNECT_DELAY)
+
+
+def format_event(seq: int, action: str, data: str) -> str:
+    """Returns a change as a Server-Sent Event, data being a line of JSON"""
+    return f"id: {seq}\nevent: {action}\ndata: {data}\n\n"
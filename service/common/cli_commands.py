@@ -1,15 +1,22 @@
 """
 Flask CLI Command Extensions
 """
-from service import app
-from service.models import db
+import json
+from datetime import timedelta
+import click
+from flask import Blueprint, current_app
+from service.models import db, DataValidationError, ProductChange, db_utcnow
+from service.common import assets, exporter, importer, seeder
+
+# The commands are added to the flask command itself, not to a group
+commands = Blueprint("commands", __name__, cli_group=None)
 
 
 ######################################################################
 # Command to force tables to be rebuilt
 # Usage: flask db-create
 ######################################################################
-@app.cli.command("db-create")
+@commands.cli.command("db-create")
 def db_create():
     """
     Recreates a local database. You probably should not use this on
@@ -18,3 +25,123 @@ def db_create():
     db.drop_all()
     db.create_all()
     db.session.commit()
+
+
+######################################################################
+# Command to create the tables that do not exist yet
+# Usage: flask db-init
+######################################################################
+@commands.cli.command("db-init")
+def db_init():
+    """
+    Creates the missing tables and indexes without touching existing
+    data. Run it once before starting the service.
+    """
+    db.create_all()
+
+
+######################################################################
+# Command to fingerprint and precompress the static files
+# Usage: flask build-static
+######################################################################
+@commands.cli.command("build-static")
+def build_static():
+    """
+    Writes fingerprinted and precompressed copies of the static files
+    to static/dist. Run it when building the image.
+    """
+    manifest = assets.build(current_app.static_folder)
+    click.echo(f"Built {len(manifest)} assets")
+
+
+######################################################################
+# Command to load a catalog file
+# Usage: flask load-products products.csv
+######################################################################
+@commands.cli.command("load-products")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(importer.FORMATS), help="Defaults to the file extension.")
+@click.option("--batch-size", default=5000, show_default=True, help="Rows written per transaction.")
+@click.option("--workers", default=1, show_default=True, help="Processes that load parts of the file.")
+@click.option("--rejects", "rejects_path", type=click.Path(dir_okay=False), help="Write the rejected records here.")
+def load_products(path, file_format, batch_size, workers, rejects_path):
+    """
+    Loads Products from a CSV file with a header row or a JSON Lines file,
+    optionally gzipped. Invalid records are reported and skipped.
+    """
+    def progress(stats):
+        click.echo(f"{stats.loaded} loaded, {stats.rejected} rejected, {stats.rate:,.0f} rows/sec", err=True)
+
+    try:
+        stats = importer.load_file(path, file_format, batch_size, workers, progress)
+    except DataValidationError as error:
+        raise click.UsageError(str(error)) from error
+    for item in stats.rejects:
+        click.echo(f"line {item['line']}: {item['message']}", err=True)
+    if stats.rejected > len(stats.rejects):
+        click.echo(f"... and {stats.rejected - len(stats.rejects)} more", err=True)
+    if rejects_path:
+        with open(rejects_path, "w", encoding="utf-8") as file:
+            for item in stats.rejects:
+                file.write(json.dumps(item) + "\n")
+    click.echo(f"Loaded {stats.loaded} products, rejected {stats.rejected}")
+
+
+######################################################################
+# Command to export the Products to a file
+# Usage: flask export-products products.jsonl
+######################################################################
+@commands.cli.command("export-products")
+@click.argument("path", type=click.Path(dir_okay=False))
+@click.option("--format", "file_format", type=click.Choice(exporter.FORMATS), default="jsonl", show_default=True)
+@click.option("--workers", default=1, show_default=True, help="Processes that export id ranges.")
+@click.option("--batch-size", default=10000, show_default=True, help="Rows fetched at a time.")
+@click.option("--gzip", "compress", is_flag=True, help="Compress the file with gzip.")
+def export_products(path, file_format, workers, batch_size, compress):
+    """
+    Exports every Product to a CSV, JSON Lines or columnar file.
+    """
+    def progress(stats):
+        click.echo(f"{stats.rows} exported, {stats.rate:,.0f} rows/sec", err=True)
+
+    stats = exporter.export_file(path, file_format, workers, batch_size, compress, progress)
+    click.echo(f"Exported {stats.rows} products in {stats.seconds:.2f}s, {stats.rate:,.0f} rows/sec")
+
+
+######################################################################
+# Command to fill the database with synthetic Products
+# Usage: flask seed-products --count 1000000
+######################################################################
+@commands.cli.command("seed-products")
+@click.option("--count", default=10000, show_default=True, help="Products to create.")
+@click.option("--seed", default=42, show_default=True, help="The same seed makes the same catalog.")
+@click.option("--skew", default=1.0, show_default=True, type=click.FloatRange(min=0),
+              help="Zipf exponent of categories and names, 0 for uniform.")
+@click.option("--available", "available_ratio", default=0.8, show_default=True, type=click.FloatRange(0, 1),
+              help="Share of the Products that are available.")
+@click.option("--batch-size", default=10000, show_default=True, help="Rows written per transaction.")
+@click.option("--workers", default=1, show_default=True, help="Processes that write batches.")
+def seed_products(count, seed, skew, available_ratio, batch_size, workers):
+    """
+    Creates synthetic Products for load and scale tests.
+    """
+    def progress(stats):
+        click.echo(f"{stats.rows} seeded, {stats.rate:,.0f} rows/sec", err=True)
+
+    stats = seeder.seed_products(count, seed, skew, available_ratio, batch_size, workers, progress)
+    click.echo(f"Seeded {stats.rows} products in {stats.seconds:.2f}s, {stats.rate:,.0f} rows/sec")
+
+
+######################################################################
+# Command to delete the old changes of the change feed
+# Usage: flask prune-changes --days 7
+######################################################################
+@commands.cli.command("prune-changes")
+@click.option("--days", default=7.0, show_default=True, help="Keep the changes of this many days.")
+def prune_changes(days):
+    """
+    Deletes the changes of GET /products/changes older than some days.
+    Clients that were away longer cannot resume and should list again.
+    """
+    count = ProductChange.prune(db_utcnow() - timedelta(days=days))
+    click.echo(f"Pruned {count} changes")
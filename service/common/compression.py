@@ -0,0 +1,119 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Response Compression
+
+This module compresses the responses of the service with gzip, or with
+brotli when it is installed and the client prefers it. Bodies smaller than
+COMPRESS_MIN_SIZE bytes are sent as they are, and streamed bodies are
+compressed as they are sent, flushed after every chunk so clients can
+decode the rows that arrived so far. A stream should yield chunks of
+many rows, as every flush costs a few bytes and some of the compression.
+"""
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# The encodings in the order the service prefers them
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(encodings: tuple = ENCODINGS) -> str:
+    """Returns the best encoding the client accepts, or None"""
+    accepted = request.accept_encodings
+    best = None
+    for encoding in encodings:
+        quality = accepted[encoding]
+        if quality and (best is None or quality > accepted[best]):
+            best = encoding
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int = 6, quality: int = 4) -> bytes:
+    """Compresses a whole body"""
+    if encoding == "br":
+        return brotli.compress(data, quality=quality)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compressor(encoding: str, level: int = 6, quality: int = 4) -> tuple:
+    """Returns the compress, sync flush and finish functions of a stream compressor"""
+    if encoding == "br":
+        stream = brotli.Compressor(quality=quality)
+        return stream.process, stream.flush, stream.finish
+    stream = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return stream.compress, lambda: stream.flush(zlib.Z_SYNC_FLUSH), stream.flush
+
+
+def compress_stream(chunks, encoding: str, level: int = 6, quality: int = 4):
+    """Compresses the chunks of a streamed body as they are produced, flushing each one"""
+    process, flush, finish = compressor(encoding, level, quality)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            yield process(chunk) + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def init_compression(app):
+    """Compresses the responses of the app that are worth it"""
+    mimetypes = set(app.config.get("COMPRESS_MIMETYPES", ()))
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 1024)
+    level = app.config.get("COMPRESS_LEVEL", 6)
+    quality = app.config.get("BROTLI_QUALITY", 4)
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in mimetypes and response.status_code != 304:
+            return response
+        encoding = negotiate()
+        if response.status_code == 304:
+            # a 304 carries the validator of the body the client would get
+            if encoding and "Content-Encoding" not in response.headers:
+                weaken_etag(response)
+            return response
+        response.vary.add("Accept-Encoding")
+        if (encoding is None or response.direct_passthrough or "Content-Encoding" in response.headers
+                or response.status_code < 200 or response.status_code == 204):
+            return response
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, level, quality)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(compress(data, encoding, level, quality))
+        response.headers["Content-Encoding"] = encoding
+        weaken_etag(response)
+        return response
+
+
+def weaken_etag(response):
+    """Marks the ETag weak, as the compressed bytes differ from the identity ones"""
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
@@ -0,0 +1,196 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Product Exporter
+
+This module writes the product table to a file for "flask export-products"
+in one of these formats:
+
+    csv       a header row then one row per Product, readable by load-products
+    jsonl     one Product per line, the same JSON as the REST API
+    columns   JSON Lines of blocks of rows, each an object of column arrays,
+              which compresses far better than rows do
+
+Rows are read in id order from a server-side cursor a batch at a time, so
+memory does not grow with the table. With several workers the id space
+is split into ranges that worker processes write to part files, which are
+then joined in order. Gzipped parts join into a valid gzip file.
+"""
+import io
+import os
+import csv
+import gzip
+import json
+import time
+import shutil
+import logging
+from sqlalchemy import func, select
+from service.models import Product, db
+from service.common.serializers import COLUMNS, ProductEncoder
+from service.common.workers import is_shared_database, run_parallel
+
+logger = logging.getLogger("flask.app")
+
+FORMATS = ("csv", "jsonl", "columns")
+
+# Ranges per worker, so that a dense range does not leave the other workers idle
+RANGES_PER_WORKER = 4
+
+
+class ExportStats:
+    """The rows an export wrote and how fast"""
+
+    def __init__(self):
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        """Returns the time the export has taken so far"""
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Returns the rows written per second so far"""
+        return self.rows / max(self.seconds, 1e-9)
+
+
+def to_csv(row) -> tuple:
+    """Returns the CSV values of a row, the way load-products reads them"""
+    product_id, name, description, price, available, category = row
+    return product_id, name, description, str(price), "true" if available else "false", category.name
+
+
+def encode_batch(rows: list, file_format: str, encoder: ProductEncoder) -> bytes:
+    """Returns a batch of rows in a format"""
+    if file_format == "jsonl":
+        return b"".join(encoder.encode_line(row) for row in rows)
+    if file_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(to_csv(row) for row in rows)
+        return buffer.getvalue().encode("utf-8")
+    columns = {name: [] for name in COLUMNS}
+    for row in rows:
+        for name, value in zip(COLUMNS, to_csv(row)):
+            columns[name].append(value)
+    columns["available"] = [value == "true" for value in columns["available"]]
+    return (json.dumps(columns, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def header(file_format: str) -> bytes:
+    """Returns what a file of a format starts with"""
+    if file_format == "csv":
+        return (",".join(COLUMNS) + "\r\n").encode("utf-8")
+    return b""
+
+
+def open_output(path: str, compress: bool):
+    """Opens a file to write, gzipped if asked"""
+    if compress:
+        return gzip.open(path, "wb", compresslevel=6)
+    return open(path, "wb")  # pylint: disable=consider-using-with
+
+
+def id_ranges(parts: int) -> list:
+    """Splits the ids of the table into inclusive ranges of about the same width"""
+    low, high = db.session.execute(select(func.min(Product.id), func.max(Product.id))).one()
+    if low is None:
+        return []
+    width = max((high - low + parts) // parts, 1)
+    return [(start, min(start + width - 1, high)) for start in range(low, high + 1, width)]
+
+
+def write_range(file, file_format: str, low: int = None, high: int = None, batch_size: int = 10000,
+                progress=None, stats: ExportStats = None) -> int:
+    """Writes the Products with ids in [low, high] to an open file and returns how many"""
+    statement = select(*(getattr(Product, name) for name in COLUMNS)).order_by(Product.id)
+    if low is not None:
+        statement = statement.where(Product.id.between(low, high))
+    encoder = ProductEncoder.for_fields(COLUMNS, False)
+    count = 0
+    # yield_per streams from a server-side cursor where the database has one
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        file.write(encode_batch(rows, file_format, encoder))
+        count += len(rows)
+        if stats is not None:
+            stats.rows += len(rows)
+            if progress:
+                progress(stats)
+    result.close()
+    return count
+
+
+def export_part(path: str, file_format: str, low: int, high: int, batch_size: int, compress: bool) -> int:
+    """Writes one id range to a part file in a worker process"""
+    with open_output(path, compress) as file:
+        count = write_range(file, file_format, low, high, batch_size)
+    logger.info("Worker %d wrote %d rows with ids %d to %d", os.getpid(), count, low, high)
+    return count
+
+
+def export_file(path: str, file_format: str = "jsonl", workers: int = 1, batch_size: int = 10000,
+                compress: bool = False, progress=None) -> ExportStats:
+    """Exports every Product to a file
+
+    :param path: the file to write
+    :param file_format: csv, jsonl or columns
+    :param workers: the number of processes that write id ranges
+    :param batch_size: the number of rows fetched and written at a time
+    :param compress: gzip the file
+    :param progress: called with the statistics as the export goes on
+
+    :return: the statistics of the export
+    :rtype: ExportStats
+
+    """
+    stats = ExportStats()
+    if workers > 1 and not is_shared_database():
+        logger.warning("Cannot export an in-memory database in parallel")
+        workers = 1
+    logger.info("Exporting Products to %s as %s with %d worker(s)", path, file_format, workers)
+
+    if workers == 1:
+        with open_output(path, compress) as file:
+            file.write(header(file_format))
+            write_range(file, file_format, batch_size=batch_size, progress=progress, stats=stats)
+        return stats
+
+    ranges = id_ranges(workers * RANGES_PER_WORKER)
+    parts = [f"{path}.part-{number:05d}" for number in range(len(ranges))]
+    tasks = [
+        (part, file_format, low, high, batch_size, compress) for part, (low, high) in zip(parts, ranges)
+    ]
+    try:
+        with open(path, "wb") as output:
+            # gzip members joined one after the other make one gzip file
+            start = header(file_format)
+            if start:
+                output.write(gzip.compress(start) if compress else start)
+            # the results come in the order of the ranges, so the parts are joined in id order
+            for part, count in zip(parts, run_parallel(export_part, tasks, workers)):
+                with open(part, "rb") as file:
+                    shutil.copyfileobj(file, output)
+                os.remove(part)
+                stats.rows += count
+                if progress:
+                    progress(stats)
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+    return stats
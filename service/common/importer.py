@@ -0,0 +1,282 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Product Importer
+
+This module loads a catalog file of Products, CSV with a header row or
+JSON Lines, for "flask load-products". The file is read a line at a time
+and written a batch at a time, so memory does not grow with its size.
+Every record is checked with the Product.deserialize() rules, and the
+ones that fail are reported with their line number instead of stopping
+the load.
+
+Several worker processes can share a file: each one loads the lines
+that start in its own byte range of it. That needs records without
+newlines inside quoted CSV fields, and an uncompressed file.
+"""
+import os
+import csv
+import gzip
+import json
+import time
+import logging
+from service.models import Product, DataValidationError
+from service.common.workers import is_shared_database, run_parallel
+
+logger = logging.getLogger("flask.app")
+
+FORMATS = ("csv", "jsonl")
+
+# Rejected records kept with their line number and error, the rest are only counted
+MAX_REJECTS = 1000
+
+# CSV values read as a true or a false available
+TRUE_VALUES = ("true", "yes", "1", "t", "y")
+FALSE_VALUES = ("false", "no", "0", "f", "n")
+
+
+class LoadStats:
+    """What a load wrote and rejected"""
+
+    def __init__(self):
+        self.loaded = 0
+        self.rejected = 0
+        self.lines = 0
+        self.rejects = []
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self) -> float:
+        """Returns the rows loaded per second so far"""
+        return self.loaded / max(time.perf_counter() - self.started, 1e-9)
+
+    def add(self, other: "LoadStats"):
+        """Adds the counts of a worker"""
+        self.loaded += other.loaded
+        self.rejected += other.rejected
+        self.lines += other.lines
+
+
+def detect_format(path: str) -> str:
+    """Returns the format of a catalog file from its extension"""
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lstrip(".").lower()
+    if extension in ("jsonl", "ndjson"):
+        return "jsonl"
+    if extension == "csv":
+        return "csv"
+    raise DataValidationError(f"Unknown file format: {path}, use --format csv or jsonl")
+
+
+def open_binary(path: str):
+    """Opens a catalog file, uncompressing it on the fly if it ends in .gz"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")  # pylint: disable=consider-using-with
+
+
+def read_lines(file, start: int = 0, end: int = None):
+    """Yields the decoded lines that start in the byte range [start, end) of a file"""
+    if start:
+        file.seek(start - 1)
+        file.readline()  # the rest of a line that started before the range
+    while end is None or file.tell() < end:
+        line = file.readline()
+        if not line:
+            break
+        yield line.decode("utf-8")
+
+
+def read_header(path: str) -> tuple:
+    """Returns the field names of a CSV file and the offset of its first record"""
+    with open_binary(path) as file:
+        line = file.readline()
+        offset = file.tell()
+    return next(csv.reader([line.decode("utf-8-sig")])), offset
+
+
+def from_csv(record: dict) -> dict:
+    """Converts the text of a CSV record to the types deserialize() expects"""
+    available = (record.get("available") or "").strip().lower()
+    if available in TRUE_VALUES:
+        record["available"] = True
+    elif available in FALSE_VALUES:
+        record["available"] = False
+    return record
+
+
+def read_records(lines, file_format: str, fieldnames: list = None):
+    """Yields the line number of every record with the record, or with the error it has"""
+    if file_format == "csv":
+        reader = csv.DictReader(lines, fieldnames=fieldnames)
+        for record in reader:
+            yield reader.line_num, from_csv(record)
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield number, DataValidationError(f"Invalid JSON: {error}")
+            continue
+        yield number, record
+
+
+def validate(record) -> dict:
+    """Returns the columns of a valid record, or raises DataValidationError"""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise DataValidationError("Invalid product: not an object")
+    values = Product().deserialize(record).writable_values()
+    Product.check_lengths(values)
+    return values
+
+
+def write_batch(rows: list, use_copy: bool, stats: LoadStats, line_numbers: list):
+    """Writes one batch in its own transaction, rejecting rows one by one if it fails"""
+    try:
+        stats.loaded += Product.copy_rows(rows) if use_copy else Product.insert_rows(rows)
+        return
+    except Exception as error:  # pylint: disable=broad-except
+        logger.warning("Batch of %d rows failed, writing it row by row: %s", len(rows), error)
+    for row, number in zip(rows, line_numbers):
+        try:
+            stats.loaded += Product.insert_rows([row])
+        except Exception as error:  # pylint: disable=broad-except
+            reject(stats, number, str(error).splitlines()[0])
+
+
+def reject(stats: LoadStats, line: int, message: str):
+    """Records a rejected record"""
+    stats.rejected += 1
+    if len(stats.rejects) < MAX_REJECTS:
+        stats.rejects.append({"line": line, "message": message})
+
+
+def count_lines(lines, stats: LoadStats):
+    """Counts the lines read"""
+    for line in lines:
+        stats.lines += 1
+        yield line
+
+
+def load(lines, file_format: str, fieldnames: list = None, batch_size: int = 5000,
+         use_copy: bool = False, progress=None) -> LoadStats:
+    """Loads the records of some lines in batches
+
+    :param lines: the lines of the file to load
+    :param file_format: csv or jsonl
+    :param fieldnames: the header of a CSV file
+    :param batch_size: the number of rows written per transaction
+    :param use_copy: write with the PostgreSQL COPY command instead of INSERT
+    :param progress: called with the statistics after every batch
+
+    :return: the statistics of the load, with line numbers relative to the lines
+    :rtype: LoadStats
+
+    """
+    stats = LoadStats()
+    rows = []
+    line_numbers = []
+    for number, record in read_records(count_lines(lines, stats), file_format, fieldnames):
+        try:
+            rows.append(validate(record))
+            line_numbers.append(number)
+        except DataValidationError as error:
+            reject(stats, number, str(error))
+            continue
+        if len(rows) >= batch_size:
+            write_batch(rows, use_copy, stats, line_numbers)
+            rows, line_numbers = [], []
+            if progress:
+                progress(stats)
+    if rows:
+        write_batch(rows, use_copy, stats, line_numbers)
+    if progress:
+        progress(stats)
+    return stats
+
+
+def split(path: str, start: int, workers: int) -> list:
+    """Splits the bytes of a file after start into a range per worker"""
+    size = os.path.getsize(path)
+    step = max((size - start) // workers, 1)
+    bounds = [start + step * number for number in range(workers)] + [size]
+    return [(bounds[number], bounds[number + 1]) for number in range(workers) if bounds[number] < size]
+
+
+def load_range(path: str, file_format: str, fieldnames: list, start: int, end: int,
+               batch_size: int, use_copy: bool) -> tuple:
+    """Loads the lines that start in one byte range of a file in a worker process"""
+    def progress(stats):
+        logger.info("Worker %d loaded %d rows, rejected %d", os.getpid(), stats.loaded, stats.rejected)
+
+    with open_binary(path) as file:
+        lines = read_lines(file, start, end)
+        stats = load(lines, file_format, fieldnames, batch_size, use_copy, progress)
+    return stats.loaded, stats.rejected, stats.lines, stats.rejects
+
+
+def load_file(path: str, file_format: str = None, batch_size: int = 5000, workers: int = 1,
+              progress=None) -> LoadStats:
+    """Loads a catalog file into the database
+
+    :param path: the CSV or JSON Lines file, optionally gzipped
+    :param file_format: csv or jsonl, guessed from the extension when None
+    :param batch_size: the number of rows written per transaction
+    :param workers: the number of processes that load parts of the file
+    :param progress: called with the statistics as the load goes on
+
+    :return: the statistics of the load, rejects carry the line numbers of the file
+    :rtype: LoadStats
+
+    """
+    file_format = file_format or detect_format(path)
+    use_copy = Product.supports_copy()
+    fieldnames, start = read_header(path) if file_format == "csv" else (None, 0)
+    header_lines = 1 if file_format == "csv" else 0
+    if workers > 1 and (path.endswith(".gz") or not is_shared_database()):
+        logger.warning("Cannot load a compressed file or into an in-memory database in parallel")
+        workers = 1
+    logger.info("Loading %s as %s with %d worker(s)%s", path, file_format, workers, " using COPY" if use_copy else "")
+
+    if workers == 1:
+        with open_binary(path) as file:
+            lines = read_lines(file, start)
+            stats = load(lines, file_format, fieldnames, batch_size, use_copy, progress)
+        for item in stats.rejects:
+            item["line"] += header_lines
+        return stats
+
+    stats = LoadStats()
+    tasks = [
+        (path, file_format, fieldnames, range_start, range_end, batch_size, use_copy)
+        for range_start, range_end in split(path, start, workers)
+    ]
+    # the results come back in the order of the ranges, so line numbers add up
+    for loaded, rejected, lines, rejects in run_parallel(load_range, tasks, workers):
+        for item in rejects:
+            item["line"] += header_lines + stats.lines
+        part = LoadStats()
+        part.loaded, part.rejected, part.lines = loaded, rejected, lines
+        stats.add(part)
+        stats.rejects.extend(rejects[:MAX_REJECTS - len(stats.rejects)])
+        if progress:
+            progress(stats)
+    return stats
@@ -19,19 +19,170 @@ Log Handlers
 
 This module contains utility functions to set up logging
 consistently
+
+With LOG_ASYNC the request threads only put records on a queue and a
+background thread formats and writes them. LOG_SAMPLE_RATES and
+LOG_RATE_LIMITS thin out the INFO lines of busy loggers, and LOG_FORMAT
+can be "json" for structured logs.
 """
+import copy
+import json
+import time
+import queue
+import atexit
+import random
 import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class QueueState:
+    """The listener that writes queued records and the handler that queues them"""
+
+    def __init__(self):
+        self.listener = None
+        self.handler = None
+
+
+# The queue of this process, see start_listener()
+QUEUE_STATE = QueueState()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON"""
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """A QueueHandler that never blocks or formats on the logging thread
+
+    Only the message is merged with its arguments before a record is
+    queued, as the arguments may change after the call, and the listener
+    thread formats the rest. When the queue is full the record is dropped
+    and counted.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # a shallow copy so that later handlers of this record are not affected
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through a sample of the INFO and lower records of a logger, at most so many a second"""
+
+    def __init__(self, rate: float = 1.0, per_second: int = 0, level: int = logging.INFO):
+        super().__init__()
+        self.rate = rate
+        self.per_second = per_second
+        self.level = level
+        self._lock = threading.Lock()
+        self._second = 0
+        self._count = 0
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        if self.rate < 1.0 and random.random() >= self.rate:
+            return False
+        if self.per_second:
+            with self._lock:
+                second = int(time.monotonic())
+                if second != self._second:
+                    self._second = second
+                    self._count = 0
+                self._count += 1
+                return self._count <= self.per_second
+        return True
+
+
+def parse_settings(setting: str, convert) -> dict:
+    """Parses "logger:value,logger:value" into a dictionary"""
+    settings = {}
+    for item in (setting or "").split(","):
+        if ":" in item:
+            name, value = item.rsplit(":", 1)
+            settings[name.strip()] = convert(value)
+    return settings
+
+
+def start_listener(handlers: list, maxsize: int = 10000) -> DroppingQueueHandler:
+    """Starts a thread that writes queued records to handlers and returns the handler to log to"""
+    stop_listener()
+    log_queue = queue.Queue(maxsize)
+    QUEUE_STATE.listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    QUEUE_STATE.listener.start()
+    QUEUE_STATE.handler = DroppingQueueHandler(log_queue)
+    return QUEUE_STATE.handler
+
+
+def stop_listener():
+    """Writes the records still queued and stops the listener thread"""
+    if QUEUE_STATE.listener is not None:
+        QUEUE_STATE.listener.stop()
+        QUEUE_STATE.listener = None
+
+
+def restart_listener():
+    """Starts the listener again in a forked worker, where its thread did not survive"""
+    listener = QUEUE_STATE.listener
+    if listener is not None:
+        # another thread may have held the lock of the old queue when forking
+        listener.queue = QUEUE_STATE.handler.queue = queue.Queue(listener.queue.maxsize)
+        listener._thread = None  # pylint: disable=protected-access
+        listener.start()
+
+
+atexit.register(stop_listener)
 
 
 def init_logging(app, logger_name: str):
     """Set up logging for production"""
     app.logger.propagate = False
     gunicorn_logger = logging.getLogger(logger_name)
-    app.logger.handlers = gunicorn_logger.handlers
+    handlers = gunicorn_logger.handlers
     app.logger.setLevel(gunicorn_logger.level)
     # Make all log formats consistent
-    format_string = "[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s"
-    formatter = logging.Formatter(format_string, "%Y-%m-%d %H:%M:%S %z")
-    for handler in app.logger.handlers:
+    if app.config.get("LOG_FORMAT") == "json":
+        formatter = JsonFormatter(datefmt="%Y-%m-%d %H:%M:%S %z")
+    else:
+        format_string = "[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s"
+        formatter = logging.Formatter(format_string, "%Y-%m-%d %H:%M:%S %z")
+    for handler in handlers:
         handler.setFormatter(formatter)
+    if app.config.get("LOG_ASYNC") and handlers:
+        app.logger.handlers = [start_listener(handlers, app.config.get("LOG_QUEUE_SIZE", 10000))]
+    else:
+        app.logger.handlers = handlers
+
+    rates = parse_settings(app.config.get("LOG_SAMPLE_RATES"), float)
+    limits = parse_settings(app.config.get("LOG_RATE_LIMITS"), int)
+    for name in set(rates) | set(limits):
+        logger = logging.getLogger(name)
+        # the filter of an app created before is replaced, not stacked
+        logger.filters = [item for item in logger.filters if not isinstance(item, SamplingFilter)]
+        logger.addFilter(SamplingFilter(rates.get(name, 1.0), limits.get(name, 0)))
     app.logger.info("Logging handler established")
@@ -0,0 +1,384 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Request Metrics
+
+This module records the latency, status and response size of every
+request and renders them in the Prometheus text format.
+
+Each thread records into its own shard without taking a lock, and the
+shards are only merged when the metrics are scraped. The shard of a thread
+that ends is folded into the retired totals, so a server that starts a
+thread per request keeps no more shards than it has threads. When METRICS_DIR is
+set every worker process also writes its totals to a file in that
+directory every METRICS_DUMP_INTERVAL seconds, so that a scrape served by
+any gunicorn worker reports the sum over all of them. When a worker exits
+the gunicorn master folds its file into an archive file and removes it, so
+the counters never go down and the directory does not grow with every
+recycled worker.
+"""
+import os
+import json
+import glob
+import time
+import uuid
+import bisect
+import weakref
+import itertools
+import threading
+from flask import g, request
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the response size histogram buckets in bytes
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Key separator of the labels in the files written by each worker
+SEPARATOR = "\x1f"
+
+# The file of the totals of the workers that exited
+ARCHIVE = "archived.json"
+
+
+class ShardOwner:  # pylint: disable=too-few-public-methods
+    """Held only by the thread-local storage of a thread, so it is collected when the thread ends"""
+
+    __slots__ = ("pid", "shard", "__weakref__")
+
+    def __init__(self, pid: int, shard: dict):
+        self.pid = pid
+        self.shard = shard
+
+
+class Metrics:  # pylint: disable=too-many-instance-attributes
+    """Per route request counters and histograms with lock-free recording"""
+
+    def __init__(self, directory: str = None, interval: float = 5.0):
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._token = None
+        self._local = threading.local()
+        self._keys = itertools.count()
+        self._shards = {}
+        self._retired = new_shard()
+        self._dumper = None
+
+    ##################################################
+    # RECORDING
+    ##################################################
+
+    def _shard(self) -> dict:
+        """Returns the shard of the current thread, starting over after a fork
+
+        Under gevent threading.local() is local to every greenlet, so each
+        greenlet has a shard that is retired when it ends.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    # tells the file of this process from that of an earlier one with its pid
+                    self._token = uuid.uuid4().hex
+                    self._shards = {}
+                    self._retired = new_shard()
+                    self._dumper = None
+        owner = getattr(self._local, "owner", None)
+        # the thread that forked keeps the owner of a shard of the parent
+        if owner is not None and owner.pid == self._pid:
+            return owner.shard
+        key = next(self._keys)
+        shard = new_shard()
+        with self._lock:
+            self._shards[key] = shard
+            if self.directory and self._dumper is None:
+                self._start_dumper()
+        owner = self._local.owner = ShardOwner(self._pid, shard)
+        weakref.finalize(owner, self._retire, key)
+        return shard
+
+    def _retire(self, key: int):
+        """Folds the shard of a thread that ended into the retired totals"""
+        with self._lock:
+            shard = self._shards.pop(key, None)
+            if shard is not None:
+                merge_shard(self._retired, shard)
+
+    def started(self):
+        """Records that a request started"""
+        self._shard()["started"][0] += 1
+
+    def finished(self):
+        """Records that a request finished, whatever its outcome"""
+        self._shard()["finished"][0] += 1
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int):
+        """Records the outcome of one request"""
+        shard = self._shard()
+        requests = shard["requests"]
+        key = (method, route, str(status))
+        requests[key] = requests.get(key, 0) + 1
+        key = (method, route)
+        for name, buckets, value in (("latency", LATENCY_BUCKETS, seconds), ("size", SIZE_BUCKETS, size)):
+            histogram = shard[name].get(key)
+            if histogram is None:
+                # one count per bucket and +Inf, then the sum
+                histogram = shard[name][key] = [0] * (len(buckets) + 1) + [0]
+            histogram[bisect.bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    ##################################################
+    # COLLECTION
+    ##################################################
+
+    def collect(self) -> dict:
+        """Returns the sum of the shards of this process"""
+        self._shard()
+        merged = new_shard()
+        with self._lock:
+            # a shard is either live or retired, never both
+            shards = list(self._shards.values())
+            merge_shard(merged, self._retired)
+        for shard in shards:
+            merge_shard(merged, shard)
+        return {
+            "requests": merged["requests"],
+            "latency": merged["latency"],
+            "size": merged["size"],
+            "in_flight": merged["started"][0] - merged["finished"][0],
+        }
+
+    def dump(self):
+        """Writes the totals of this process to its file in the metrics directory"""
+        totals = self.collect()
+        data = {
+            "pid": os.getpid(),
+            "token": self._token,
+            "in_flight": totals["in_flight"],
+            "requests": {SEPARATOR.join(key): value for key, value in totals["requests"].items()},
+            "latency": {SEPARATOR.join(key): value for key, value in totals["latency"].items()},
+            "size": {SEPARATOR.join(key): value for key, value in totals["size"].items()},
+        }
+        write_file(worker_path(self.directory, os.getpid()), data)
+
+    def _start_dumper(self):
+        """Starts the thread that writes the totals of this process periodically"""
+        def run():
+            while True:
+                time.sleep(self.interval)
+                self.dump()
+
+        self._dumper = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        self._dumper.start()
+
+    def collect_all(self) -> dict:
+        """Returns the totals of this process plus those the other workers wrote"""
+        totals = self.collect()
+        if not self.directory:
+            return totals
+        archive = read_archive(self.directory)
+        merge_totals(totals, archive, tuple)
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            data = read_file(path)
+            # a file that is archived already is only left until the master removes it
+            if data is None or data["pid"] == os.getpid() or data.get("token") in archive["absorbed"]:
+                continue
+            merge_totals(totals, data, tuple)
+            # requests of a worker that died are no longer in flight
+            if is_alive(data["pid"]):
+                totals["in_flight"] += data["in_flight"]
+        return totals
+
+    def render(self) -> str:
+        """Returns the metrics of every worker in the Prometheus text format"""
+        totals = self.collect_all()
+        lines = [
+            "# HELP http_requests_total Requests handled by method, route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(totals["requests"].items()):
+            lines.append(f'http_requests_total{{{labels(method, route)},status="{status}"}} {count}')
+        lines += [
+            "# HELP http_requests_in_flight Requests being handled right now.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {totals['in_flight']}",
+        ]
+        lines += render_histogram(
+            "http_request_duration_seconds", "Time to handle a request by method and route.",
+            LATENCY_BUCKETS, totals["latency"]
+        )
+        lines += render_histogram(
+            "http_response_size_bytes", "Size of the response body by method and route.",
+            SIZE_BUCKETS, totals["size"]
+        )
+        return "\n".join(lines) + "\n"
+
+
+######################################################################
+#  U T I L I T Y   F U N C T I O N S
+######################################################################
+def new_shard() -> dict:
+    """Returns the empty counters of one thread"""
+    return {"requests": {}, "latency": {}, "size": {}, "started": [0], "finished": [0]}
+
+
+def merge_shard(totals: dict, shard: dict):
+    """Adds the counters of a shard into totals of the same shape"""
+    # copying the items is atomic, so writers never need a lock
+    for key, count in list(shard["requests"].items()):
+        totals["requests"][key] = totals["requests"].get(key, 0) + count
+    for name in ("latency", "size"):
+        for key, histogram in list(shard[name].items()):
+            merge_histogram(totals[name], key, list(histogram))
+    for name in ("started", "finished"):
+        totals[name][0] += shard[name][0]
+
+
+def merge_histogram(totals: dict, key: tuple, histogram: list):
+    """Adds a histogram into the histogram of the same key in totals"""
+    total = totals.get(key)
+    if total is None:
+        totals[key] = histogram
+    else:
+        for index, value in enumerate(histogram):
+            total[index] += value
+
+
+def merge_totals(totals: dict, data: dict, make_key):
+    """Adds the counters of a file into totals, with the keys that make_key makes of the labels"""
+    for key, count in data["requests"].items():
+        key = make_key(key.split(SEPARATOR))
+        totals["requests"][key] = totals["requests"].get(key, 0) + count
+    for name in ("latency", "size"):
+        for key, histogram in data[name].items():
+            merge_histogram(totals[name], make_key(key.split(SEPARATOR)), list(histogram))
+
+
+def worker_path(directory: str, pid: int) -> str:
+    """Returns the path of the file of a worker"""
+    return os.path.join(directory, f"metrics-{pid}.json")
+
+
+def read_file(path: str):
+    """Returns the data of a metrics file, or None if it cannot be read"""
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_file(path: str, data: dict):
+    """Replaces a metrics file at once, so that readers never see half of it"""
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def read_archive(directory: str) -> dict:
+    """Returns the totals of the workers that exited and the tokens of their files"""
+    archive = read_file(os.path.join(directory, ARCHIVE))
+    return archive or {"requests": {}, "latency": {}, "size": {}, "absorbed": []}
+
+
+def archive_worker(directory: str, pid: int) -> bool:
+    """Folds the file of a worker that exited into the archive and removes it
+
+    The gunicorn master calls this from child_exit, one worker at a time. The
+    archive names the file it absorbed before the file is removed, so that a
+    scrape in between counts it once
+
+    :return: False if the worker never wrote a file
+    """
+    path = worker_path(directory, pid)
+    data = read_file(path)
+    if data is None:
+        return False
+    archive = read_archive(directory)
+    token = data.get("token")
+    if token not in archive["absorbed"]:
+        merge_totals(archive, data, SEPARATOR.join)
+    # only the tokens of files that are still there are needed
+    present = {other.get("token") for other in map(read_file, glob.glob(worker_path(directory, "*"))) if other}
+    archive["absorbed"] = [absorbed for absorbed in archive["absorbed"] if absorbed in present and absorbed != token]
+    archive["absorbed"].append(token)
+    write_file(os.path.join(directory, ARCHIVE), archive)
+    os.remove(path)
+    return True
+
+
+def is_alive(pid: int) -> bool:
+    """Checks if a worker process is still running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def labels(method: str, route: str) -> str:
+    """Returns the method and route as Prometheus labels"""
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+def render_histogram(name: str, help_text: str, buckets: tuple, histograms: dict) -> list:
+    """Returns the lines of a Prometheus histogram"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(buckets + ("+Inf",), histogram[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels(method, route)},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels(method, route)}}} {histogram[-1]}")
+        lines.append(f"{name}_count{{{labels(method, route)}}} {cumulative}")
+    return lines
+
+
+# The metrics of the service
+METRICS = Metrics()
+
+
+def init_metrics(app, metrics: Metrics = METRICS):
+    """Records the metrics of every request the app handles"""
+    metrics.directory = app.config.get("METRICS_DIR") or None
+    metrics.interval = app.config.get("METRICS_DUMP_INTERVAL", 5.0)
+    if metrics.directory:
+        os.makedirs(metrics.directory, exist_ok=True)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        metrics.started()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("metrics_start")
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            size = response.content_length or 0  # streamed bodies have no length
+            metrics.observe(request.method, route, response.status_code, time.perf_counter() - start, size)
+        return response
+
+    @app.teardown_request
+    def finish_request(_error):
+        if g.get("metrics_start") is not None:
+            metrics.finished()
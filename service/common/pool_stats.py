@@ -0,0 +1,110 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Pool Statistics
+
+This module collects live statistics of the SQLAlchemy connection pool:
+how many connections are checked out, how far into overflow the pool is,
+and how long requests wait to get a connection
+"""
+import time
+import bisect
+import threading
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds in seconds of the connection wait time histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+    """Thread-safe counters and a wait time histogram for a connection pool"""
+
+    def __init__(self, buckets: tuple = WAIT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Sets every counter back to zero"""
+        with self._lock:
+            self.counts = dict.fromkeys(("connects", "checkouts", "checkins", "invalidations", "timeouts"), 0)
+            self.wait_counts = [0] * (len(self.buckets) + 1)
+            self.wait_sum = 0.0
+
+    def incr(self, name: str):
+        """Adds one to a counter"""
+        with self._lock:
+            self.counts[name] += 1
+
+    def observe_wait(self, seconds: float):
+        """Records how long it took to get a connection from the pool"""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.wait_counts[index] += 1
+            self.wait_sum += seconds
+
+    def snapshot(self) -> dict:
+        """Returns the counters and the cumulative wait time histogram"""
+        with self._lock:
+            histogram = {}
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), self.wait_counts):
+                total += count
+                histogram[str(bound)] = total
+            return dict(self.counts, wait_seconds={"buckets": histogram, "count": total, "sum": self.wait_sum})
+
+
+# The statistics of the pool of the service database engine
+POOL_STATS = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """A QueuePool that records how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_STATS.incr("timeouts")
+            raise
+        finally:
+            POOL_STATS.observe_wait(time.perf_counter() - start)
+
+
+def instrument(engine):
+    """Counts the connection events of the pool of an engine"""
+    if getattr(engine, "_pool_stats_instrumented", False):
+        return
+    event.listen(engine, "connect", lambda *args: POOL_STATS.incr("connects"))
+    event.listen(engine, "checkout", lambda *args: POOL_STATS.incr("checkouts"))
+    event.listen(engine, "checkin", lambda *args: POOL_STATS.incr("checkins"))
+    event.listen(engine, "invalidate", lambda *args: POOL_STATS.incr("invalidations"))
+    engine._pool_stats_instrumented = True  # pylint: disable=protected-access
+
+
+def pool_status(engine) -> dict:
+    """Returns the live state of the pool of an engine with its statistics"""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    for name, method in (("size", "size"), ("checked_out", "checkedout"),
+                         ("checked_in", "checkedin"), ("overflow", "overflow")):
+        if hasattr(pool, method):
+            status[name] = getattr(pool, method)()
+    status.update(POOL_STATS.snapshot())
+    return status
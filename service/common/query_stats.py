@@ -0,0 +1,126 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Query Statistics
+
+This module counts and times the SQL statements each request executes
+and logs the ones slower than SLOW_QUERY_THRESHOLD seconds together with
+the shape (not the values) of their bound parameters. Outside of
+production the totals are added to every response as the X-DB-Queries
+and X-DB-Time headers.
+"""
+import time
+import logging
+from contextvars import ContextVar
+from sqlalchemy import event
+
+logger = logging.getLogger("flask.app.sql")
+
+# The statistics of the request being handled in this thread or greenlet
+_current = ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    """The number of statements a request executed and the time they took"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+def begin() -> QueryStats:
+    """Starts counting the statements of the current request or unit of work"""
+    stats = QueryStats()
+    _current.set(stats)
+    return stats
+
+
+def end() -> QueryStats:
+    """Stops counting and returns what was counted"""
+    stats = _current.get()
+    _current.set(None)
+    return stats
+
+
+def current() -> QueryStats:
+    """Returns the statistics being counted, or None"""
+    return _current.get()
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """Describes bound parameters by their types so no values are logged"""
+    if executemany and parameters:
+        return {"rows": len(parameters), "row": parameter_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def instrument(engine, threshold: float = 0.5):
+    """Times every statement executed on an engine"""
+    if getattr(engine, "_query_stats_instrumented", False):
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, _cursor, _statement, _parameters, context, _executemany):
+        conn.info.setdefault("query_start", []).append((context, time.perf_counter()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query(conn, _cursor, statement, parameters, _context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()[1]
+        stats = _current.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+        if elapsed >= threshold:
+            logger.warning(
+                "Slow query (%.3fs): %s parameters: %s",
+                elapsed, " ".join(statement.split()), parameter_shape(parameters, executemany)
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def forget_failed_query(exception_context):
+        # a failed statement never reaches after_cursor_execute, its start is
+        # only popped here if it was pushed, not for errors outside of a statement
+        connection = exception_context.connection
+        starts = connection.info.get("query_start") if connection is not None else None
+        if starts and starts[-1][0] is exception_context.execution_context:
+            starts.pop()
+
+    engine._query_stats_instrumented = True  # pylint: disable=protected-access
+
+
+def init_query_stats(app):
+    """Counts the statements of each request and reports them in debug and test modes"""
+
+    @app.before_request
+    def begin_request():
+        begin()
+
+    @app.after_request
+    def add_headers(response):
+        stats = current()
+        if stats is not None and (app.debug or app.testing or app.config.get("DB_QUERY_HEADERS")):
+            response.headers["X-DB-Queries"] = str(stats.count)
+            response.headers["X-DB-Time"] = f"{stats.seconds * 1000:.3f}ms"
+        return response
+
+    @app.teardown_request
+    def end_request(_error):
+        end()
@@ -0,0 +1,203 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Catalog Seeder
+
+This module generates synthetic Products for "flask seed-products" to
+fill databases for load and scale tests. A whole batch is drawn at once
+with random.choices() from precomputed tables, rather than one Faker
+object at a time, and written with the bulk insert path (COPY on
+PostgreSQL).
+
+The data looks like a real catalog: categories and the words of names
+follow a Zipf distribution whose skew can be set, a skew of 0 making
+them uniform, and prices are log-normal around a median per category.
+Every batch has its own random generator seeded from the seed and its
+number, so the same seed always makes the same catalog, however many
+workers make it.
+"""
+import os
+import math
+import time
+import random
+import logging
+from decimal import Decimal
+from statistics import NormalDist
+from service.models import Category, Product
+from service.common.workers import is_shared_database, run_parallel
+
+logger = logging.getLogger("flask.app")
+
+# Prices are drawn from this many log-normal quantiles per category
+PRICE_LEVELS = 1000
+
+# The words of the names and the median price and its spread of each category
+CATALOG = {
+    Category.CLOTHS: (
+        ("Shirt", "Jeans", "Jacket", "Hat", "Scarf", "Socks", "Dress", "Sweater", "Shorts", "Coat"),
+        25.0, 0.6,
+    ),
+    Category.FOOD: (
+        ("Bread", "Cheese", "Apples", "Coffee", "Pasta", "Rice", "Honey", "Tea", "Olives", "Chocolate"),
+        6.0, 0.5,
+    ),
+    Category.HOUSEWARES: (
+        ("Lamp", "Towel", "Mug", "Pillow", "Blanket", "Vase", "Clock", "Mirror", "Rug", "Candle"),
+        30.0, 0.7,
+    ),
+    Category.AUTOMOTIVE: (
+        ("Tire", "Wiper", "Battery", "Mat", "Charger", "Bulb", "Filter", "Jack", "Cover", "Polish"),
+        60.0, 0.9,
+    ),
+    Category.TOOLS: (
+        ("Hammer", "Wrench", "Drill", "Saw", "Pliers", "Level", "Screwdriver", "Chisel", "Clamp", "Tape"),
+        35.0, 0.8,
+    ),
+    Category.UNKNOWN: (
+        ("Gadget", "Widget", "Thing", "Gizmo", "Item"),
+        15.0, 1.0,
+    ),
+}
+
+ADJECTIVES = (
+    "Classic", "Deluxe", "Basic", "Premium", "Compact", "Large", "Small", "Red", "Blue", "Green",
+    "Black", "White", "Organic", "Heavy Duty", "Portable", "Vintage", "Modern", "Eco", "Pro", "Mini",
+)
+
+
+class SeedStats:
+    """The Products a seeding wrote and how fast"""
+
+    def __init__(self):
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    @property
+    def seconds(self) -> float:
+        """Returns the time the seeding has taken so far"""
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Returns the rows written per second so far"""
+        return self.rows / max(self.seconds, 1e-9)
+
+
+def zipf_weights(count: int, skew: float) -> list:
+    """Returns the weights of count ranks that follow a Zipf distribution"""
+    return [1.0 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def price_levels(median: float, sigma: float) -> list:
+    """Returns evenly spaced quantiles of a log-normal price distribution"""
+    normal = NormalDist(math.log(median), sigma)
+    return [
+        Decimal(max(round(math.exp(normal.inv_cdf((level + 0.5) / PRICE_LEVELS)) * 100), 1)).scaleb(-2)
+        for level in range(PRICE_LEVELS)
+    ]
+
+
+class Generator:
+    """Draws batches of synthetic Product rows"""
+
+    def __init__(self, seed: int = 42, skew: float = 1.0, available_ratio: float = 0.8):
+        self.seed = seed
+        self.available_ratio = available_ratio
+        # a category and a noun are drawn together, weighted by both of their ranks
+        self.kinds = []
+        self.kind_weights = []
+        for category, weight in zip(CATALOG, zipf_weights(len(CATALOG), skew)):
+            nouns = CATALOG[category][0]
+            total = sum(zipf_weights(len(nouns), skew))
+            for noun, noun_weight in zip(nouns, zipf_weights(len(nouns), skew)):
+                self.kinds.append((category, noun, noun.lower()))
+                self.kind_weights.append(weight * noun_weight / total)
+        self.adjective_weights = zipf_weights(len(ADJECTIVES), skew)
+        self.prices = {category: price_levels(*CATALOG[category][1:]) for category in CATALOG}
+
+    def batch(self, number: int, size: int) -> list:
+        """Returns the rows of batch number, the same ones for the same seed"""
+        rng = random.Random(f"{self.seed}-{number}")
+        kinds = rng.choices(self.kinds, self.kind_weights, k=size)
+        adjectives = rng.choices(ADJECTIVES, self.adjective_weights, k=size)
+        levels = rng.choices(range(PRICE_LEVELS), k=size)
+        stock = rng.choices((True, False), (self.available_ratio, 1 - self.available_ratio), k=size)
+        return [
+            {
+                "name": f"{adjective} {noun}",
+                "description": f"{adjective} {lower} for everyday use",
+                "price": self.prices[category][level],
+                "available": available,
+                "category": category,
+            }
+            for (category, noun, lower), adjective, level, available in zip(kinds, adjectives, levels, stock)
+        ]
+
+
+def seed_batches(seed: int, skew: float, available_ratio: float, batches: list, use_copy: bool) -> int:
+    """Generates and writes some batches, returns the number of rows written"""
+    generator = Generator(seed, skew, available_ratio)
+    rows = 0
+    for number, size in batches:
+        batch = generator.batch(number, size)
+        rows += Product.copy_rows(batch) if use_copy else Product.insert_rows(batch)
+    logger.info("Worker %d wrote %d rows", os.getpid(), rows)
+    return rows
+
+
+def seed_products(count: int, seed: int = 42, skew: float = 1.0, available_ratio: float = 0.8,
+                  batch_size: int = 10000, workers: int = 1, progress=None) -> SeedStats:
+    """Writes count synthetic Products
+
+    :param count: the number of Products to create
+    :param seed: the seed that makes the catalog reproducible
+    :param skew: the Zipf exponent of categories and names, 0 for uniform
+    :param available_ratio: the share of Products that are available
+    :param batch_size: the number of rows written per transaction
+    :param workers: the number of processes that write batches
+    :param progress: called with the statistics after every batch
+
+    :return: the statistics of the seeding
+    :rtype: SeedStats
+
+    """
+    stats = SeedStats()
+    use_copy = Product.supports_copy()
+    batches = [(number, min(batch_size, count - start)) for number, start in enumerate(range(0, count, batch_size))]
+    if workers > 1 and not is_shared_database():
+        logger.warning("Cannot seed an in-memory database in parallel")
+        workers = 1
+    logger.info("Seeding %d Products with seed %d and skew %s%s", count, seed, skew, " using COPY" if use_copy else "")
+
+    if workers == 1:
+        generator = Generator(seed, skew, available_ratio)
+        for number, size in batches:
+            batch = generator.batch(number, size)
+            stats.rows += Product.copy_rows(batch) if use_copy else Product.insert_rows(batch)
+            if progress:
+                progress(stats)
+        return stats
+
+    # a few batches per task so that progress is reported as the workers go
+    tasks = [
+        (seed, skew, available_ratio, batches[start:start + 4], use_copy) for start in range(0, len(batches), 4)
+    ]
+    for rows in run_parallel(seed_batches, tasks, workers):
+        stats.rows += rows
+        if progress:
+            progress(stats)
+    return stats
@@ -0,0 +1,142 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Serializers
+
+This module encodes Products straight from row tuples to JSON for the
+list endpoints. The output is byte for byte what jsonify() makes of
+Product.serialize() (sorted keys, compact separators, ASCII escapes)
+without building a dictionary per row. When orjson is installed it is
+used for pages whose text is plain ASCII, where it makes the same bytes.
+"""
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+from service.models import Product, Category, DataValidationError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# The Product columns in the order the encoders expect them in a row
+COLUMNS = ("id", "name", "description", "price", "available", "category")
+
+# Columns that hold free text that may need escaping
+TEXT_COLUMNS = ("name", "description")
+
+# Python expressions that turn a column value into its JSON text
+_TO_JSON = {
+    "id": "{}",
+    "name": "_string({})",
+    "description": "_string({})",
+    "price": "_string(str({}))",
+    "available": "_boolean[{}]",
+    "category": "_category[{}]",
+}
+
+# Python expressions that turn a column value into what serialize() returns
+_TO_NATIVE = {
+    "id": "{}",
+    "name": "{}",
+    "description": "{}",
+    "price": "str({})",
+    "available": "{}",
+    "category": "{}.name",
+}
+
+_NAMESPACE = {
+    "_string": encode_basestring_ascii,
+    "_boolean": {True: "true", False: "false"},
+    "_category": {category: encode_basestring_ascii(category.name) for category in Category},
+}
+
+
+def select_columns(query, fields: tuple = COLUMNS):
+    """Changes a Product query to return row tuples of the given fields"""
+    return query.with_entities(*(getattr(Product, name) for name in fields))
+
+
+def parse_fields(fields: str) -> tuple:
+    """Returns the known columns named in a comma separated list, in COLUMNS order
+
+    :param fields: the value of a ?fields= parameter, e.g. "id,name,price"
+    :return: the columns to select and write, all of them when fields is empty
+    """
+    if not fields:
+        return COLUMNS
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names.difference(COLUMNS)
+    if unknown:
+        raise DataValidationError("Invalid fields: " + ", ".join(sorted(unknown)))
+    return tuple(name for name in COLUMNS if name in names) or COLUMNS
+
+
+def is_plain(text: str) -> bool:
+    """Checks that orjson and the stdlib encoder would write text the same way"""
+    return text.isascii() and "\x7f" not in text
+
+
+class ProductEncoder:
+    """
+    Encodes row tuples of Product columns as JSON
+
+    The per row functions are compiled once for each set of fields, the
+    same way collections.namedtuple builds its methods, so encoding a row
+    is a single string format with no loops or lookups by name
+    """
+
+    def __init__(self, fields: tuple = COLUMNS, use_orjson: bool = True, columns: tuple = None):
+        """
+        :param fields: the fields to write for each row
+        :param use_orjson: use orjson for plain ASCII pages when it is installed
+        :param columns: the columns of the row tuples if there are more than fields
+        """
+        columns = columns or fields
+        self.fields = fields
+        self.use_orjson = use_orjson and orjson is not None
+        self.text_positions = tuple(columns.index(name) for name in TEXT_COLUMNS if name in fields)
+        order = sorted(fields)  # jsonify() sorts the keys
+        namespace = dict(_NAMESPACE)
+        namespace["_template"] = "{" + ",".join(f'"{name}":%s' for name in order) + "}"
+        values = ", ".join(_TO_JSON[name].format(f"row[{columns.index(name)}]") for name in order)
+        items = ", ".join(
+            f'"{name}": ' + _TO_NATIVE[name].format(f"row[{columns.index(name)}]") for name in fields
+        )
+        # pylint: disable=eval-used
+        self.encode = eval(f"lambda row: _template % ({values},)", namespace)
+        self.to_dict = eval(f"lambda row: {{{items}}}", namespace)
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def for_fields(fields: tuple = COLUMNS, use_orjson: bool = True, columns: tuple = None):
+        """Returns the shared encoder for a set of fields"""
+        return ProductEncoder(fields, use_orjson, columns)
+
+    def is_plain_row(self, row) -> bool:
+        """Checks that every text column of a row is plain ASCII"""
+        return all(is_plain(row[position]) for position in self.text_positions)
+
+    def encode_list(self, rows) -> bytes:
+        """Returns a JSON array of rows exactly as jsonify() would write it"""
+        if self.use_orjson and all(self.is_plain_row(row) for row in rows):
+            data = [self.to_dict(row) for row in rows]
+            return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        return ("[" + ",".join(map(self.encode, rows)) + "]\n").encode("ascii")
+
+    def encode_line(self, row) -> bytes:
+        """Returns one row as a line of newline delimited JSON"""
+        return (self.encode(row) + "\n").encode("ascii")
@@ -0,0 +1,75 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Worker Processes
+
+This module runs the tasks of the bulk CLI commands in forked worker
+processes. Each worker inherits the app but gets its own database
+connections, and runs every task in an app context.
+"""
+import multiprocessing
+from flask import current_app
+from service.models import db
+
+
+class WorkerState:  # pylint: disable=too-few-public-methods
+    """The app of a worker process"""
+
+    def __init__(self):
+        self.app = None
+
+
+# The state of this worker process, see init_worker()
+WORKER_STATE = WorkerState()
+
+
+def init_worker(app):
+    """Gives a forked worker the app and its own database connections"""
+    WORKER_STATE.app = app
+    with app.app_context():
+        # the connections of the parent must not be shared, close=False leaves them to it
+        db.engine.dispose(close=False)
+
+
+def run_task(task: tuple):
+    """Runs function(*args) of a task in an app context of the worker"""
+    function, args = task
+    with WORKER_STATE.app.app_context():
+        return function(*args)
+
+
+def run_parallel(function, tasks: list, processes: int):
+    """Runs function(*args) for every args of tasks in worker processes
+
+    :param function: a module level function
+    :param tasks: the tuples of arguments, one per call
+    :param processes: the number of worker processes
+
+    :return: an iterator of the results in the order of the tasks
+    :rtype: iterator
+
+    """
+    app = current_app._get_current_object()  # pylint: disable=protected-access
+    # forked workers inherit the app as it is, it is never pickled
+    context = multiprocessing.get_context("fork")
+    with context.Pool(min(processes, len(tasks)) or 1, initializer=init_worker, initargs=(app,)) as pool:
+        yield from pool.imap(run_task, [(function, args) for args in tasks])
+
+
+def is_shared_database() -> bool:
+    """Checks if other processes see the database, which an in-memory SQLite one is not"""
+    return db.engine.url.database not in (None, "", ":memory:")
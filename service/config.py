@@ -13,7 +13,93 @@ DATABASE_URI = os.getenv(
 # Configure SQLAlchemy
 SQLALCHEMY_DATABASE_URI = DATABASE_URI
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-# SQLALCHEMY_POOL_SIZE = 2
+
+# Connection pool, size it against the number of gunicorn workers and threads:
+# each worker process has its own pool of up to size + overflow connections
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ["true", "yes", "1"],
+}
+if not DATABASE_URI.startswith("sqlite"):
+    # SQLite uses its own pools that do not take these options, the
+    # others get a pool that times its checkouts, see Product.init_db()
+    SQLALCHEMY_ENGINE_OPTIONS.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
+
+# Keyset pagination of list responses
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+# Rows fetched per round-trip, and sent per chunk, when streaming NDJSON list responses
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+# Rows sent per INSERT statement when creating Products in bulk
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
+
+# Read-through cache of single Products, a size of 0 disables it. Each
+# worker process has its own, so a GET can return a Product that another
+# worker changed up to PRODUCT_CACHE_TTL seconds ago
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "10000"))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "30"))
+
+# Change feed of GET /products/changes: a stream sends a comment every
+# CHANGES_HEARTBEAT seconds when there are no changes and ends after
+# CHANGES_STREAM_TIMEOUT seconds, when EventSource clients reconnect with
+# Last-Event-ID after CHANGES_RETRY_MS. Each open stream holds a thread,
+# so serve them with gthread or gevent workers; with sync workers
+# gunicorn.conf.py ends them after half of the worker timeout.
+# A change after a missing sequence number, a transaction that has not
+# committed yet, is held back for up to CHANGES_SETTLE_SECONDS; keep it
+# above the longest write transaction
+CHANGES_HEARTBEAT = float(os.getenv("CHANGES_HEARTBEAT", "15"))
+CHANGES_STREAM_TIMEOUT = float(os.getenv("CHANGES_STREAM_TIMEOUT", "300"))
+CHANGES_RETRY_MS = int(os.getenv("CHANGES_RETRY_MS", "1000"))
+CHANGES_BATCH_SIZE = int(os.getenv("CHANGES_BATCH_SIZE", "500"))
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", "5"))
+
+# GET /products?updated_since= leaves the changes of the last few seconds for
+# the next sync, so that a slow transaction that commits after a later one
+# is not skipped; keep it above the longest write transaction
+DELTA_SETTLE_SECONDS = float(os.getenv("DELTA_SETTLE_SECONDS", "5"))
+
+# Encode list responses with orjson when it is installed
+USE_ORJSON = os.getenv("USE_ORJSON", "true").lower() in ["true", "yes", "1"]
+
+# Request metrics, set METRICS_DIR to a directory shared by all gunicorn
+# workers so that /metrics reports the sum over every worker, the files of
+# workers that exit are folded into archived.json by the child_exit hook
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "5"))
+
+# Statements slower than this many seconds are logged, and X-DB-Queries and
+# X-DB-Time response headers are added in debug and test modes or when asked
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", "0.5"))
+DB_QUERY_HEADERS = os.getenv("DB_QUERY_HEADERS", "false").lower() in ["true", "yes", "1"]
+
+# Logging: LOG_ASYNC writes the logs from a background thread through a queue
+# of LOG_QUEUE_SIZE records, LOG_FORMAT may be "text" or "json", and
+# LOG_SAMPLE_RATES ("service:0.1") and LOG_RATE_LIMITS ("service:100")
+# keep a fraction or at most so many INFO records a second of a logger, the
+# per-request lines of the routes are logged by app.logger, named "service"
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() in ["true", "yes", "1"]
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "")
+
+# Responses of these types and at least COMPRESS_MIN_SIZE bytes are sent
+# compressed with gzip, or brotli when it is installed, if the client accepts it
+COMPRESS_MIMETYPES = ("application/json", "application/x-ndjson", "text/html", "text/css",
+                      "text/javascript", "application/javascript", "text/plain")
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Seconds browsers may keep the fingerprinted assets of "flask build-static"
+ASSET_MAX_AGE = int(os.getenv("ASSET_MAX_AGE", "31536000"))
 
 # Secret for session management
 SECRET_KEY = os.getenv("SECRET_KEY", "sup3r-s3cr3t")
@@ -20,6 +20,7 @@ All of the models are stored in this module
 Models
 ------
 Product - A Product used in the Product Store
+ProductChange - A create, update or delete of a Product, for the change feed
 
 Attributes:
 -----------
@@ -28,11 +29,23 @@ description (string) - the description the product belongs to (i.e., dog, cat)
 available (boolean) - True for products that are available for adoption
 
 """
+import io
+import csv
+import json
+import base64
 import logging
+from datetime import datetime, timedelta, timezone
 from enum import Enum
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, delete, event, func, insert, inspect, literal, null, select, tuple_, union_all, update
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from service.common.cache import LRUCache
+from service.common import changes, pool_stats, query_stats
 
 logger = logging.getLogger("flask.app")
 
@@ -45,10 +58,143 @@ def init_db(app):
     Product.init_db(app)
 
 
+def create_tables(app):
+    """Create the tables of the SQLAlchemy app"""
+    Product.create_tables(app)
+
+
 class DataValidationError(Exception):
     """Used for an data validation errors when deserializing"""
 
 
+# How serialize() converts each attribute
+SERIALIZERS = {
+    "id": int,
+    "name": str,
+    "description": str,
+    "price": str,
+    "available": bool,
+    "category": lambda category: category.name,
+}
+
+
+def utcnow() -> datetime:
+    """Returns the current time in UTC without a tzinfo, as stored in the database"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class utc_timestamp(FunctionElement):  # pylint: disable=invalid-name,too-many-ancestors
+    """The current time in UTC on the clock of the database
+
+    It stamps updated_at and the created_at of the changes, the tombstones
+    of the delta sync, so that they are ordered by one clock at one precision
+    """
+
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_timestamp, "sqlite")
+def _sqlite_utc_timestamp(element, compiler, **kw):  # pylint: disable=unused-argument
+    # strftime() has milliseconds, padded to the microseconds that DateTime reads
+    return "strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'"
+
+
+@compiles(utc_timestamp, "postgresql")
+def _postgresql_utc_timestamp(element, compiler, **kw):  # pylint: disable=unused-argument
+    return "(clock_timestamp() AT TIME ZONE 'utc')"
+
+
+@compiles(utc_timestamp)
+def _default_utc_timestamp(element, compiler, **kw):  # pylint: disable=unused-argument
+    return "CURRENT_TIMESTAMP"
+
+
+def db_utcnow() -> datetime:
+    """Returns the current time in UTC on the clock of the database"""
+    return db.session.execute(select(utc_timestamp())).scalar()
+
+
+def from_isoformat(value: str) -> datetime:
+    """Parses an ISO 8601 time into a UTC datetime without a tzinfo
+
+    A trailing Z is read as +00:00, which fromisoformat() only accepts
+    itself from Python 3.11 on
+    """
+    value = value.strip()
+    if value[-1:] in ("Z", "z"):
+        value = value[:-1] + "+00:00"
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def to_timestamp(value: str) -> datetime:
+    """Converts an ISO 8601 time or seconds since the epoch into a UTC datetime without a tzinfo"""
+    try:
+        try:
+            timestamp = datetime.fromtimestamp(float(value), timezone.utc).replace(tzinfo=None)
+        except ValueError:
+            timestamp = from_isoformat(value)
+    except (ValueError, OverflowError, OSError) as error:
+        raise DataValidationError("Invalid timestamp: " + value) from error
+    return timestamp
+
+
+def to_price(price) -> Decimal:
+    """Converts a price that may be a quoted string into a Decimal"""
+    if isinstance(price, str):
+        try:
+            return Decimal(price.strip(' "'))
+        except InvalidOperation as error:
+            raise DataValidationError("Invalid price: " + price) from error
+    return price
+
+
+######################################################################
+#  K E Y S E T   C U R S O R S
+######################################################################
+def encode_cursor(sort: str, key, last_id: int) -> str:
+    """Encodes the position after the last row of a page as an opaque cursor
+
+    :param sort: the name of the column the page is ordered by
+    :param key: the value of the sort column in the last row
+    :param last_id: the id of the last row (the tie breaker)
+
+    :return: a url-safe string to hand back to the client
+    """
+    if isinstance(key, Decimal):
+        key = str(key)
+    elif isinstance(key, datetime):
+        key = key.isoformat()
+    payload = json.dumps([sort, key, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """Decodes a cursor made by encode_cursor()
+
+    :param cursor: the opaque cursor sent by the client
+    :param sort: the column the current request is ordered by
+
+    :return: the (key, last_id) tuple to resume after
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, key, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        if sort == "price":
+            key = Decimal(key)
+        elif sort == "updated_at":
+            key = from_isoformat(key)
+        last_id = int(last_id)
+    except (ValueError, TypeError, AttributeError, InvalidOperation) as error:
+        raise DataValidationError("Invalid cursor: " + cursor) from error
+    if cursor_sort != sort:
+        raise DataValidationError(f"Cursor was not issued for sort key [{sort}]")
+    return key, last_id
+
+
 class Category(Enum):
     """Enumeration of valid Product Categories"""
 
@@ -68,9 +214,28 @@ class Product(db.Model):
     from us by SQLAlchemy's object relational mappings (ORM)
     """
 
+    # Columns a list can be ordered by with keyset pagination
+    SORT_KEYS = ("id", "name", "price")
+
+    # Read-through cache of column values by id used by find(), None disables it
+    cache = None
+
     ##################################################
     # Table Schema
     ##################################################
+    __table_args__ = (
+        # (name, id) and (price, id) also serve the keyset pagination order
+        db.Index("ix_product_name_id", "name", "id"),
+        db.Index("ix_product_price_id", "price", "id"),
+        db.Index("ix_product_category_available", "category", "available"),
+        db.Index("ix_product_available", "available"),
+        # the order of the delta sync of changed_since()
+        db.Index("ix_product_updated_at_id", "updated_at", "id"),
+        # AUTOINCREMENT keeps SQLite from reusing the id of a deleted Product,
+        # which would give a new one the ETag of the old one
+        {"sqlite_autoincrement": True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(250), nullable=False)
@@ -79,6 +244,12 @@ class Product(db.Model):
     category = db.Column(
         db.Enum(Category), nullable=False, server_default=(Category.UNKNOWN.name)
     )
+    # bumped on every UPDATE, used for ETags and the If-Match of updates
+    version = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=utc_timestamp())
+    # set by every INSERT and UPDATE, including the Core ones of create() and
+    # update() and COPY, with the clock of the tombstones of ProductChange
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=utc_timestamp(), onupdate=utc_timestamp())
 
     ##################################################
     # INSTANCE METHODS
@@ -90,30 +261,103 @@ class Product(db.Model):
     def create(self):
         """
         Creates a Product to the database
+
+        The row is written with one INSERT ... RETURNING and the Product is
+        filled in from the returned row, so it is never read back
         """
         logger.info("Creating %s", self.name)
         # id must be none to generate next primary key
         self.id = None  # pylint: disable=invalid-name
-        db.session.add(self)
-        db.session.commit()
+        table = Product.__table__
+        statement = insert(table).values(**self.writable_values()).returning(*table.columns)
+        self.load_row(self.execute(statement))
+        self.invalidate(self.id)
 
-    def update(self):
+    def update(self, versions: set = None) -> bool:
         """
         Updates a Product to the database
+
+        The Product does not have to be loaded first: the row with its id is
+        changed with one UPDATE ... RETURNING and the Product is filled in
+        from the returned row
+
+        :param versions: the versions the row may have, to only overwrite the
+            one a client has seen, None for any
+
+        :return: False if there is no Product with this id and one of the versions
         """
         logger.info("Saving %s", self.name)
         if not self.id:
             raise DataValidationError("Update called with empty ID field")
-        db.session.commit()
+        table = Product.__table__
+        statement = update(table).where(table.c.id == self.id)
+        if versions is not None:
+            statement = statement.where(table.c.version.in_(versions))
+        statement = statement.values(version=table.c.version + 1, **self.writable_values()).returning(*table.columns)
+        row = self.execute(statement)
+        self.invalidate(self.id)
+        if row is None:
+            return False
+        self.load_row(row)
+        return True
+
+    def delete(self) -> bool:
+        """Removes a Product from the data store
+
+        :return: False if there is no Product with this id
+        """
+        logger.info("Deleting product with id %s", self.id)
+        table = Product.__table__
+        row = self.execute(delete(table).where(table.c.id == self.id).returning(table.c.id))
+        self.invalidate(self.id)
+        return row is not None
+
+    def writable_values(self) -> dict:
+        """Returns the values of the columns a client can write"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "price": self.price,
+            "available": self.available,
+            "category": self.category,
+        }
 
-    def delete(self):
-        """Removes a Product from the data store"""
-        logger.info("Deleting %s", self.name)
-        db.session.delete(self)
-        db.session.commit()
+    def execute(self, statement):
+        """Executes a write statement in its own transaction
 
-    def serialize(self) -> dict:
-        """Serializes a Product into a dictionary"""
+        The Product is taken out of the session first so that no pending
+        change of it is flushed as a second statement. The triggers of the
+        product table record the change for the change feed in the same
+        statement
+
+        :return: the row returned by the statement, or None
+        """
+        if self in db.session:
+            db.session.expunge(self)
+        try:
+            row = db.session.execute(statement).first()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if row is not None:
+            changes.notifier.publish()
+        return row
+
+    def load_row(self, row):
+        """Sets the attributes of this Product to a row as if it had been loaded"""
+        for key, value in row._mapping.items():  # pylint: disable=protected-access
+            set_committed_value(self, key, value)
+        if inspect(self).transient:
+            make_transient_to_detached(self)
+
+    def serialize(self, fields: tuple = None) -> dict:
+        """Serializes a Product into a dictionary
+
+        :param fields: the names of the only attributes to include, all when None
+        """
+        if fields is not None:
+            return {name: SERIALIZERS[name](getattr(self, name)) for name in fields}
         return {
             "id": self.id,
             "name": self.name,
@@ -132,7 +376,10 @@ class Product(db.Model):
         try:
             self.name = data["name"]
             self.description = data["description"]
-            self.price = Decimal(data["price"])
+            try:
+                self.price = Decimal(data["price"])
+            except InvalidOperation as error:
+                raise DataValidationError(f"Invalid price: {data['price']}") from error
             if isinstance(data["available"], bool):
                 self.available = data["available"]
             else:
@@ -155,6 +402,121 @@ class Product(db.Model):
     # CLASS METHODS
     ##################################################
 
+    @classmethod
+    def check_lengths(cls, values: dict):
+        """Checks that the text of writable_values() fits in its columns
+
+        :raises DataValidationError: when a value is not text or is too long
+        """
+        for name in ("name", "description"):
+            length = cls.__table__.c[name].type.length
+            if not isinstance(values[name], str):
+                raise DataValidationError(f"Invalid {name}: not a string")
+            if len(values[name]) > length:
+                raise DataValidationError(f"Invalid {name}: longer than {length} characters")
+
+    @classmethod
+    def create_many(cls, items: list, chunk_size: int = 1000) -> tuple:
+        """Creates many Products in a single transaction
+
+        Every item is validated with the deserialize() rules and the lengths
+        of the columns, and the valid ones are written with one multi-row
+        INSERT ... RETURNING id per chunk. RETURNING does not promise the
+        order of the rows, but the ids are given in the order of the VALUES,
+        so the sorted ids of a chunk are paired with the indexes of its items
+
+        :param items: a list of dictionaries of Product data
+        :param chunk_size: the number of rows to send per INSERT statement
+
+        :return: the ids of the new Products in the order of the valid items,
+            and a list of {"index", "message"} for the items that were rejected
+        :rtype: tuple
+
+        """
+        logger.info("Creating %d Products in chunks of %d", len(items), chunk_size)
+        indexes = []
+        rows = []
+        errors = []
+        for index, data in enumerate(items):
+            try:
+                values = cls().deserialize(data).writable_values()
+                cls.check_lengths(values)
+            except DataValidationError as error:
+                errors.append({"index": index, "message": str(error)})
+                continue
+            indexes.append(index)
+            rows.append(values)
+        created = {}
+        try:
+            for start in range(0, len(rows), chunk_size):
+                result = db.session.execute(
+                    insert(cls.__table__).returning(cls.__table__.c.id), rows[start:start + chunk_size]
+                )
+                created.update(zip(indexes[start:start + chunk_size], sorted(result.scalars().all())))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if created:
+            changes.notifier.publish()
+        return [created[index] for index in indexes], errors
+
+    @classmethod
+    def insert_rows(cls, rows: list) -> int:
+        """Writes rows of writable_values() in one transaction with a multi-row INSERT
+
+        :param rows: the dictionaries of the columns of each new Product
+
+        :return: the number of rows written
+        :rtype: int
+
+        """
+        try:
+            db.session.execute(insert(cls), rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        changes.notifier.publish()
+        return len(rows)
+
+    @classmethod
+    def copy_rows(cls, rows: list) -> int:
+        """Writes rows of writable_values() in one transaction with the PostgreSQL COPY command
+
+        :param rows: the dictionaries of the columns of each new Product
+
+        :return: the number of rows written
+        :rtype: int
+
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow((row["name"], row["description"], row["price"], row["available"], row["category"].name, 1))
+        buffer.seek(0)
+        # created_at and updated_at are left to their defaults
+        statement = (
+            f"COPY {cls.__table__.name} (name, description, price, available, category, version) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        try:
+            # the DBAPI connection of the transaction of the session
+            with db.session.connection().connection.cursor() as cursor:
+                cursor.copy_expert(statement, buffer)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        changes.notifier.publish()
+        return len(rows)
+
+    @classmethod
+    def supports_copy(cls) -> bool:
+        """Checks if the database can load rows with copy_rows()"""
+        dialect = db.engine.dialect
+        return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
     @classmethod
     def init_db(cls, app: Flask):
         """Initializes the database session
@@ -164,10 +526,28 @@ class Product(db.Model):
 
         """
         logger.info("Initializing database")
-        # This is where we initialize SQLAlchemy from the Flask app
+        options = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+        if "pool_size" in options and "poolclass" not in options:
+            app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dict(options, poolclass=pool_stats.TimedQueuePool)
+        # This is where we initialize SQLAlchemy from the Flask app,
+        # the engine does not connect until it is first used
         db.init_app(app)
-        app.app_context().push()
-        db.create_all()  # make our sqlalchemy tables
+        cls.cache = LRUCache(app.config["PRODUCT_CACHE_SIZE"], app.config["PRODUCT_CACHE_TTL"])
+        with app.app_context():
+            pool_stats.instrument(db.engine)
+            query_stats.instrument(db.engine, app.config["SLOW_QUERY_THRESHOLD"])
+
+    @classmethod
+    def create_tables(cls, app: Flask):
+        """Creates the tables and indexes that do not exist yet
+
+        :param app: the Flask app
+        :type data: Flask
+
+        """
+        logger.info("Creating tables")
+        with app.app_context():
+            db.create_all()
 
     @classmethod
     def all(cls) -> list:
@@ -175,10 +555,165 @@ class Product(db.Model):
         logger.info("Processing all Products")
         return cls.query.all()
 
+    @classmethod
+    def paginate(cls, query, limit: int, cursor: str = None, sort: str = "id") -> tuple:
+        """Returns one page of a query using keyset pagination
+
+        Rows are ordered by (sort, id) and a page starts strictly after the
+        position stored in the cursor, so every page is a range scan of the
+        same cost no matter how deep into the result set it is.
+
+        :param query: the filtered query to page through
+        :param limit: the maximum number of Products to return
+        :param cursor: the cursor returned with the previous page, if any
+        :param sort: the column to order by, one of SORT_KEYS
+
+        :return: the Products on this page and the cursor for the next page,
+            which is None when this is the last page
+        :rtype: tuple
+
+        """
+        logger.info("Processing page of %s Products sorted by %s ...", limit, sort)
+        if sort not in cls.SORT_KEYS:
+            raise DataValidationError(f"Invalid sort key: {sort}")
+        column = getattr(cls, sort)
+        if cursor:
+            key, last_id = decode_cursor(cursor, sort)
+            if column is cls.id:
+                query = query.filter(cls.id > last_id)
+            else:
+                query = query.filter(tuple_(column, cls.id) > tuple_(key, last_id))
+        order = (cls.id,) if column is cls.id else (column, cls.id)
+        # fetch one extra row to learn whether there is a next page
+        products = query.order_by(*order).limit(limit + 1).all()
+        if len(products) <= limit:
+            return products, None
+        products = products[:limit]
+        last = products[-1]
+        return products, encode_cursor(sort, getattr(last, sort), last.id)
+
+    @classmethod
+    def changed_since(cls, since: datetime, limit: int, cursor: str = None, settle: float = 0) -> tuple:
+        """Returns one page of the Products changed or deleted after a time
+
+        The rows of the Products updated after since and the tombstones of
+        the ones deleted after it, which are their delete changes, are
+        paged together with keyset pagination over (updated_at, id). The
+        changes of the last settle seconds are left for the next sync, so
+        that a transaction that commits after a later one is not skipped.
+
+        :param since: the time of the last sync, in UTC
+        :param limit: the maximum number of rows to return
+        :param cursor: the cursor returned with the previous page, if any
+        :param settle: the seconds a change must be old to be returned
+
+        :return: the rows of this page, with the columns of the product table
+            and deleted, which is True for a tombstone whose other columns are
+            None, and the cursor for the next page, None on the last page
+        :rtype: tuple
+
+        """
+        logger.info("Processing page of %s Products changed since %s ...", limit, since)
+        until = db_utcnow() - timedelta(seconds=settle)
+        table = cls.__table__
+        changes_table = ProductChange.__table__
+        live = select(
+            table.c.id, table.c.name, table.c.description, table.c.price, table.c.available,
+            table.c.category, table.c.updated_at, literal(False).label("deleted"),
+        ).where(table.c.updated_at > since, table.c.updated_at <= until)
+        tombstones = select(
+            changes_table.c.product_id, null(), null(), null(), null(), null(),
+            changes_table.c.created_at, literal(True),
+        ).where(
+            changes_table.c.action == "delete", changes_table.c.created_at > since, changes_table.c.created_at <= until
+        )
+        if cursor:
+            key, last_id = decode_cursor(cursor, "updated_at")
+            # in each part, so that both are range scans of their index
+            live = live.where(tuple_(table.c.updated_at, table.c.id) > tuple_(key, last_id))
+            tombstones = tombstones.where(
+                tuple_(changes_table.c.created_at, changes_table.c.product_id) > tuple_(key, last_id)
+            )
+        rows = union_all(live, tombstones).subquery()
+        # fetch one extra row to learn whether there is a next page
+        statement = select(rows).order_by(rows.c.updated_at, rows.c.id).limit(limit + 1)
+        result = db.session.execute(statement).all()
+        if len(result) <= limit:
+            return result, None
+        result = result[:limit]
+        return result, encode_cursor("updated_at", result[-1].updated_at, result[-1].id)
+
+    @classmethod
+    def stream(cls, query, batch_size: int = 1000):
+        """Iterates over all of the Products of a query in id order
+
+        The rows are read from a server-side cursor batch_size at a time so
+        that only one batch is held in memory no matter how large the result is
+
+        :param query: the filtered query to read
+        :param batch_size: the number of rows to fetch per round-trip
+
+        :return: an iterator of Products
+        :rtype: iterator
+
+        """
+        logger.info("Processing stream of Products in batches of %s ...", batch_size)
+        return iter(query.order_by(cls.id).yield_per(batch_size))
+
+    @classmethod
+    def statistics(cls, query) -> dict:
+        """Returns aggregate statistics of the Products a query matches
+
+        Everything comes from one GROUP BY (category, available) query, the
+        groups are then folded into the totals
+
+        :param query: the filtered query to summarize
+        :return: the count, the availability split, the count per category
+            and the min, max and average price
+        :rtype: dict
+
+        """
+        logger.info("Processing statistics query ...")
+        groups = (
+            query.order_by(None)
+            .with_entities(
+                cls.category,
+                cls.available,
+                func.count(cls.id),
+                func.min(cls.price),
+                func.max(cls.price),
+                func.sum(cls.price),
+            )
+            .group_by(cls.category, cls.available)
+            .all()
+        )
+        count = 0
+        total = Decimal(0)
+        prices = []
+        available = {"available": 0, "unavailable": 0}
+        categories = dict.fromkeys((category.name for category in Category), 0)
+        for category, is_available, group_count, min_price, max_price, sum_price in groups:
+            count += group_count
+            total += Decimal(sum_price)
+            prices.extend((Decimal(min_price), Decimal(max_price)))
+            available["available" if is_available else "unavailable"] += group_count
+            categories[category.name] += group_count
+        price = {"min": None, "max": None, "avg": None}
+        if count:
+            price["min"] = str(min(prices))
+            price["max"] = str(max(prices))
+            price["avg"] = str((total / count).quantize(Decimal("0.01")))
+        return {"count": count, "availability": available, "categories": categories, "price": price}
+
     @classmethod
     def find(cls, product_id: int):
         """Finds a Product by it's ID
 
+        The read-through cache is per process: the writes of this process
+        remove the Product from it, but a write in another gunicorn worker is
+        only seen here when the entry expires, PRODUCT_CACHE_TTL seconds after
+        it was read at most
+
         :param product_id: the id of the Product to find
         :type product_id: int
 
@@ -187,7 +722,60 @@ class Product(db.Model):
 
         """
         logger.info("Processing lookup for id %s ...", product_id)
-        return cls.query.get(product_id)
+        if cls.cache is None:
+            return db.session.get(cls, product_id)
+        values = cls.cache.get(product_id)
+        if values is not None:
+            # attach a copy to this session without going to the database
+            product = cls(**values)
+            make_transient_to_detached(product)
+            return db.session.merge(product, load=False)
+        # a write that commits while the row is read makes the cache drop it
+        generation = cls.cache.generation()
+        product = db.session.get(cls, product_id)
+        if product is not None:
+            cls.cache.set(product_id, {column.name: getattr(product, column.name)
+                                       for column in cls.__table__.columns}, generation)
+        return product
+
+    @classmethod
+    def invalidate(cls, product_id: int):
+        """Removes a Product from the read-through cache
+
+        :param product_id: the id of the Product that changed
+        :type product_id: int
+
+        """
+        if cls.cache is not None:
+            cls.cache.delete(product_id)
+
+    @classmethod
+    def find_by_filters(cls, name: str = None, category: Category = None,
+                        available: bool = None, price: Decimal = None):
+        """Returns the Products that match all of the given filters
+
+        The criteria of find_by_name, find_by_category, find_by_availability
+        and find_by_price are combined with AND into a single query. Filters
+        that are None are left out.
+
+        :return: a query of the Products that match every filter
+        :rtype: Query
+
+        """
+        logger.info(
+            "Processing filter query for name=%s category=%s available=%s price=%s ...",
+            name, category, available, price
+        )
+        criteria = []
+        if name is not None:
+            criteria.append(cls.name == name)
+        if category is not None:
+            criteria.append(cls.category == category)
+        if available is not None:
+            criteria.append(cls.available == available)
+        if price is not None:
+            criteria.append(cls.price == to_price(price))
+        return cls.query.filter(*criteria)
 
     @classmethod
     def find_by_name(cls, name: str) -> list:
@@ -215,10 +803,7 @@ class Product(db.Model):
 
         """
         logger.info("Processing price query for %s ...", price)
-        price_value = price
-        if isinstance(price, str):
-            price_value = Decimal(price.strip(' "'))
-        return cls.query.filter(cls.price == price_value)
+        return cls.query.filter(cls.price == to_price(price))
 
     @classmethod
     def find_by_availability(cls, available: bool = True) -> list:
@@ -247,3 +832,153 @@ class Product(db.Model):
         """
         logger.info("Processing category query for %s ...", category.name)
         return cls.query.filter(cls.category == category)
+
+
+class ProductChange(db.Model):
+    """
+    Class that represents a change of a Product
+
+    The changes are written by the triggers of the product table in the
+    statement of each write, the Products that flask load-products and
+    seed-products write included, and the id is the sequence number of the
+    change feed. Concurrent transactions can commit their sequence numbers
+    out of order, so since() holds back the changes after a gap until the
+    gap is settle seconds old. The delete changes are also the tombstones
+    of the delta sync, so pruning them limits how far back a sync can go,
+    see horizon().
+    """
+
+    __tablename__ = "product_change"
+
+    id = db.Column(db.Integer, primary_key=True)
+    action = db.Column(db.String(10), nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=utc_timestamp(), index=True)
+
+    # the tombstones of the delta sync of Product.changed_since()
+    __table_args__ = (
+        db.Index("ix_product_change_action_created_at", "action", "created_at", "product_id"),
+        # AUTOINCREMENT keeps SQLite from reusing the ids of pruned changes
+        {"sqlite_autoincrement": True},
+    )
+
+    def serialize(self, product=None) -> dict:
+        """Serializes a ProductChange and the current state of its Product into a dictionary"""
+        return {
+            "seq": self.id,
+            "action": self.action,
+            "id": self.product_id,
+            "product": product.serialize() if product is not None else None,
+            "at": self.created_at.isoformat() + "Z",
+        }
+
+    @classmethod
+    def since(cls, seq: int, limit: int, settle: float = 0) -> tuple:
+        """Returns up to limit changes after a sequence number, oldest first
+
+        A missing sequence number is a transaction that has not committed
+        yet, or one that rolled back, so the changes after it are only
+        returned once it is settle seconds old
+
+        :param seq: the last sequence number the caller has seen
+        :param limit: the maximum number of changes to return
+        :param settle: the seconds a change after a gap must be old to be returned
+
+        :return: a list of (ProductChange, Product) with the Product as it is
+            now, None when it has been deleted, and whether changes were held back
+        :rtype: tuple
+
+        """
+        rows = (
+            db.session.query(cls, Product)
+            .outerjoin(Product, Product.id == cls.product_id)
+            .filter(cls.id > seq)
+            .order_by(cls.id)
+            .limit(limit)
+            .all()
+        )
+        until = db_utcnow() - timedelta(seconds=settle)
+        found = []
+        for change, product in rows:
+            if change.id != seq + 1 and change.created_at > until:
+                return found, True
+            # the id of a deleted Product can be reused by a new one
+            found.append((change, None if change.action == "delete" else product))
+            seq = change.id
+        return found, False
+
+    @classmethod
+    def latest(cls) -> int:
+        """Returns the sequence number of the last change, 0 when there is none"""
+        return db.session.execute(select(func.max(cls.id))).scalar() or 0
+
+    @classmethod
+    def horizon(cls):
+        """Returns the time of the oldest change kept, None when none was pruned
+
+        The ids start at 1 and are never reused, so an oldest change with a
+        later id means the changes before it were pruned. A delta sync from
+        before the horizon would miss their tombstones
+        """
+        first, oldest = db.session.execute(select(func.min(cls.id), func.min(cls.created_at))).one()
+        if first is None or first == 1:
+            return None
+        return oldest
+
+    @classmethod
+    def prune(cls, before) -> int:
+        """Deletes the changes older than a datetime and returns how many
+
+        The last change is kept, so that latest() is the sequence number that
+        the next change follows and a new stream does not see a gap before it
+        """
+        logger.info("Pruning product changes before %s", before)
+        last = select(func.max(cls.id)).scalar_subquery()
+        try:
+            count = db.session.execute(delete(cls).where(cls.created_at < before, cls.id < last)).rowcount
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return count
+
+
+######################################################################
+#  T R I G G E R S   O F   T H E   C H A N G E   F E E D
+######################################################################
+
+# The action, the event and the row of the trigger of each write
+TRIGGER_EVENTS = (("create", "INSERT", "NEW"), ("update", "UPDATE", "NEW"), ("delete", "DELETE", "OLD"))
+
+# Row triggers on SQLite, the created_at of the changes is left to its default
+for _action, _event, _row in TRIGGER_EVENTS:
+    event.listen(Product.__table__, "after_create", DDL(f"""
+        CREATE TRIGGER product_change_{_action} AFTER {_event} ON product
+        BEGIN
+            INSERT INTO product_change (action, product_id) VALUES ('{_action}', {_row}.id);
+        END
+    """).execute_if(dialect="sqlite"))
+
+# Statement triggers on PostgreSQL, which record all of the rows of a write
+# with one INSERT and deliver a NOTIFY to the listeners of every worker when
+# the transaction commits
+event.listen(Product.__table__, "after_create", DDL(f"""
+    CREATE OR REPLACE FUNCTION record_product_change() RETURNS trigger AS $$
+    DECLARE
+        changed integer;
+    BEGIN
+        INSERT INTO product_change (action, product_id) SELECT TG_ARGV[0], id FROM changed_rows ORDER BY id;
+        GET DIAGNOSTICS changed = ROW_COUNT;
+        IF changed > 0 THEN
+            PERFORM pg_notify('{changes.CHANNEL}', '');
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+""").execute_if(dialect="postgresql"))
+for _action, _event, _row in TRIGGER_EVENTS:
+    event.listen(Product.__table__, "after_create", DDL(f"""
+        CREATE TRIGGER product_change_{_action} AFTER {_event} ON product
+        REFERENCING {_row} TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE PROCEDURE record_product_change('{_action}')
+    """).execute_if(dialect="postgresql"))
@@ -18,29 +18,63 @@
 """
 Product Store Service with UI
 """
-from flask import jsonify, request, abort
+import json
+import time
+import hashlib
+from itertools import islice
+from datetime import timezone
+from werkzeug.http import http_date, quote_etag
+from flask import Blueprint, Response, jsonify, request, abort, stream_with_context
+from flask import current_app as app
 from flask import url_for  # noqa: F401 pylint: disable=unused-import
-from service.models import Product
-from service.common import status  # HTTP Status Codes
-from . import app
+from service.models import Product, ProductChange, Category, SERIALIZERS, db, to_timestamp
+from service.common import changes, status  # HTTP Status Codes
+from service.common.metrics import METRICS
+from service.common.pool_stats import pool_status
+from service.common.serializers import COLUMNS, ProductEncoder, parse_fields, select_columns
+from service.common.assets import send_index
+
+# The routes of the service, registered on the app by create_app()
+api = Blueprint("api", __name__)
+
+NDJSON = "application/x-ndjson"
 
 
 ######################################################################
 # H E A L T H   C H E C K
 ######################################################################
-@app.route("/health")
+@api.route("/health")
 def healthcheck():
     """Let them know our heart is still beating"""
-    return jsonify(status=200, message="OK"), status.HTTP_200_OK
+    return jsonify(status=200, message="OK", cache=product_cache_stats()), status.HTTP_200_OK
+
+
+@api.route("/metrics")
+def metrics():
+    """Returns the request metrics of every worker in the Prometheus text format"""
+    return Response(METRICS.render(), status.HTTP_200_OK, mimetype="text/plain; version=0.0.4")
+
+
+@api.route("/health/pool")
+def pool_health():
+    """Returns the state of the database connection pool"""
+    return jsonify(pool_status(db.engine)), status.HTTP_200_OK
+
+
+def product_cache_stats():
+    """Returns the hit, miss and eviction counters of the Product cache"""
+    if Product.cache is None:
+        return None
+    return Product.cache.stats()
 
 
 ######################################################################
 # H O M E   P A G E
 ######################################################################
-@app.route("/")
+@api.route("/")
 def index():
     """Base URL for our service"""
-    return app.send_static_file("index.html")
+    return send_index()
 
 
 ######################################################################
@@ -65,20 +99,119 @@ def check_content_type(content_type):
     )
 
 
+def get_product_filters():
+    """Returns the Product.find_by_filters() arguments given in the query string"""
+    filters = {}
+    name = request.args.get("name")
+    if name:
+        filters["name"] = name
+    category = request.args.get("category")
+    if category:
+        category_value = getattr(Category, category.upper(), None)
+        if not isinstance(category_value, Category):
+            abort(status.HTTP_400_BAD_REQUEST, f"Invalid category: {category}")
+        filters["category"] = category_value
+    available = request.args.get("available")
+    if available:
+        filters["available"] = available.lower() in ["true", "yes", "1"]
+    price = request.args.get("price")
+    if price:
+        filters["price"] = price
+    return filters
+
+
+def get_page_limit():
+    """Returns the page size requested with ?limit= bounded by MAX_PAGE_SIZE"""
+    limit = request.args.get("limit", app.config["DEFAULT_PAGE_SIZE"])
+    try:
+        limit = int(limit)
+    except ValueError:
+        abort(status.HTTP_400_BAD_REQUEST, f"Invalid limit: {limit}")
+    if limit < 1:
+        abort(status.HTTP_400_BAD_REQUEST, f"Invalid limit: {limit}")
+    return min(limit, app.config["MAX_PAGE_SIZE"])
+
+
+def wants_stream():
+    """Checks if the client asked for a streamed NDJSON response"""
+    if request.args.get("stream", "").lower() in ["true", "yes", "1"]:
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON])
+    return best == NDJSON
+
+
+def stream_products(query, fields: tuple):
+    """Streams the given fields of the Products of a query as newline delimited JSON"""
+    app.logger.info("Streaming products as %s", NDJSON)
+
+    encoder = ProductEncoder.for_fields(fields, app.config["USE_ORJSON"])
+    batch_size = app.config["STREAM_BATCH_SIZE"]
+
+    def generate():
+        # one chunk per batch of rows, which a compressed response flushes as it is sent
+        rows = Product.stream(select_columns(query, fields), batch_size)
+        for batch in iter(lambda: list(islice(rows, batch_size)), []):
+            yield b"".join(encoder.encode_line(row) for row in batch)
+
+    return Response(stream_with_context(generate()), status.HTTP_200_OK, mimetype=NDJSON)
+
+
+def validator_headers(etag: str, last_modified=None) -> dict:
+    """Returns the ETag and Last-Modified headers for a validator"""
+    headers = {"ETag": quote_etag(etag)}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified.replace(tzinfo=timezone.utc))
+    return headers
+
+
+def is_not_modified(etag: str, last_modified=None) -> bool:
+    """Checks If-None-Match, or else If-Modified-Since, against a validator"""
+    if request.if_none_match:
+        # weak comparison, compressed responses carry weak ETags
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def if_match_versions(product_id: int):
+    """Returns the versions of a Product that If-Match accepts, None for any
+
+    The ETags of compressed responses are weak, and those of ?fields= name
+    the fields too, but they name the same version, so they are accepted
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    versions = set()
+    for tag in request.if_match.as_set(include_weak=True):
+        identity, _, version = tag.partition(";")[0].partition("-")
+        if identity == str(product_id) and version.isdigit():
+            versions.add(int(version))
+    if not versions:
+        abort(status.HTTP_412_PRECONDITION_FAILED, f"If-Match names no version of Product with id '{product_id}'.")
+    return versions
+
+
 ######################################################################
 # C R E A T E   A   N E W   P R O D U C T
 ######################################################################
-@app.route("/products", methods=["POST"])
+@api.route("/products", methods=["POST"])
 def create_products():
     """
     Creates a Product
     This endpoint will create a Product based the data in the body that is posted
+
+    Posting a JSON array instead creates all of the Products it contains
     """
     app.logger.info("Request to Create a Product...")
     check_content_type("application/json")
 
     data = request.get_json()
-    app.logger.info("Processing: %s", data)
+    if isinstance(data, list):
+        return create_products_in_bulk(data)
+
+    app.logger.debug("Processing: %s", data)
     product = Product()
     product.deserialize(data)
     product.create()
@@ -86,480 +219,285 @@ def create_products():
 
     message = product.serialize()
 
-    #
-    # Uncomment this line of code once you implement READ A PRODUCT
-    #
-    # location_url = url_for("get_products", product_id=product.id, _external=True)
-    location_url = "/"  # delete once READ is implemented
+    location_url = url_for(".get_product", product_id=product.id, _external=True)
     return jsonify(message), status.HTTP_201_CREATED, {"Location": location_url}
 
 
-######################################################################
-# L I S T   A L L   P R O D U C T S
-######################################################################
+def create_products_in_bulk(items: list):
+    """
+    Creates every Product in a list with one transaction
 
-#
-# PLACE YOUR CODE TO LIST ALL PRODUCTS HERE
-#
+    Returns the ids that were created and the errors for the items that were
+    rejected, with 201 when all of them were created, 207 when only some
+    were, and 400 when none were
+    """
+    app.logger.info("Processing bulk create of %d products", len(items))
+    ids, errors = Product.create_many(items, app.config["BULK_INSERT_CHUNK_SIZE"])
+    app.logger.info("Created %d products, rejected %d", len(ids), len(errors))
 
-######################################################################
-# R E A D   A   P R O D U C T
-######################################################################
+    if not errors:
+        status_code = status.HTTP_201_CREATED
+    elif ids:
+        status_code = status.HTTP_207_MULTI_STATUS
+    else:
+        status_code = status.HTTP_400_BAD_REQUEST
+    return jsonify(created=ids, errors=errors), status_code
 
-#
-# PLACE YOUR CODE HERE TO READ A PRODUCT
-#
 
 ######################################################################
-# U P D A T E   A   P R O D U C T
+# L I S T   A L L   P R O D U C T S
 ######################################################################
 
-#
-# PLACE YOUR CODE TO UPDATE A PRODUCT HERE
-#
+@api.route("/products", methods=["GET"])
+def list_products():
+    """
+    Returns a page of Products
 
-######################################################################
-# D E L E T E   A   P R O D U C T
-######################################################################
+    The list can be filtered by name, category, available and price, and is
+    paged with keyset pagination: ?limit= sets the page size, ?sort= the
+    order, and the cursor of the next page is returned in the Link and
+    X-Next-Cursor headers to be passed back as ?cursor=
 
+    ?fields=id,name,price selects and returns only the columns listed
 
-#
-# PLACE YOUR CODE TO DELETE A PRODUCT HERE
-#
+    Clients that send Accept: application/x-ndjson or ?stream=1 instead get
+    every matching Product streamed as newline delimited JSON in one response
 
-def get_product(product_id):
+    ?updated_since= instead returns the Products changed and deleted after
+    a time, for delta syncs, see list_changed_products()
     """
-    Retrieves a single Product
+    app.logger.info("Request to list Products...")
+    if "updated_since" in request.args:
+        return list_changed_products(request.args["updated_since"])
+
+    query = Product.find_by_filters(**get_product_filters())
+
+    fields = parse_fields(request.args.get("fields"))
+    if wants_stream():
+        return stream_products(query, fields)
+
+    limit = get_page_limit()
+    sort = request.args.get("sort", "id")
+    if sort not in Product.SORT_KEYS:
+        abort(status.HTTP_400_BAD_REQUEST, f"Invalid sort key: {sort}")
+    # the cursor is made from the id and sort key and the validator from the
+    # versions, even when they are not returned
+    columns = fields + tuple(dict.fromkeys(name for name in ("id", sort, "version") if name not in fields))
+    rows, next_cursor = Product.paginate(
+        select_columns(query, columns), limit, request.args.get("cursor"), sort
+    )
 
-    This endpoint will return a Product based on it's id
-    """
+    # the validator of a page is made from the rows on it, so it costs no
+    # more than the page, and a delete does not move any updated_at, so
+    # only If-None-Match is used
+    validator = "|".join(
+        [request.query_string.decode("utf-8"), next_cursor or ""] + [f"{row.id}-{row.version}" for row in rows]
+    )
+    etag = hashlib.sha1(validator.encode("utf-8")).hexdigest()
+    if is_not_modified(etag):
+        return "", status.HTTP_304_NOT_MODIFIED, validator_headers(etag)
 
-    app.logger.info("Request to Retrieve a product with id [%s]", product_id)
+    encoder = ProductEncoder.for_fields(fields, app.config["USE_ORJSON"], columns)
+    body = encoder.encode_list(rows)
+    app.logger.info("Returning %d products", len(rows))
 
-    product = Product.find(product_id)
-    if not product:
-        abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
+    headers = validator_headers(etag)
+    if next_cursor:
+        headers.update(next_page_headers(next_cursor))
+    return Response(body, status.HTTP_200_OK, headers, mimetype="application/json")
 
-    app.logger.info("Returning product: %s", product.name)
-    return product.serialize(), status.HTTP_200_OK
 
+def next_page_headers(next_cursor: str) -> dict:
+    """Returns the Link and X-Next-Cursor headers of the next page of the list"""
+    args = request.args.to_dict()
+    args["cursor"] = next_cursor
+    next_url = url_for(".list_products", _external=True, **args)
+    return {"Link": f'<{next_url}>; rel="next"', "X-Next-Cursor": next_cursor}
 
-def test_update_product_with_factory(self):
-    """Tests updating a product using ProductFactory and asserts changes"""
-    # Create a product with the factory
-    created_product = ProductFactory()
-    response = self.client.post(BASE_URL, json=created_product.serialize())
-    self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
-    # Get the created product ID
-    product_id = response.get_json()["id"]
+def list_changed_products(updated_since: str):
+    """
+    Returns a page of the Products changed since a time
+
+    updated_since is an ISO 8601 time, in UTC unless it has an offset, or
+    seconds since the epoch. The Products come in the order they changed
+    with their updated_at, and deleted ones as tombstones of only their id,
+    updated_at and "deleted": true. The pages are followed like those of
+    the list, and the next sync passes the last updated_at it got. A sync
+    from before the changes that flask prune-changes deleted gets 410 Gone
+    and has to list all of the Products again
+    """
+    since = to_timestamp(updated_since)
+    if get_product_filters() or "sort" in request.args or "fields" in request.args:
+        abort(status.HTTP_400_BAD_REQUEST, "updated_since cannot be combined with filters, sort or fields")
+    horizon = ProductChange.horizon()
+    if horizon is not None and since < horizon:
+        abort(status.HTTP_410_GONE, f"Changes before {horizon.isoformat()}Z have been pruned, list all Products instead")
+    app.logger.info("Request for Products changed since %s", since)
+    rows, next_cursor = Product.changed_since(
+        since, get_page_limit(), request.args.get("cursor"), app.config["DELTA_SETTLE_SECONDS"]
+    )
+    items = []
+    for row in rows:
+        if row.deleted:
+            item = {"id": row.id, "deleted": True}
+        else:
+            item = {name: SERIALIZERS[name](getattr(row, name)) for name in SERIALIZERS}
+            item["deleted"] = False
+        item["updated_at"] = row.updated_at.isoformat() + "Z"
+        items.append(item)
+    app.logger.info("Returning %d changed products", len(items))
+    headers = next_page_headers(next_cursor) if next_cursor else {}
+    return jsonify(items), status.HTTP_200_OK, headers
+
+
+@api.route("/products/stats", methods=["GET"])
+def get_product_stats():
+    """
+    Returns statistics of the Products
 
-    # Prepare updated data with a different description
-    updated_data = {
-        "name": created_product.name,  # Keep name the same
-        "description": "This is a completely new description!",
-        "price": created_product.price,  # Keep price the same
-        "available": created_product.available,  # Keep availability the same
-        "category": created_product.category.id,  # Keep category the same
-    }
+    The counts per category and availability and the min, max and average
+    price are computed by the database, with the same filters as the list
+    """
+    app.logger.info("Request for product statistics...")
+    query = Product.find_by_filters(**get_product_filters())
+    stats = Product.statistics(query)
+    app.logger.info("Returning statistics of %d products", stats["count"])
+    return jsonify(stats), status.HTTP_200_OK
 
-    # Send the PUT request with updated data
-    response = self.client.put(f"{BASE_URL}/{product_id}", json=updated_data)
-    self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-    # Verify the description has been updated
-    updated_product = response.get_json()
-    self.assertEqual(updated_product["description"], updated_data["description"])
+######################################################################
+# S T R E A M   T H E   C H A N G E S
+######################################################################
+@api.route("/products/changes", methods=["GET"])
+def stream_product_changes():
+    """
+    Streams the changes of the Products as Server-Sent Events
 
-######
+    Every create, update and delete is an event with its sequence number as
+    the id. A client that reconnects with the Last-Event-ID header, or asks
+    for ?since=, first gets the changes it missed, a new one only new changes
+    """
+    since = request.headers.get("Last-Event-ID", request.args.get("since"))
+    if since is None:
+        last = ProductChange.latest()
+    else:
+        try:
+            last = int(since)
+        except ValueError:
+            abort(status.HTTP_400_BAD_REQUEST, f"Invalid Last-Event-ID: {since}")
+    app.logger.info("Streaming product changes after %d", last)
+    changes.start_listener(db.engine)
+
+    heartbeat = app.config["CHANGES_HEARTBEAT"]
+    settle = app.config["CHANGES_SETTLE_SECONDS"]
+    batch_size = app.config["CHANGES_BATCH_SIZE"]
+    deadline = time.monotonic() + app.config["CHANGES_STREAM_TIMEOUT"]
+
+    def generate(last):
+        # how long EventSource clients wait before they reconnect when the stream ends
+        yield f"retry: {app.config['CHANGES_RETRY_MS']}\n\n"
+        while time.monotonic() < deadline:
+            generation = changes.notifier.generation
+            batch, held_back = ProductChange.since(last, batch_size, settle)
+            for change, product in batch:
+                data = json.dumps(change.serialize(product), separators=(",", ":"))
+                yield changes.format_event(change.id, change.action, data)
+                last = change.id
+            if len(batch) == batch_size:
+                continue
+            # the connection goes back to the pool while the stream waits
+            db.session.remove()
+            # the gap that held changes back is either filled by a commit or skipped once it settles
+            wait = min(heartbeat, settle) if held_back else heartbeat
+            timeout = max(min(wait, deadline - time.monotonic()), 0)
+            if not changes.notifier.wait(generation, timeout):
+                # keeps proxies from closing an idle stream, then the table is checked
+                # for the changes of other workers that could not be notified
+                yield ": heartbeat\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate(last)), status.HTTP_200_OK, headers, mimetype="text/event-stream")
 
-@app.route("/products/<int:product_id>", methods=["PUT"])
-def update_product(product_id):
-    """Updates a product with the provided data.
 
-    Args:
-        product_id (int): The ID of the product to be updated.
+######################################################################
+# R E A D   A   P R O D U C T
+######################################################################
 
-    Returns:
-        tuple: A tuple containing the updated product data (as JSON) and the HTTP status code (200 OK on success).
+@api.route("/products/<int:product_id>", methods=["GET"])
+def get_product(product_id):
+    """
+    Retrieves a single Product
 
-    Raises:
-        HTTPException: A 404 Not Found exception if the product with the provided ID is not found.
-        HTTPException: A 415 Unsupported Media Type exception if the request content type is not application/json.
+    This endpoint will return a Product based on it's id, or 304 Not Modified
+    when the client already has the current version. ?fields= limits the
+    attributes that are returned
     """
 
-    # Validate content type
-    check_content_type("application/json")
+    app.logger.info("Request to Retrieve a product with id [%s]", product_id)
 
-    # Find the product by ID
-    product = Product.query.get(product_id)
+    product = Product.find(product_id)
     if not product:
-        abort(status.HTTP_404_NOT_FOUND, f"Product with ID {product_id} not found.")
-
-    # Extract and validate update data (optional)
-    update_data = request.get_json()
-    # You can add validation logic here if needed
-
-    # Update product attributes
-    product.update(update_data)
-
-    # Save changes
-    db.session.commit()
-
-    # Return the updated product data
-    return product.serialize(), status.HTTP_200_OK
-
-
+        abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
 
+    # a sparse fieldset is another representation of the version, with an ETag of its own
+    fields = parse_fields(request.args.get("fields"))
+    etag = f"{product.id}-{product.version}"
+    if fields != COLUMNS:
+        etag += ";" + ",".join(fields)
+    headers = validator_headers(etag, product.updated_at)
+    if is_not_modified(etag, product.updated_at):
+        return "", status.HTTP_304_NOT_MODIFIED, headers
 
+    app.logger.info("Returning product: %s", product.name)
+    return product.serialize(None if fields == COLUMNS else fields), status.HTTP_200_OK, headers
 
-def test_delete_product(self):
-    """Tests deleting a product and verifies successful deletion.
 
-    This test creates multiple products, deletes the first one,
-    and verifies that:
-        * The deletion request returns a 204 No Content status code.
-        * No data is returned in the response.
-        * A subsequent GET request for the deleted product returns a 404 Not Found.
-        * The total product count is reduced by 1.
+######################################################################
+# U P D A T E   A   P R O D U C T
+######################################################################
+@api.route("/products/<int:product_id>", methods=["PUT"])
+def update_product(product_id):
     """
+    Updates a Product
 
-    # Create multiple products
-    initial_count = self.get_product_count()
-    created_products = self._create_products(5)
-
-    # Select the first product for deletion
-    product_to_delete = created_products[0]
-
-    # Send the delete request
-    response = self.client.delete(f"{BASE_URL}/{product_to_delete.id}")
-
-    # Assert response status and data
-    self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-    self.assertEqual(len(response.data), 0)
+    This endpoint will update a Product based the body that is posted. The
+    row is changed with a single UPDATE ... RETURNING without reading it first.
+    With If-Match only the version of its ETag is changed, and a Product that
+    someone else changed since is 412 Precondition Failed
+    """
+    app.logger.info("Request to Update a product with id [%s]", product_id)
+    check_content_type("application/json")
 
-    # Verify deletion by GET request
-    response = self.client.get(f"{BASE_URL}/{product_to_delete.id}")
-    self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    versions = if_match_versions(product_id)
+    product = Product()
+    product.deserialize(request.get_json())
+    product.id = product_id
+    if not product.update(versions):
+        if versions is not None and Product.find(product_id) is not None:
+            abort(status.HTTP_412_PRECONDITION_FAILED, f"Product with id '{product_id}' was changed.")
+        abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
 
-    # Verify product count reduction
-    new_count = self.get_product_count()
-    self.assertEqual(new_count, initial_count - 1)
+    app.logger.info("Product with id [%s] updated!", product.id)
+    return product.serialize(), status.HTTP_200_OK
 
-#########
 
-@app.route("/products/<int:product_id>", methods=["DELETE"])
+######################################################################
+# D E L E T E   A   P R O D U C T
+######################################################################
+@api.route("/products/<int:product_id>", methods=["DELETE"])
 def delete_product(product_id):
-    """Deletes a product with the provided ID.
-
-    Args:
-        product_id (int): The ID of the product to be deleted.
-
-    Returns:
-        tuple: An empty response body and the HTTP status code (204 No Content on success).
-
-    Raises:
-        HTTPException: A 404 Not Found exception if the product with the provided ID is not found.
     """
+    Deletes a Product
 
-    # Find the product by ID
-    product = Product.query.get(product_id)
-    if not product:
-        abort(status.HTTP_404_NOT_FOUND, f"Product with ID {product_id} not found.")
+    This endpoint will delete a Product based the id specified in the path
+    with a single DELETE ... RETURNING without reading it first
+    """
+    app.logger.info("Request to Delete a product with id [%s]", product_id)
 
-    # Delete the product
-    product.delete()
-    db.session.commit()
+    product = Product(id=product_id)
+    if not product.delete():
+        abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
 
-    # Return empty response with No Content status
+    app.logger.info("Product with id [%s] deleted!", product_id)
     return "", status.HTTP_204_NO_CONTENT
-
-
-
-
-
-def test_get_product_list(self):
-  """Tests retrieving a list of all products.
-
-  This test creates several products and then sends a GET request to
-  the `/products` endpoint. It verifies that:
-    * The request returns a 200 OK status code.
-    * The response data contains a list of products.
-    * The number of products in the response matches the number created.
-  """
-
-  # Create multiple products
-  created_products = self._create_products(5)
-
-  # Send the GET request to list all products
-  response = self.client.get(BASE_URL)
-
-  # Assert response status and data format
-  self.assertEqual(response.status_code, status.HTTP_200_OK)
-  data = response.get_json()
-  self.assertIsInstance(data, list)
-
-  # Verify the number of products matches what was created
-  self.assertEqual(len(data), len(created_products))
-
-###########
-
-@app.route("/products", methods=["GET"])
-def get_all_products():
-  """Retrieves and returns a list of all products.
-
-  Returns:
-      tuple: A tuple containing the list of serialized product data 
-             and the HTTP status code (200 OK).
-  """
-
-  # Fetch all products from the database
-  products = Product.query.all()
-
-  # Convert products to serialized data (JSON format)
-  serialized_products = [product.serialize() for product in products]
-  
-  # Return the list of products and success status
-  return serialized_products, status.HTTP_200_OK
-
-
-
-
-
-def test_get_products_by_name(self):
-  """Tests retrieving products filtered by name.
-
-  This test creates several products with different names, then sends a GET request to
-  the `/products` endpoint with a name query parameter. It verifies that:
-    * The request returns a 200 OK status code.
-    * The response data contains a list of products.
-    * The number of products in the response matches the number with the specified name.
-    * All products in the response have the expected name.
-  """
-
-  # Create products with different names
-  products = self._create_products(5, with_unique_names=True)
-
-  # Select a product name for filtering
-  test_name = products[0].name
-
-  # Construct the URL with the query parameter
-  url = f"{BASE_URL}?name={quote_plus(test_name)}"
-
-  # Send the GET request to list products by name
-  response = self.client.get(url)
-
-  # Assert response status and data format
-  self.assertEqual(response.status_code, status.HTTP_200_OK)
-  data = response.get_json()
-  self.assertIsInstance(data, list)
-
-  # Verify the number of products matches the expected count
-  expected_count = sum(1 for p in products if p.name == test_name)
-  self.assertEqual(len(data), expected_count)
-
-  # Verify all products have the specified name
-  for product in data:
-    self.assertEqual(product["name"], test_name)
-
-########
-
-@app.route("/products", methods=["GET"])
-def get_products_by_name_or_all():
-  """Retrieves and returns products filtered by name (if provided), 
-  otherwise returns all products.
-
-  Returns:
-      tuple: A tuple containing the list of serialized product data 
-             and the HTTP status code (200 OK).
-  """
-
-  # Get the name parameter from the query string (if any)
-  name = request.args.get("name")
-
-  if name:
-    # Filter products by name if a name is provided
-    products = Product.query.filter_by(name=name).all()
-  else:
-    # Fetch all products if no name is specified
-    products = Product.query.all()
-
-  # Convert products to serialized data (JSON format)
-  serialized_products = [product.serialize() for product in products]
-  
-  # Return the list of products and success status
-  return serialized_products, status.HTTP_200_OK
-
-
-
-
-
-def test_get_products_by_category(self):
-  """Tests retrieving products filtered by category.
-
-  This test creates several products with different categories, then sends a GET request to
-  the `/products` endpoint with a category query parameter. It verifies that:
-    * The request returns a 200 OK status code.
-    * The response data contains a list of products.
-    * The number of products in the response matches the number with the specified category.
-    * All products in the response have the expected category name.
-  """
-
-  # Create products with different categories
-  products = self._create_products(10, with_unique_categories=True)
-
-  # Select a product category for filtering
-  test_category = products[0].category
-
-  # Construct the URL with the query parameter
-  url = f"{BASE_URL}?category={test_category.name}"
-
-  # Send the GET request to list products by category
-  response = self.client.get(url)
-
-  # Assert response status and data format
-  self.assertEqual(response.status_code, status.HTTP_200_OK)
-  data = response.get_json()
-  self.assertIsInstance(data, list)
-
-  # Verify the number of products matches the expected count
-  expected_count = sum(1 for p in products if p.category == test_category)
-  self.assertEqual(len(data), expected_count)
-
-  # Verify all products have the specified category name
-  for product in data:
-    self.assertEqual(product["category"], test_category.name)
-
-###########
-
-@app.route("/products", methods=["GET"])
-def get_products_by_name_category_or_all():
-  """Retrieves and returns products filtered by name (if provided), 
-  category (if provided), otherwise returns all products.
-
-  Returns:
-      tuple: A tuple containing the list of serialized product data 
-             and the HTTP status code (200 OK).
-  """
-
-  # Get the name parameter from the query string (if any)
-  name = request.args.get("name")
-
-  # Get the category parameter from the query string (if any)
-  category_name = request.args.get("category")
-
-  if name:
-    # Filter products by name if a name is provided (handled in previous logic)
-    pass
-  elif category_name:
-    # Filter products by category if a category is provided
-    try:
-      # Attempt to convert category name to the corresponding enum value
-      category_value = getattr(Category, category_name.upper())
-      products = Product.query.filter_by(category=category_value).all()
-    except AttributeError:
-      # Handle the case where the provided category name doesn't exist 
-      abort(status.HTTP_400_BAD_REQUEST, f"Invalid category: {category_name}")
-  else:
-    # Fetch all products if no name or category is specified
-    products = Product.query.all()
-
-  # Convert products to serialized data (JSON format)
-  serialized_products = [product.serialize() for product in products]
-  
-  # Return the list of products and success status
-  return serialized_products, status.HTTP_200_OK
-
-
-
-
-def test_get_products_by_availability(self):
-  """Tests retrieving products filtered by availability.
-
-  This test creates a mix of available and unavailable products, then sends a GET request to
-  the `/products` endpoint with an availability query parameter. It verifies that:
-    * The request returns a 200 OK status code.
-    * The response data contains a list of products.
-    * The number of products in the response matches the number with the specified availability.
-    * All products in the response have the expected availability.
-  """
-
-  # Create products with a mix of availability
-  products = self._create_products(10, with_mixed_availability=True)
-
-  # Separate products based on availability
-  available_products = [p for p in products if p.available]
-  unavailable_products = [p for p in products if not p.available]
-
-  # Test filtering by available products
-  availability_value = "true"
-  url = f"{BASE_URL}?available={availability_value}"
-  response = self.client.get(url)
-
-  # Assert response status and data format
-  self.assertEqual(response.status_code, status.HTTP_200_OK)
-  data = response.get_json()
-  self.assertIsInstance(data, list)
-
-  # Verify the number of products matches the expected count
-  expected_count = len(available_products)
-  self.assertEqual(len(data), expected_count)
-
-  # Verify all products have the expected availability
-  for product in data:
-    self.assertEqual(product["available"], True)
-
-  # (Optional) Test filtering by unavailable products (add similar logic)
-
-################
-
-@app.route("/products", methods=["GET"])
-def get_products_by_name_category_availability_or_all():
-  """Retrieves and returns products filtered by name (if provided), 
-  category (if provided), availability (if provided), otherwise returns all products.
-
-  Returns:
-      tuple: A tuple containing the list of serialized product data 
-             and the HTTP status code (200 OK).
-  """
-
-  # Get the name parameter from the query string (if any)
-  name = request.args.get("name")
-
-  # Get the category parameter from the query string (if any)
-  category_name = request.args.get("category")
-
-  # Get the availability parameter from the query string (if any)
-  availability_str = request.args.get("available")
-
-  if name:
-    # Filter products by name if a name is provided (handled in previous logic)
-    pass
-  elif category_name:
-    # Filter products by category if a category is provided (handled in previous logic)
-    pass
-  elif availability_str:
-    # Filter products by availability if an availability parameter is provided
-    try:
-      # Convert availability string to a boolean value (case-insensitive)
-      available_value = availability_str.lower() in ["true", "yes", "1"]
-      products = Product.query.filter_by(available=available_value).all()
-    except ValueError:
-      # Handle the case where the provided availability string is invalid
-      abort(status.HTTP_400_BAD_REQUEST, f"Invalid availability value: {availability_str}")
-  else:
-    # Fetch all products if no name, category, or availability is specified
-    products = Product.query.all()
-
-  # Convert products to serialized data (JSON format)
-  serialized_products = [product.serialize() for product in products]
-  
-  # Return the list of products and success status
-  return serialized_products, status.HTTP_200_OK
-
-
-
-
-
-
-
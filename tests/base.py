@@ -0,0 +1,44 @@
+"""
+Base Test Case with a database in a temporary file
+"""
+import os
+import logging
+import tempfile
+from unittest import TestCase
+from service import create_app
+from service.models import Product, db
+
+
+class FileDatabaseTestCase(TestCase):
+    """Runs each test in an app context of an app bound to an SQLite file
+
+    Unlike an in-memory database, the file is seen by the worker processes
+    that the bulk commands start. Subclasses set OVERRIDES to change other
+    settings of the app
+    """
+
+    OVERRIDES = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        uri = f"sqlite:///{os.path.join(cls.directory.name, 'test.db')}"
+        cls.app = create_app(overrides={"TESTING": True, "SQLALCHEMY_DATABASE_URI": uri, **cls.OVERRIDES})
+        cls.app.logger.setLevel(logging.CRITICAL)
+        Product.create_tables(cls.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.app.app_context():
+            db.engine.dispose()
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.context = self.app.app_context()
+        self.context.push()
+        db.session.query(Product).delete()  # clean up the last tests
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
@@ -0,0 +1,82 @@
+"""
+Test cases for the Static Assets
+"""
+import os
+import gzip
+import shutil
+import tempfile
+from unittest import TestCase
+from flask import Flask
+from service.common import assets
+
+INDEX = '<link rel="stylesheet" href="static/css/site.css">\n<script src="static/js/app.js"></script>\n'
+
+
+class TestAssets(TestCase):
+    """Test Cases for building and serving the static assets"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.folder, "css"))
+        os.makedirs(os.path.join(self.folder, "js"))
+        with open(os.path.join(self.folder, "css", "site.css"), "w", encoding="utf-8") as file:
+            file.write("body { color: black; }\n" * 100)
+        with open(os.path.join(self.folder, "js", "app.js"), "w", encoding="utf-8") as file:
+            file.write("console.log('hello');\n" * 100)
+        with open(os.path.join(self.folder, "index.html"), "w", encoding="utf-8") as file:
+            file.write(INDEX)
+        self.manifest = assets.build(self.folder)
+        self.app = Flask(__name__, static_folder=self.folder)
+        self.app.register_blueprint(assets.assets)
+        self.app.add_url_rule("/", view_func=assets.send_index)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        assets.is_built.cache_clear()
+
+    def test_build(self):
+        """It should fingerprint and precompress every asset"""
+        self.assertEqual(set(self.manifest), {"css/site.css", "js/app.js"})
+        target = self.manifest["css/site.css"]
+        self.assertRegex(target, r"^css/site\.[0-9a-f]{12}\.css$")
+        dist = os.path.join(self.folder, "dist")
+        self.assertTrue(os.path.isfile(os.path.join(dist, target)))
+        with gzip.open(os.path.join(dist, target + ".gz")) as file:
+            self.assertTrue(file.read().startswith(b"body"))
+        with open(os.path.join(dist, "index.html"), encoding="utf-8") as file:
+            self.assertIn(f'"static/dist/{target}"', file.read())
+
+    def test_fingerprint_changes_with_content(self):
+        """It should give changed content a new name"""
+        with open(os.path.join(self.folder, "css", "site.css"), "a", encoding="utf-8") as file:
+            file.write("p { margin: 0; }\n")
+        self.assertNotEqual(assets.build(self.folder)["css/site.css"], self.manifest["css/site.css"])
+
+    def test_serve_precompressed(self):
+        """It should serve the precompressed copy with long cache headers"""
+        url = f"/static/dist/{self.manifest['js/app.js']}"
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("javascript", response.content_type)
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        self.assertIn("max-age=31536000", response.headers["Cache-Control"])
+        self.assertTrue(gzip.decompress(response.data).startswith(b"console.log"))
+        response.close()
+
+        response = self.client.get(url)
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertTrue(response.data.startswith(b"console.log"))
+        response.close()
+
+    def test_serve_index(self):
+        """It should serve the built home page that must be revalidated"""
+        response = self.client.get("/")
+        self.assertIn(b"static/dist/css/site.", response.data)
+        self.assertIn("max-age=0", response.headers["Cache-Control"])
+        response.close()
+
+    def test_hide_manifest(self):
+        """It should not serve the manifest"""
+        self.assertEqual(self.client.get("/static/dist/manifest.json").status_code, 404)
@@ -0,0 +1,97 @@
+"""
+Test cases for the LRU Cache
+"""
+from unittest import TestCase
+from service.common.cache import LRUCache
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(TestCase):
+    """Test Cases for LRUCache"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = LRUCache(maxsize=2, ttl=10, timer=self.clock)
+
+    def test_hit_and_miss(self):
+        """It should count hits and misses"""
+        self.assertIsNone(self.cache.get(1))
+        self.cache.set(1, "one")
+        self.assertEqual(self.cache.get(1), "one")
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_evict_least_recently_used(self):
+        """It should evict the least recently used entry when full"""
+        self.cache.set(1, "one")
+        self.cache.set(2, "two")
+        self.cache.get(1)
+        self.cache.set(3, "three")
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.get(1), "one")
+        self.assertEqual(self.cache.get(3), "three")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_expire_after_ttl(self):
+        """It should not return entries older than the ttl"""
+        self.cache.set(1, "one")
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get(1), "one")
+        self.clock.now = 10.0
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_set_after_delete(self):
+        """It should not store a value read before the key was deleted"""
+        since = self.cache.generation()
+        self.cache.delete(1)
+        self.cache.set(1, "stale", since)
+        self.assertIsNone(self.cache.get(1))
+        self.cache.set(1, "fresh", self.cache.generation())
+        self.assertEqual(self.cache.get(1), "fresh")
+        # the deletes of other keys do not matter
+        since = self.cache.generation()
+        self.cache.delete(2)
+        self.cache.set(1, "fresh", since)
+        self.assertEqual(self.cache.get(1), "fresh")
+
+    def test_set_after_forgotten_delete(self):
+        """It should not store a value read before a delete it no longer remembers"""
+        since = self.cache.generation()
+        for key in range(1, 4):
+            self.cache.delete(key)
+        self.cache.set(1, "stale", since)
+        self.assertIsNone(self.cache.get(1))
+        since = self.cache.generation()
+        self.cache.clear()
+        self.cache.set(3, "stale", since)
+        self.assertIsNone(self.cache.get(3))
+
+    def test_delete_and_clear(self):
+        """It should delete one entry or all of them"""
+        self.cache.set(1, "one")
+        self.cache.set(2, "two")
+        self.cache.delete(1)
+        self.cache.delete(99)
+        self.assertIsNone(self.cache.get(1))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(2))
+
+    def test_disabled(self):
+        """It should store nothing when maxsize is 0"""
+        cache = LRUCache(maxsize=0)
+        cache.set(1, "one")
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()["evictions"], 0)
@@ -0,0 +1,181 @@
+"""
+Test cases for the Product change feed
+"""
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from sqlalchemy import insert
+from service.models import Category, Product, ProductChange, db, db_utcnow
+from service.common import status, changes
+from tests.base import FileDatabaseTestCase
+from tests.factories import ProductFactory
+
+BASE_URL = "/products/changes"
+
+
+def parse_events(body: str) -> list:
+    """Returns the (id, event, data) of the events of an SSE body"""
+    events = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "data" in fields:
+            events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class TestChangeFeed(FileDatabaseTestCase):
+    """Test Cases for GET /products/changes"""
+
+    # short streams, so that the tests can read them to the end
+    OVERRIDES = {"CHANGES_STREAM_TIMEOUT": 0.5, "CHANGES_HEARTBEAT": 0.2}
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.app.test_client()
+        self.start = ProductChange.latest()
+
+    def test_record_changes(self):
+        """It should record every create, update and delete in order"""
+        product = ProductFactory()
+        product.create()
+        product.price = 5
+        product.update()
+        product.delete()
+        found, held_back = ProductChange.since(self.start, 10)
+        self.assertFalse(held_back)
+        self.assertEqual([change.action for change, _ in found], ["create", "update", "delete"])
+        self.assertEqual([change.product_id for change, _ in found], [product.id] * 3)
+        self.assertEqual([change.id for change, _ in found], list(range(self.start + 1, self.start + 4)))
+        # a deleted Product has no current state
+        self.assertEqual([current for _, current in found], [None] * 3)
+
+    def test_current_product(self):
+        """It should return the changes with the Product as it is now"""
+        product = ProductFactory()
+        product.create()
+        product.price = 5
+        product.update()
+        found, _ = ProductChange.since(self.start, 10)
+        self.assertEqual([Decimal(current.price) for _, current in found], [5, 5])
+
+    def test_hold_back_after_gap(self):
+        """It should hold back a recent change after a missing sequence number"""
+        product = ProductFactory()
+        product.create()
+        # a transaction that took the next sequence number has not committed
+        db.session.execute(insert(ProductChange).values(
+            id=self.start + 3, action="update", product_id=product.id, created_at=db_utcnow()
+        ))
+        db.session.commit()
+        found, held_back = ProductChange.since(self.start, 10, settle=60)
+        self.assertTrue(held_back)
+        self.assertEqual([change.id for change, _ in found], [self.start + 1])
+        # until the gap is older than the settle window
+        found, held_back = ProductChange.since(self.start, 10, settle=0)
+        self.assertFalse(held_back)
+        self.assertEqual([change.id for change, _ in found], [self.start + 1, self.start + 3])
+
+    def test_recorded_by_trigger(self):
+        """It should record a write that did not go through the model"""
+        db.session.execute(insert(Product).values(
+            name="raw", description="written with SQL", price=1, available=True, category=Category.FOOD
+        ))
+        db.session.commit()
+        found, _ = ProductChange.since(self.start, 10)
+        self.assertEqual([(change.action, current.name) for change, current in found], [("create", "raw")])
+
+    def test_no_change_for_missing_product(self):
+        """It should not record an update or delete of a missing Product"""
+        self.assertFalse(Product(id=0).delete())
+        self.assertEqual(ProductChange.latest(), self.start)
+
+    def test_resume(self):
+        """It should send the changes after Last-Event-ID"""
+        products = ProductFactory.create_batch(3)
+        for product in products:
+            product.create()
+        found, _ = ProductChange.since(self.start, 1)
+        first = found[0][0].id
+        response = self.client.get(BASE_URL, headers={"Last-Event-ID": str(first)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        body = response.get_data(as_text=True)
+        self.assertTrue(body.startswith("retry: "))
+        events = parse_events(body)
+        self.assertEqual([event[0] for event in events], [first + 1, first + 2])
+        self.assertEqual(events[-1][1], "create")
+        self.assertEqual(events[-1][2]["product"], products[2].serialize())
+
+    def test_since(self):
+        """It should take the sequence number from ?since= too"""
+        ProductFactory().create()
+        response = self.client.get(f"{BASE_URL}?since={self.start}")
+        self.assertEqual(len(parse_events(response.get_data(as_text=True))), 1)
+
+    def test_new_client(self):
+        """It should only send new changes to a client without Last-Event-ID"""
+        ProductFactory().create()
+        response = self.client.get(BASE_URL)
+        body = response.get_data(as_text=True)
+        self.assertEqual(parse_events(body), [])
+        self.assertIn(": heartbeat", body)
+
+    def test_wake_up(self):
+        """It should push a change made while the stream waits"""
+        self.app.config["CHANGES_HEARTBEAT"] = 10
+        self.addCleanup(self.app.config.update, CHANGES_HEARTBEAT=0.2)
+
+        def create():
+            with self.app.app_context():
+                ProductFactory().create()
+
+        generation = changes.notifier.generation
+        timer = threading.Timer(0.1, create)
+        timer.start()
+        response = self.client.get(BASE_URL)
+        events = parse_events(response.get_data(as_text=True))
+        timer.join()
+        # the heartbeat is longer than the stream, only the notification could deliver it
+        self.assertEqual([event[1] for event in events], ["create"])
+        self.assertNotEqual(changes.notifier.generation, generation)
+
+    def test_bulk_create(self):
+        """It should record the Products of a bulk create"""
+        items = [product.serialize() for product in ProductFactory.build_batch(3)]
+        ids, _ = Product.create_many(items)
+        found, _ = ProductChange.since(self.start, 10)
+        self.assertEqual([change.product_id for change, _ in found], ids)
+
+    def test_bad_last_event_id(self):
+        """It should not stream from an invalid Last-Event-ID"""
+        response = self.client.get(BASE_URL, headers={"Last-Event-ID": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune(self):
+        """It should prune old changes with flask prune-changes"""
+        for product in ProductFactory.create_batch(2):
+            product.create()
+        found, _ = ProductChange.since(self.start, 2)
+        # the changes of the earlier tests are older still
+        old = db.session.query(ProductChange).filter(ProductChange.id <= found[1][0].id)
+        old.update({"created_at": db_utcnow() - timedelta(days=30)})
+        db.session.commit()
+        count = old.count() - 1
+        before = (db_utcnow() - timedelta(days=31)).isoformat()
+        response = self.client.get(f"/products?updated_since={before}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = self.app.test_cli_runner().invoke(args=["prune-changes", "--days", "7"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn(f"Pruned {count} changes", result.output)
+        # the last change is kept for the sequence number of the next one
+        self.assertEqual(ProductChange.latest(), found[1][0].id)
+        found, _ = ProductChange.since(self.start, 10)
+        self.assertEqual([change.id for change, _ in found], [self.start + 2])
+        # a delta sync from before the pruned tombstones has to start over
+        response = self.client.get(f"/products?updated_since={before}")
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        after = (db_utcnow() - timedelta(days=29)).isoformat()
+        response = self.client.get(f"/products?updated_since={after}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
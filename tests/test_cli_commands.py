@@ -1,23 +1,36 @@
 """
 CLI Command Extensions for Flask
 """
-import os
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
-from click.testing import CliRunner
-from service.common.cli_commands import db_create
+from service import create_app
 
 
 class TestFlaskCLI(TestCase):
     """Test Flask CLI Commands"""
 
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app(overrides={
+            "TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "SQLALCHEMY_ENGINE_OPTIONS": {},
+        })
+
     def setUp(self):
-        self.runner = CliRunner()
+        self.runner = self.app.test_cli_runner()
 
     @patch('service.common.cli_commands.db')
     def test_db_create(self, db_mock):
         """It should call the db-create command"""
         db_mock.return_value = MagicMock()
-        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
-            result = self.runner.invoke(db_create)
-            self.assertEqual(result.exit_code, 0)
+        result = self.runner.invoke(args=["db-create"])
+        self.assertEqual(result.exit_code, 0)
+        db_mock.drop_all.assert_called_once()
+        db_mock.create_all.assert_called_once()
+
+    @patch('service.common.cli_commands.db')
+    def test_db_init(self, db_mock):
+        """It should create the missing tables without dropping any"""
+        result = self.runner.invoke(args=["db-init"])
+        self.assertEqual(result.exit_code, 0)
+        db_mock.drop_all.assert_not_called()
+        db_mock.create_all.assert_called_once()
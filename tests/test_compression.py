@@ -0,0 +1,92 @@
+"""
+Test cases for Response Compression
+"""
+import zlib
+import gzip
+from unittest import TestCase
+from flask import Flask, Response, jsonify, stream_with_context
+from service.common.compression import compress_stream, init_compression, brotli
+
+BIG = [{"id": number, "name": "hammer", "category": "TOOLS"} for number in range(200)]
+
+
+def make_app() -> Flask:
+    """Returns an app with compressed responses"""
+    app = Flask(__name__)
+    app.config.update(COMPRESS_MIMETYPES=("application/json", "application/x-ndjson"),
+                      COMPRESS_MIN_SIZE=500)
+
+    @app.route("/big")
+    def big():
+        response = jsonify(BIG)
+        response.set_etag("big")
+        return response
+
+    @app.route("/small")
+    def small():
+        return jsonify(BIG[:1])
+
+    @app.route("/stream")
+    def stream():
+        def generate():
+            for item in BIG:
+                yield f'{{"id": {item["id"]}}}\n'
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    init_compression(app)
+    return app
+
+
+class TestCompression(TestCase):
+    """Test Cases for init_compression"""
+
+    def setUp(self):
+        self.app = make_app()
+        self.client = self.app.test_client()
+
+    def test_gzip_large_response(self):
+        """It should gzip a large JSON response for a client that accepts it"""
+        plain = self.client.get("/big")
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertLess(len(response.data), len(plain.data) / 5)
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertEqual(response.headers["ETag"], 'W/"big"')
+        self.assertEqual(plain.headers["ETag"], '"big"')
+
+    def test_small_response_not_compressed(self):
+        """It should not compress responses below the threshold"""
+        response = self.client.get("/small", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+
+    def test_not_accepted(self):
+        """It should not compress for clients that do not accept an encoding"""
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip;q=0"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_brotli(self):
+        """It should prefer brotli when it is installed"""
+        if brotli is None:
+            self.skipTest("brotli is not installed")
+        response = self.client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.headers["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.data), self.client.get("/big").data)
+
+    def test_stream(self):
+        """It should compress a streamed response as it is sent"""
+        plain = self.client.get("/stream")
+        response = self.client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Length", response.headers)
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+
+    def test_stream_flushes(self):
+        """It should flush every chunk so the rows sent so far can be decoded"""
+        chunks = compress_stream(iter([b"x" * 60, b"y" * 60, b"z" * 10]), "gzip")
+        decoder = zlib.decompressobj(31)
+        # the first rows can be decoded before the next chunk is produced
+        self.assertEqual(decoder.decompress(next(chunks)), b"x" * 60)
+        self.assertEqual(decoder.decompress(next(chunks)), b"y" * 60)
+        self.assertEqual(decoder.decompress(b"".join(chunks)), b"z" * 10)
@@ -0,0 +1,81 @@
+"""
+Test cases for the Product Exporter
+"""
+import os
+import csv
+import gzip
+import json
+from decimal import Decimal
+from service.models import Product, Category, db
+from service.common import exporter, importer
+from tests.base import FileDatabaseTestCase
+
+COUNT = 250
+
+
+class TestExporter(FileDatabaseTestCase):
+    """Test Cases for exporting the product table"""
+
+    def setUp(self):
+        super().setUp()
+        Product.insert_rows([
+            {"name": f"product {number}", "description": 'a "quoted", text', "price": Decimal(number) / 4,
+             "available": number % 3 == 0, "category": list(Category)[number % len(Category)]}
+            for number in range(COUNT)
+        ])
+
+    def path(self, name: str) -> str:
+        """Returns a path in the temporary directory"""
+        return os.path.join(self.directory.name, name)
+
+    def test_export_jsonl(self):
+        """It should export every Product as the JSON of the API, in id order"""
+        stats = exporter.export_file(self.path("products.jsonl"), "jsonl", batch_size=40)
+        self.assertEqual(stats.rows, COUNT)
+        with open(self.path("products.jsonl"), encoding="utf-8") as file:
+            lines = [json.loads(line) for line in file]
+        first = Product.query.order_by(Product.id).first()
+        self.assertEqual(lines[0], first.serialize())
+        self.assertEqual([line["id"] for line in lines], sorted(line["id"] for line in lines))
+
+    def test_export_columns(self):
+        """It should export blocks of column arrays"""
+        exporter.export_file(self.path("products.columns"), "columns", batch_size=100)
+        with open(self.path("products.columns"), encoding="utf-8") as file:
+            blocks = [json.loads(line) for line in file]
+        self.assertEqual([len(block["id"]) for block in blocks], [100, 100, 50])
+        self.assertEqual(set(blocks[0]), {"id", "name", "description", "price", "available", "category"})
+        self.assertIs(blocks[0]["available"][0], True)
+
+    def test_export_in_parallel_gzipped(self):
+        """It should join gzipped id ranges of worker processes into one file"""
+        path = self.path("products.csv.gz")
+        stats = exporter.export_file(path, "csv", workers=3, batch_size=30, compress=True)
+        self.assertEqual(stats.rows, COUNT)
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), COUNT)
+        self.assertEqual([int(row["id"]) for row in rows], sorted(int(row["id"]) for row in rows))
+        self.assertFalse([name for name in os.listdir(self.directory.name) if ".part-" in name])
+
+    def test_round_trip(self):
+        """It should export a CSV file that load-products reads back"""
+        path = self.path("round-trip.csv")
+        exporter.export_file(path, "csv")
+        before = sorted((p.name, p.description, p.price, p.available, p.category) for p in Product.all())
+        db.session.query(Product).delete()
+        db.session.commit()
+        stats = importer.load_file(path)
+        self.assertEqual((stats.loaded, stats.rejected), (COUNT, 0))
+        after = sorted((p.name, p.description, p.price, p.available, p.category) for p in Product.all())
+        self.assertEqual(after, before)
+
+    def test_cli(self):
+        """It should export with flask export-products"""
+        result = self.app.test_cli_runner().invoke(
+            args=["export-products", self.path("cli.jsonl.gz"), "--gzip"]
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn(f"Exported {COUNT} products", result.output)
+        with gzip.open(self.path("cli.jsonl.gz"), "rt", encoding="utf-8") as file:
+            self.assertEqual(len(file.readlines()), COUNT)
@@ -0,0 +1,88 @@
+"""
+Test cases for the gunicorn configuration
+"""
+import os
+import gc
+import runpy
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+from service import create_app
+from service.models import db
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+
+
+def load_conf(**env) -> dict:
+    """Runs the configuration file with some environment variables"""
+    with patch.dict(os.environ, env):
+        return runpy.run_path(CONF)
+
+
+class TestGunicornConf(TestCase):
+    """Test Cases for gunicorn.conf.py"""
+
+    def tearDown(self):
+        gc.unfreeze()
+        gc.enable()
+
+    def test_size_from_cpus(self):
+        """It should run 2 x CPUs + 1 sync workers by default"""
+        with patch("os.sched_getaffinity", return_value={0, 1, 2, 3}):
+            conf = load_conf()
+        self.assertEqual(conf["workers"], 9)
+        self.assertEqual(conf["worker_class"], "sync")
+        self.assertTrue(conf["preload_app"])
+        self.assertGreater(conf["max_requests"], 0)
+        self.assertGreater(conf["max_requests_jitter"], 0)
+
+    def test_size_from_environment(self):
+        """It should use gthread workers when asked for threads"""
+        conf = load_conf(WEB_CONCURRENCY="3", GUNICORN_THREADS="8")
+        self.assertEqual(conf["workers"], 3)
+        self.assertEqual(conf["threads"], 8)
+        self.assertEqual(conf["worker_class"], "gthread")
+
+    def test_max_workers(self):
+        """It should not start more workers than the maximum"""
+        with patch("os.sched_getaffinity", return_value=set(range(64))):
+            conf = load_conf(GUNICORN_MAX_WORKERS="10")
+        self.assertEqual(conf["workers"], 10)
+
+    def test_stream_timeout(self):
+        """It should end the change streams of sync workers before the worker timeout"""
+        with patch.dict(os.environ, {"CHANGES_STREAM_TIMEOUT": "300", "GUNICORN_TIMEOUT": "30"}):
+            runpy.run_path(CONF)
+            self.assertEqual(float(os.environ["CHANGES_STREAM_TIMEOUT"]), 15)
+        with patch.dict(os.environ, {"CHANGES_STREAM_TIMEOUT": "300", "GUNICORN_THREADS": "4"}):
+            runpy.run_path(CONF)
+            self.assertEqual(os.environ["CHANGES_STREAM_TIMEOUT"], "300")
+
+    def test_post_fork_disposes_the_pool(self):
+        """It should give a forked worker its own connection pool"""
+        conf = load_conf()
+        self.assertFalse(gc.isenabled())
+        app = create_app(overrides={
+            "TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "SQLALCHEMY_ENGINE_OPTIONS": {},
+        })
+        with app.app_context():
+            pool = db.engine.pool
+        server = MagicMock()
+        server.app.wsgi.return_value = app
+        conf["pre_fork"](server, None)
+        conf["post_fork"](server, None)
+        with app.app_context():
+            self.assertIsNot(db.engine.pool, pool)
+        self.assertTrue(gc.isenabled())
+
+    def test_child_exit_archives_metrics(self):
+        """It should fold the metrics file of an exited worker into the archive"""
+        conf = load_conf()
+        worker = MagicMock(pid=4242)
+        with patch("service.config.METRICS_DIR", "/tmp/metrics"), \
+                patch("service.common.metrics.archive_worker") as archive_worker:
+            conf["child_exit"](MagicMock(), worker)
+        archive_worker.assert_called_once_with("/tmp/metrics", 4242)
+        with patch("service.config.METRICS_DIR", ""), \
+                patch("service.common.metrics.archive_worker") as archive_worker:
+            conf["child_exit"](MagicMock(), worker)
+        archive_worker.assert_not_called()
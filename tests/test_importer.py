@@ -0,0 +1,85 @@
+"""
+Test cases for the Product Importer
+"""
+import os
+import csv
+import gzip
+import json
+from service.models import Product
+from service.common import importer
+from tests.base import FileDatabaseTestCase
+
+HEADER = ["name", "description", "price", "available", "category"]
+
+
+class TestImporter(FileDatabaseTestCase):
+    """Test Cases for loading catalog files"""
+
+    def write_csv(self, rows: list, name: str = "products.csv") -> str:
+        """Writes a CSV catalog file"""
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+        return path
+
+    def test_load_csv(self):
+        """It should load a CSV file and reject the invalid rows by line number"""
+        rows = [[f"product {number}", "thing", "9.99", "true", "TOOLS"] for number in range(50)]
+        rows[10][2] = "free"
+        rows[20][4] = "TOYS"
+        rows[30][0] = "x" * 101
+        path = self.write_csv(rows)
+        stats = importer.load_file(path, batch_size=7)
+        self.assertEqual(stats.loaded, 47)
+        self.assertEqual(stats.rejected, 3)
+        self.assertEqual([item["line"] for item in stats.rejects], [12, 22, 32])
+        self.assertEqual(Product.query.count(), 47)
+        product = Product.find_by_name("product 0").first()
+        self.assertTrue(product.available)
+        self.assertEqual(product.version, 1)
+
+    def test_load_gzipped_jsonl(self):
+        """It should load a gzipped JSON Lines file"""
+        path = os.path.join(self.directory.name, "products.jsonl.gz")
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            for number in range(20):
+                file.write(json.dumps({"name": f"p{number}", "description": "d", "price": "1.00",
+                                       "available": number % 2 == 0, "category": "FOOD"}) + "\n")
+            file.write("\n{broken\n")
+            file.write(json.dumps({"name": "no price", "description": "d", "available": True}) + "\n")
+        stats = importer.load_file(path)
+        self.assertEqual(stats.loaded, 20)
+        self.assertEqual([item["line"] for item in stats.rejects], [22, 23])
+        self.assertEqual(Product.find_by_availability(False).count(), 10)
+
+    def test_load_in_parallel(self):
+        """It should split a file across worker processes"""
+        rows = [[f"product {number}", "thing", "1.50", "no", "CLOTHS"] for number in range(400)]
+        rows[333][3] = "maybe"
+        path = self.write_csv(rows)
+        stats = importer.load_file(path, batch_size=50, workers=3)
+        self.assertEqual(stats.loaded, 399)
+        self.assertEqual(stats.rejects, [{"line": 335, "message": "Invalid type for boolean [available]: <class 'str'>"}])
+        self.assertEqual(Product.query.count(), 399)
+        self.assertEqual(len({product.name for product in Product.all()}), 399)
+
+    def test_split(self):
+        """It should split a file into ranges that cover it"""
+        path = self.write_csv([["a", "b", "1", "true", "FOOD"]] * 10)
+        ranges = importer.split(path, 10, 3)
+        self.assertEqual(ranges[0][0], 10)
+        self.assertEqual(ranges[-1][1], os.path.getsize(path))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+
+    def test_cli(self):
+        """It should load a file with flask load-products"""
+        path = self.write_csv([["hammer", "tool", "5", "yes", "TOOLS"], ["bad", "tool", "5", "yes", "NONE"]])
+        rejects = os.path.join(self.directory.name, "rejects.jsonl")
+        result = self.app.test_cli_runner().invoke(args=["load-products", path, "--rejects", rejects])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Loaded 1 products, rejected 1", result.output)
+        with open(rejects, encoding="utf-8") as file:
+            self.assertEqual(json.loads(file.readline())["line"], 3)
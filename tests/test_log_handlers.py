@@ -0,0 +1,112 @@
+"""
+Test cases for the Log Handlers
+"""
+import json
+import queue
+import logging
+from unittest import TestCase
+from service import create_app
+from service.common import log_handlers, status
+from service.common.log_handlers import (
+    DroppingQueueHandler, JsonFormatter, SamplingFilter, parse_settings
+)
+from service.models import Product
+
+
+class ListHandler(logging.Handler):
+    """A handler that keeps the messages it is given"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+def make_record(level=logging.INFO, msg="hello %s", args=("world",)):
+    """Returns a log record"""
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+class TestLogHandlers(TestCase):
+    """Test Cases for the logging setup"""
+
+    def tearDown(self):
+        log_handlers.stop_listener()
+
+    def test_json_formatter(self):
+        """It should format a record as JSON"""
+        data = json.loads(JsonFormatter().format(make_record()))
+        self.assertEqual(data["message"], "hello world")
+        self.assertEqual(data["level"], "INFO")
+        self.assertEqual(data["logger"], "test")
+
+    def test_queue_handler_merges_message(self):
+        """It should merge the arguments of a record when it is logged, not when it is written"""
+        handler = DroppingQueueHandler(queue.Queue())
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+        names = ["world"]
+        record = make_record(args=(names,))
+        handler.handle(record)
+        names.append("later")
+        queued = handler.queue.get_nowait()
+        self.assertEqual(queued.msg, "hello ['world']")
+        self.assertIsNone(queued.args)
+        # the rest of the formatting is left to the listener
+        self.assertFalse(hasattr(queued, "asctime"))
+        self.assertEqual(record.args, (names,))
+
+    def test_queue_handler_drops_when_full(self):
+        """It should drop records instead of blocking when the queue is full"""
+        handler = DroppingQueueHandler(queue.Queue(1))
+        handler.handle(make_record())
+        handler.handle(make_record())
+        self.assertEqual(handler.dropped, 1)
+
+    def test_listener_writes_records(self):
+        """It should write queued records from the listener thread"""
+        target = ListHandler()
+        logger = logging.getLogger("test.listener")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.handlers = [log_handlers.start_listener([target])]
+        logger.info("one %d", 1)
+        log_handlers.stop_listener()
+        self.assertEqual(target.messages, ["one 1"])
+
+    def test_sampling(self):
+        """It should drop the INFO records that are not sampled but keep warnings"""
+        sampler = SamplingFilter(rate=0.0)
+        self.assertFalse(sampler.filter(make_record()))
+        self.assertTrue(sampler.filter(make_record(logging.WARNING)))
+
+    def test_rate_limit(self):
+        """It should keep at most so many INFO records a second"""
+        limiter = SamplingFilter(per_second=2)
+        kept = [limiter.filter(make_record()) for _ in range(5)]
+        self.assertLessEqual(kept.count(True), 4)  # the second may roll over once
+        self.assertIn(False, kept)
+
+    def test_sampling_route_logs(self):
+        """It should sample the INFO lines that the routes log to the service logger"""
+        app = create_app(overrides={
+            "TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "SQLALCHEMY_ENGINE_OPTIONS": {},
+            "LOG_ASYNC": False, "LOG_SAMPLE_RATES": "service:0",
+        })
+        self.assertEqual(app.logger.name, "service")
+        self.addCleanup(setattr, app.logger, "filters", [])
+        target = ListHandler()
+        app.logger.handlers = [target]
+        app.logger.setLevel(logging.INFO)
+        Product.create_tables(app)
+        response = app.test_client().get("/products/0")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # only the warning of the 404 is left
+        self.assertEqual(len(target.messages), 1)
+        self.assertIn("was not found", target.messages[0])
+
+    def test_parse_settings(self):
+        """It should parse logger settings"""
+        self.assertEqual(parse_settings("flask.app:0.5, flask.app.sql:1", float), {"flask.app": 0.5, "flask.app.sql": 1.0})
+        self.assertEqual(parse_settings("", int), {})
@@ -0,0 +1,134 @@
+"""
+Test cases for the Request Metrics
+"""
+import os
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+from flask import Flask
+from service.common.metrics import ARCHIVE, Metrics, archive_worker, init_metrics, read_file, worker_path, write_file
+
+
+class TestMetrics(TestCase):
+    """Test Cases for Metrics"""
+
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_record_requests(self):
+        """It should count requests and histogram their latency and size"""
+        self.metrics.observe("GET", "/products", 200, 0.003, 50)
+        self.metrics.observe("GET", "/products", 200, 0.2, 5000)
+        self.metrics.observe("GET", "/products", 304, 0.001, 0)
+        text = self.metrics.render()
+        self.assertIn('http_requests_total{method="GET",route="/products",status="200"} 2', text)
+        self.assertIn('http_requests_total{method="GET",route="/products",status="304"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/products",le="0.005"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/products",le="+Inf"} 3', text)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/products"} 3', text)
+        self.assertIn('http_response_size_bytes_bucket{method="GET",route="/products",le="100"} 2', text)
+        self.assertIn('http_response_size_bytes_sum{method="GET",route="/products"} 5050', text)
+
+    def test_threads_are_summed(self):
+        """It should sum what every thread recorded"""
+        def work():
+            for _ in range(100):
+                self.metrics.observe("POST", "/products", 201, 0.01, 10)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        totals = self.metrics.collect()
+        self.assertEqual(totals["requests"][("POST", "/products", "201")], 400)
+
+    def test_ended_threads_are_retired(self):
+        """It should fold the shards of threads that ended into the retired totals"""
+        def work():
+            self.metrics.observe("GET", "/products", 200, 0.01, 10)
+
+        for _ in range(50):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        self.assertEqual(self.metrics.collect()["requests"][("GET", "/products", "200")], 50)
+        # only the shard of this thread is left
+        self.assertEqual(len(self.metrics._shards), 1)  # pylint: disable=protected-access
+        self.metrics.observe("GET", "/products", 200, 0.01, 10)
+        totals = self.metrics.collect()
+        self.assertEqual(totals["requests"][("GET", "/products", "200")], 51)
+        self.assertAlmostEqual(totals["latency"][("GET", "/products")][-1], 0.51)
+
+    def test_in_flight(self):
+        """It should report requests that have not finished"""
+        self.metrics.started()
+        self.metrics.started()
+        self.metrics.finished()
+        self.assertIn("http_requests_in_flight 1", self.metrics.render())
+
+    def test_sum_workers(self):
+        """It should add the totals that other workers wrote"""
+        with tempfile.TemporaryDirectory() as directory:
+            self.metrics.directory = directory
+            self.metrics.observe("GET", "/", 200, 0.01, 10)
+            self.metrics.dump()
+            # pretend the file came from another live worker
+            own = os.path.join(directory, f"metrics-{os.getpid()}.json")
+            with open(own, encoding="utf-8") as file:
+                data = file.read().replace(f'"pid": {os.getpid()}', f'"pid": {os.getppid()}')
+            with open(os.path.join(directory, f"metrics-{os.getppid()}.json"), "w", encoding="utf-8") as file:
+                file.write(data)
+            totals = self.metrics.collect_all()
+            self.assertEqual(totals["requests"][("GET", "/", "200")], 2)
+            self.assertEqual(totals["latency"][("GET", "/")][-1], 0.02)
+
+    def write_worker(self, directory: str, pid: int, token: str):
+        """Writes the file of another worker with what this one recorded"""
+        self.metrics.dump()
+        data = read_file(worker_path(directory, os.getpid()))
+        os.remove(worker_path(directory, os.getpid()))
+        data.update(pid=pid, token=token)
+        write_file(worker_path(directory, pid), data)
+
+    def test_archive_worker(self):
+        """It should fold the file of a worker that exited into the archive"""
+        with tempfile.TemporaryDirectory() as directory:
+            self.metrics.directory = directory
+            self.metrics.observe("GET", "/", 200, 0.01, 10)
+            self.write_worker(directory, 999999, "first")
+            self.write_worker(directory, 999998, "second")
+            self.assertEqual(self.metrics.collect_all()["requests"][("GET", "/", "200")], 3)
+
+            self.assertTrue(archive_worker(directory, 999999))
+            self.assertFalse(os.path.exists(worker_path(directory, 999999)))
+            self.assertEqual(self.metrics.collect_all()["requests"][("GET", "/", "200")], 3)
+            self.assertEqual(self.metrics.collect_all()["latency"][("GET", "/")][-1], 0.03)
+            self.assertFalse(archive_worker(directory, 999999))
+
+            # a scrape between the write of the archive and the removal counts the worker once
+            with patch("os.remove"):
+                archive_worker(directory, 999998)
+            self.assertEqual(self.metrics.collect_all()["requests"][("GET", "/", "200")], 3)
+            os.remove(worker_path(directory, 999998))
+            self.assertEqual(sorted(os.listdir(directory)), [ARCHIVE])
+            self.assertEqual(read_file(os.path.join(directory, ARCHIVE))["absorbed"], ["second"])
+
+    def test_flask_middleware(self):
+        """It should record the requests a Flask app handles"""
+        app = Flask(__name__)
+        init_metrics(app, self.metrics)
+
+        @app.route("/items/<int:item_id>")
+        def get_item(item_id):
+            return {"id": item_id}
+
+        client = app.test_client()
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+        totals = self.metrics.collect()
+        self.assertEqual(totals["requests"][("GET", "/items/<int:item_id>", "200")], 2)
+        self.assertEqual(totals["requests"][("GET", "unmatched", "404")], 1)
+        self.assertEqual(totals["in_flight"], 0)
@@ -24,11 +24,16 @@ While debugging just these tests it's convenient to use this:
 
 """
 import os
+import time
 import logging
 import unittest
 from decimal import Decimal
-from service.models import Product, Category, db
-from service import app
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from sqlalchemy import update
+from service.models import Product, Category, DataValidationError, db, to_timestamp, encode_cursor, decode_cursor
+from service import create_app
+from service.common.cache import LRUCache
 from tests.factories import ProductFactory
 
 DATABASE_URI = os.getenv(
@@ -36,6 +41,16 @@ DATABASE_URI = os.getenv(
 )
 
 
+class PreZuluDatetime(datetime):
+    """A datetime whose fromisoformat() rejects a Z like it does before Python 3.11"""
+
+    @classmethod
+    def fromisoformat(cls, date_string):
+        if date_string.endswith(("Z", "z")):
+            raise ValueError(f"Invalid isoformat string: {date_string!r}")
+        return super().fromisoformat(date_string)
+
+
 ######################################################################
 #  P R O D U C T   M O D E L   T E S T   C A S E S
 ######################################################################
@@ -46,21 +61,27 @@ class TestProductModel(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """This runs once before the entire test suite"""
-        app.config["TESTING"] = True
-        app.config["DEBUG"] = False
-        app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
-        app.logger.setLevel(logging.CRITICAL)
-        Product.init_db(app)
+        cls.app = create_app(overrides={
+            "TESTING": True,
+            "DEBUG": False,
+            "SQLALCHEMY_DATABASE_URI": DATABASE_URI,
+        })
+        cls.app.logger.setLevel(logging.CRITICAL)
+        Product.create_tables(cls.app)
+        cls.context = cls.app.app_context()
+        cls.context.push()
 
     @classmethod
     def tearDownClass(cls):
         """This runs once after the entire test suite"""
         db.session.close()
+        cls.context.pop()
 
     def setUp(self):
         """This runs before each test"""
         db.session.query(Product).delete()  # clean up the last tests
         db.session.commit()
+        Product.cache.clear()
 
     def tearDown(self):
         """This runs after each test"""
@@ -101,6 +122,201 @@ class TestProductModel(unittest.TestCase):
         self.assertEqual(new_product.available, product.available)
         self.assertEqual(new_product.category, product.category)
 
+    def test_update_without_reading(self):
+        """It should Update and Delete a Product that was never loaded"""
+        product = ProductFactory()
+        product.create()
+        version = product.version
+        changed = Product(id=product.id, name="Changed", description=product.description,
+                          price=product.price, available=product.available, category=product.category)
+        self.assertTrue(changed.update())
+        self.assertEqual(changed.version, version + 1)
+        self.assertEqual(Product.find(product.id).name, "Changed")
+        self.assertTrue(Product(id=product.id).delete())
+        self.assertFalse(Product(id=product.id).delete())
+        self.assertFalse(changed.update())
+        self.assertIsNone(Product.find(product.id))
+
+    def test_ids_are_not_reused(self):
+        """It should not give a new Product the id of a deleted one"""
+        product = ProductFactory()
+        product.create()
+        deleted_id = product.id
+        product.delete()
+        product = ProductFactory()
+        product.create()
+        self.assertGreater(product.id, deleted_id)
+
+    def test_timestamps(self):
+        """It should set created_at on create and move updated_at on every update"""
+        product = ProductFactory()
+        product.create()
+        self.assertIsNotNone(product.created_at)
+        self.assertGreaterEqual(product.updated_at, product.created_at)
+        created_at, updated_at = product.created_at, product.updated_at
+        # the database clock of SQLite has milliseconds
+        time.sleep(0.002)
+        product.name = "Changed"
+        product.update()
+        self.assertEqual(product.created_at, created_at)
+        self.assertGreater(product.updated_at, updated_at)
+
+    def test_to_timestamp(self):
+        """It should parse ISO 8601 times and epoch seconds into UTC"""
+        self.assertEqual(to_timestamp("2023-05-01T12:00:00Z"), datetime(2023, 5, 1, 12))
+        self.assertEqual(to_timestamp("2023-05-01T14:00:00+02:00"), datetime(2023, 5, 1, 12))
+        self.assertEqual(to_timestamp("2023-05-01 12:00:00"), datetime(2023, 5, 1, 12))
+        self.assertEqual(to_timestamp("0"), datetime(1970, 1, 1))
+        for value in ("yesterday", "", "1e400"):
+            self.assertRaises(DataValidationError, to_timestamp, value)
+
+    @patch("service.models.datetime", new=PreZuluDatetime)
+    def test_zulu_before_python_3_11(self):
+        """It should parse a trailing Z where fromisoformat() does not"""
+        for value in ("2023-05-01T12:00:00Z", "2023-05-01T12:00:00z", "2023-05-01T12:00:00+00:00"):
+            self.assertEqual(to_timestamp(value), datetime(2023, 5, 1, 12))
+        for key in ("2023-05-01T12:00:00.500000Z", "2023-05-01T12:00:00.500000+00:00"):
+            cursor = encode_cursor("updated_at", key, 7)
+            self.assertEqual(decode_cursor(cursor, "updated_at"), (datetime(2023, 5, 1, 12, 0, 0, 500000), 7))
+
+    def test_create_many_products(self):
+        """It should Create many Products in one transaction"""
+        products = [ProductFactory().serialize() for _ in range(10)]
+        products[3]["price"] = None
+        ids, errors = Product.create_many(products, chunk_size=4)
+        self.assertEqual(len(ids), 9)
+        self.assertEqual(len(set(ids)), 9)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]["index"], 3)
+        self.assertEqual(len(Product.all()), 9)
+        valid = products[:3] + products[4:]
+        for product_id, data in zip(ids, valid):
+            self.assertEqual(Product.find(product_id).name, data["name"])
+
+    def test_create_many_checks_lengths(self):
+        """It should reject the items of a bulk create that do not fit in the columns"""
+        products = [ProductFactory().serialize() for _ in range(3)]
+        products[1]["name"] = "x" * 101
+        products[2]["description"] = 7
+        ids, errors = Product.create_many(products)
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(errors, [
+            {"index": 1, "message": "Invalid name: longer than 100 characters"},
+            {"index": 2, "message": "Invalid description: not a string"},
+        ])
+
+    def test_create_many_pairs_ids(self):
+        """It should pair the ids with the items whatever order RETURNING uses"""
+        products = [ProductFactory().serialize() for _ in range(6)]
+        execute = db.session.execute
+
+        def reversed_returning(statement, params=None):
+            returned = execute(statement, params).scalars().all()
+            result = MagicMock()
+            result.scalars.return_value.all.return_value = returned[::-1]
+            return result
+
+        with patch.object(db.session, "execute", side_effect=reversed_returning):
+            ids, _ = Product.create_many(products, chunk_size=4)
+        self.assertEqual([Product.find(product_id).name for product_id in ids], [data["name"] for data in products])
+
+    def test_find_by_filters(self):
+        """It should Find Products that match all of the filters"""
+        products = ProductFactory.create_batch(20)
+        for product in products:
+            product.id = None
+            product.create()
+        category = products[0].category
+        available = products[0].available
+        expected = [p for p in products if p.category == category and p.available == available]
+        found = Product.find_by_filters(category=category, available=available).all()
+        self.assertEqual(len(found), len(expected))
+        for product in found:
+            self.assertEqual(product.category, category)
+            self.assertEqual(product.available, available)
+
+        found = Product.find_by_filters(name=products[0].name, price=str(products[0].price)).all()
+        self.assertIn(products[0].id, [product.id for product in found])
+        self.assertEqual(Product.find_by_filters().count(), 20)
+        self.assertRaises(DataValidationError, Product.find_by_filters, price="free")
+
+    def test_filter_indexes(self):
+        """It should declare indexes for the filtered columns"""
+        indexes = {tuple(column.name for column in index.columns) for index in Product.__table__.indexes}
+        self.assertIn(("category", "available"), indexes)
+        self.assertIn(("name", "id"), indexes)
+        self.assertIn(("price", "id"), indexes)
+
+    def test_find_uses_cache(self):
+        """It should Find a Product from the cache after the first read"""
+        product = ProductFactory()
+        product.create()
+        db.session.expunge_all()
+        before = Product.cache.stats()
+        found = Product.find(product.id)
+        self.assertEqual(found.name, product.name)
+        self.assertEqual(Product.cache.stats()["misses"], before["misses"] + 1)
+        db.session.expunge_all()
+        found = Product.find(product.id)
+        self.assertEqual(Product.cache.stats()["hits"], before["hits"] + 1)
+        self.assertEqual(found.name, product.name)
+        self.assertEqual(found.category, product.category)
+        self.assertEqual(Decimal(found.price), product.price)
+        # a cached copy can still be updated
+        found.description = "from the cache"
+        found.update()
+        db.session.expunge_all()
+        self.assertEqual(Product.find(product.id).description, "from the cache")
+
+    def test_write_invalidates_cache(self):
+        """It should drop a Product from the cache when it changes"""
+        product = ProductFactory()
+        product.create()
+        Product.find(product.id)
+        self.assertEqual(Product.cache.stats()["size"], 1)
+        product.name = "Renamed"
+        product.update()
+        self.assertEqual(Product.cache.stats()["size"], 0)
+        self.assertEqual(Product.find(product.id).name, "Renamed")
+        product.delete()
+        self.assertEqual(Product.cache.stats()["size"], 0)
+        self.assertIsNone(Product.find(product.id))
+
+    def test_find_during_write(self):
+        """It should not cache a row read before a write that commits during the read"""
+        product = ProductFactory()
+        product.create()
+        db.session.expunge_all()
+        get = db.session.get
+
+        def read_then_write(model, ident):
+            found = get(model, ident)
+            # another request commits a write and invalidates before this one stores the row
+            Product.invalidate(ident)
+            return found
+
+        with patch.object(db.session, "get", side_effect=read_then_write):
+            Product.find(product.id)
+        self.assertEqual(Product.cache.stats()["size"], 0)
+
+    def test_staleness_bound_across_workers(self):
+        """It should see the write of another worker when the cached row expires"""
+        clock = [0.0]
+        self.addCleanup(setattr, Product, "cache", Product.cache)
+        Product.cache = LRUCache(ttl=30, timer=lambda: clock[0])
+        product = ProductFactory()
+        product.create()
+        self.assertEqual(Product.find(product.id).name, product.name)
+        # another worker does not invalidate the cache of this one
+        db.session.execute(update(Product).where(Product.id == product.id).values(name="Elsewhere"))
+        db.session.commit()
+        db.session.expunge_all()
+        clock[0] = 29.9
+        self.assertEqual(Product.find(product.id).name, product.name)
+        db.session.expunge_all()
+        clock[0] = 30.0
+        self.assertEqual(Product.find(product.id).name, "Elsewhere")
+
     #
     # ADD YOUR TEST CASES HERE
     #
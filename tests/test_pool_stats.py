@@ -0,0 +1,54 @@
+"""
+Test cases for the connection Pool Statistics
+"""
+from unittest import TestCase
+from sqlalchemy import create_engine, exc, text
+from service.common.pool_stats import POOL_STATS, PoolStats, TimedQueuePool, instrument, pool_status
+
+
+class TestPoolStats(TestCase):
+    """Test Cases for PoolStats and TimedQueuePool"""
+
+    def setUp(self):
+        POOL_STATS.reset()
+        self.engine = create_engine(
+            "sqlite://", poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05
+        )
+        instrument(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_wait_histogram(self):
+        """It should count waits in cumulative buckets"""
+        stats = PoolStats(buckets=(0.01, 0.1))
+        for seconds in (0.001, 0.05, 0.05, 3):
+            stats.observe_wait(seconds)
+        wait = stats.snapshot()["wait_seconds"]
+        self.assertEqual(wait["buckets"], {"0.01": 1, "0.1": 3, "+Inf": 4})
+        self.assertEqual(wait["count"], 4)
+        self.assertAlmostEqual(wait["sum"], 3.101)
+
+    def test_pool_status(self):
+        """It should report connections checked out of the pool"""
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            status = pool_status(self.engine)
+            self.assertEqual(status["pool"], "TimedQueuePool")
+            self.assertEqual(status["size"], 1)
+            self.assertEqual(status["checked_out"], 1)
+        status = pool_status(self.engine)
+        self.assertEqual(status["checked_out"], 0)
+        self.assertEqual(status["connects"], 1)
+        self.assertEqual(status["checkouts"], 1)
+        self.assertEqual(status["checkins"], 1)
+        self.assertEqual(status["wait_seconds"]["count"], 1)
+
+    def test_pool_timeout(self):
+        """It should count checkouts that time out"""
+        with self.engine.connect():
+            self.assertRaises(exc.TimeoutError, self.engine.connect)
+        status = pool_status(self.engine)
+        self.assertEqual(status["timeouts"], 1)
+        self.assertEqual(status["wait_seconds"]["count"], 2)
+        self.assertGreaterEqual(status["wait_seconds"]["sum"], 0.05)
@@ -0,0 +1,59 @@
+"""
+Test cases for the SQL Query Statistics
+"""
+from unittest import TestCase
+from unittest.mock import patch
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from service.common import query_stats
+
+
+class TestQueryStats(TestCase):
+    """Test Cases for query_stats"""
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        query_stats.instrument(self.engine, threshold=0.0)
+
+    def tearDown(self):
+        query_stats.end()
+        self.engine.dispose()
+
+    def test_count_queries(self):
+        """It should count and time the statements of a unit of work"""
+        query_stats.begin()
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT :a + :b"), {"a": 1, "b": 2})
+        stats = query_stats.end()
+        self.assertEqual(stats.count, 2)
+        self.assertGreater(stats.seconds, 0)
+        self.assertIsNone(query_stats.current())
+
+    def test_failed_query(self):
+        """It should not keep the start of a statement that failed"""
+        with self.engine.connect() as connection:
+            for _ in range(3):
+                self.assertRaises(OperationalError, connection.execute, text("SELECT * FROM missing"))
+            self.assertEqual(connection.info["query_start"], [])
+            connection.execute(text("SELECT 1"))
+            self.assertEqual(connection.info["query_start"], [])
+
+    def test_slow_query_log(self):
+        """It should log slow statements with the shape of their parameters"""
+        with patch.object(query_stats.logger, "warning") as warning:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT :name"), {"name": "secret"})
+        args = warning.call_args[0]
+        self.assertIn("SELECT ?", args[2])
+        self.assertNotIn("secret", str(args))
+        self.assertEqual(args[3], ["str"])
+
+    def test_parameter_shape(self):
+        """It should describe parameters without their values"""
+        self.assertEqual(query_stats.parameter_shape({"id": 1, "name": "x"}), {"id": "int", "name": "str"})
+        self.assertEqual(query_stats.parameter_shape((1, 2.5)), ["int", "float"])
+        self.assertEqual(
+            query_stats.parameter_shape([{"id": 1}, {"id": 2}], executemany=True),
+            {"rows": 2, "row": {"id": "int"}},
+        )
@@ -25,12 +25,17 @@ Test cases can be run with the following:
     nosetests --stop tests/test_service.py:TestProductService
 """
 import os
+import zlib
+import gzip
+import json
 import logging
 from decimal import Decimal
+from urllib.parse import quote_plus
 from unittest import TestCase
-from service import app
+from flask import current_app
+from service import create_app
 from service.common import status
-from service.models import db, init_db, Product
+from service.models import db, Product, Category, db_utcnow
 from tests.factories import ProductFactory
 
 # Disable all but critical errors during normal test run
@@ -54,23 +59,29 @@ class TestProductRoutes(TestCase):
     @classmethod
     def setUpClass(cls):
         """Run once before all tests"""
-        app.config["TESTING"] = True
-        app.config["DEBUG"] = False
-        # Set up the test database
-        app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
-        app.logger.setLevel(logging.CRITICAL)
-        init_db(app)
+        cls.app = create_app(overrides={
+            "TESTING": True,
+            "DEBUG": False,
+            # Set up the test database
+            "SQLALCHEMY_DATABASE_URI": DATABASE_URI,
+        })
+        cls.app.logger.setLevel(logging.CRITICAL)
+        Product.create_tables(cls.app)
+        cls.context = cls.app.app_context()
+        cls.context.push()
 
     @classmethod
     def tearDownClass(cls):
         """Run once after all tests"""
         db.session.close()
+        cls.context.pop()
 
     def setUp(self):
         """Runs before each test"""
-        self.client = app.test_client()
+        self.client = self.app.test_client()
         db.session.query(Product).delete()  # clean up the last tests
         db.session.commit()
+        Product.cache.clear()
 
     def tearDown(self):
         db.session.remove()
@@ -108,6 +119,39 @@ class TestProductRoutes(TestCase):
         data = response.get_json()
         self.assertEqual(data['message'], 'OK')
 
+    def test_metrics(self):
+        """It should return request metrics in the Prometheus format"""
+        self.client.get(BASE_URL)
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.mimetype, "text/plain")
+        text = response.get_data(as_text=True)
+        self.assertIn('http_requests_total{method="GET",route="/products",status="200"}', text)
+        self.assertIn("http_requests_in_flight 1", text)
+
+    def test_query_headers(self):
+        """It should report the SQL statements of each request in test mode"""
+        product = self._create_products()[0]
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertIn("X-DB-Queries", response.headers)
+        self.assertTrue(response.headers["X-DB-Time"].endswith("ms"))
+        # the second read is served from the Product cache
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.headers["X-DB-Queries"], "0")
+        # a page and its validator are one query
+        response = self.client.get(BASE_URL)
+        self.assertEqual(response.headers["X-DB-Queries"], "1")
+
+    def test_pool_health(self):
+        """It should report the state of the connection pool"""
+        self.client.get(BASE_URL)
+        response = self.client.get("/health/pool")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertIn("pool", data)
+        self.assertGreater(data["checkouts"], 0)
+        self.assertIn("+Inf", data["wait_seconds"]["buckets"])
+
     # ----------------------------------------------------------
     # TEST CREATE
     # ----------------------------------------------------------
@@ -130,19 +174,25 @@ class TestProductRoutes(TestCase):
         self.assertEqual(new_product["available"], test_product.available)
         self.assertEqual(new_product["category"], test_product.category.name)
 
-        #
-        # Uncomment this code once READ is implemented
-        #
+        # Check that the location header was correct
+        response = self.client.get(location)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_product = response.get_json()
+        self.assertEqual(new_product["name"], test_product.name)
+        self.assertEqual(new_product["description"], test_product.description)
+        self.assertEqual(Decimal(new_product["price"]), test_product.price)
+        self.assertEqual(new_product["available"], test_product.available)
+        self.assertEqual(new_product["category"], test_product.category.name)
 
-        # # Check that the location header was correct
-        # response = self.client.get(location)
-        # self.assertEqual(response.status_code, status.HTTP_200_OK)
-        # new_product = response.get_json()
-        # self.assertEqual(new_product["name"], test_product.name)
-        # self.assertEqual(new_product["description"], test_product.description)
-        # self.assertEqual(Decimal(new_product["price"]), test_product.price)
-        # self.assertEqual(new_product["available"], test_product.available)
-        # self.assertEqual(new_product["category"], test_product.category.name)
+    def test_read_product_from_cache(self):
+        """It should Read a Product again from the cache"""
+        product = self._create_products()[0]
+        for _ in range(2):
+            response = self.client.get(f"{BASE_URL}/{product.id}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.get_json()["name"], product.name)
+        stats = self.client.get("/health").get_json()["cache"]
+        self.assertGreaterEqual(stats["hits"], 1)
 
     def test_create_product_with_no_name(self):
         """It should not Create a Product without a name"""
@@ -163,6 +213,124 @@ class TestProductRoutes(TestCase):
         response = self.client.post(BASE_URL, data={}, content_type="plain/text")
         self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
 
+    # ----------------------------------------------------------
+    # TEST UPDATE AND DELETE
+    # ----------------------------------------------------------
+    def test_update_product(self):
+        """It should Update an existing Product"""
+        product = self._create_products()[0]
+        data = product.serialize()
+        data["description"] = "unknown"
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updated = response.get_json()
+        self.assertEqual(updated["id"], product.id)
+        self.assertEqual(updated["description"], "unknown")
+
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.get_json()["description"], "unknown")
+
+    def test_update_product_if_match(self):
+        """It should only Update the version of a Product named by If-Match"""
+        product = self._create_products()[0]
+        etag = self.client.get(f"{BASE_URL}/{product.id}").headers["ETag"]
+        data = product.serialize()
+        data["description"] = "first"
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["X-DB-Queries"], "1")
+
+        # a second writer that read the same version does not overwrite the first
+        data["description"] = "second"
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(self.client.get(f"{BASE_URL}/{product.id}").get_json()["description"], "first")
+
+        # the weak ETag of a compressed response names the same version
+        etag = self.client.get(f"{BASE_URL}/{product.id}").headers["ETag"]
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data, headers={"If-Match": f"W/{etag}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data, headers={"If-Match": "*"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data, headers={"If-Match": '"other"'})
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.put(f"{BASE_URL}/999999", json=data, headers={"If-Match": '"999999-1"'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_product_not_found(self):
+        """It should not Update a Product that does not exist"""
+        data = ProductFactory().serialize()
+        response = self.client.put(f"{BASE_URL}/999999", json=data)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_product(self):
+        """It should Delete a Product"""
+        products = self._create_products(5)
+        response = self.client.delete(f"{BASE_URL}/{products[0].id}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(response.data), 0)
+        response = self.client.get(f"{BASE_URL}/{products[0].id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get_product_count(), 4)
+
+        response = self.client.delete(f"{BASE_URL}/{products[0].id}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_writes_make_one_round_trip(self):
+        """It should Create, Update and Delete with a single statement each"""
+        data = ProductFactory().serialize()
+        response = self.client.post(BASE_URL, json=data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.headers["X-DB-Queries"], "1")
+        product_id = response.get_json()["id"]
+
+        data["name"] = "Renamed"
+        response = self.client.put(f"{BASE_URL}/{product_id}", json=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["X-DB-Queries"], "1")
+        self.assertEqual(response.get_json()["name"], "Renamed")
+
+        response = self.client.delete(f"{BASE_URL}/{product_id}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response.headers["X-DB-Queries"], "1")
+
+    def test_create_products_in_bulk(self):
+        """It should Create many Products from a JSON array"""
+        products = [ProductFactory().serialize() for _ in range(25)]
+        response = self.client.post(BASE_URL, json=products)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.get_json()
+        self.assertEqual(data["errors"], [])
+        self.assertEqual(len(data["created"]), 25)
+        for product_id, product in zip(data["created"], products):
+            found = Product.find(product_id)
+            self.assertEqual(found.name, product["name"])
+            self.assertEqual(found.description, product["description"])
+
+    def test_create_products_in_bulk_with_errors(self):
+        """It should report the items it could not Create in bulk"""
+        products = [ProductFactory().serialize() for _ in range(3)]
+        del products[1]["name"]
+        products[2]["available"] = "yes"
+        response = self.client.post(BASE_URL, json=products)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        data = response.get_json()
+        self.assertEqual(len(data["created"]), 1)
+        self.assertEqual([error["index"] for error in data["errors"]], [1, 2])
+        self.assertEqual(len(Product.all()), 1)
+
+        response = self.client.post(BASE_URL, json=[{}, "bad data"])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.get_json()["errors"]), 2)
+
+        product = ProductFactory().serialize()
+        product["name"] = "x" * 101
+        response = self.client.post(BASE_URL, json=[product])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.get_json()["errors"], [
+            {"index": 0, "message": "Invalid name: longer than 100 characters"}
+        ])
+
     #
     # ADD YOUR TEST CASES HERE
     #
@@ -206,13 +374,13 @@ class TestProductRoutes(TestCase):
         This endpoint will return a Product based on it's id
         """
 
-        app.logger.info("Request to Retrieve a product with id [%s]", product_id)
+        current_app.logger.info("Request to Retrieve a product with id [%s]", product_id)
 
         product = Product.find(product_id)
         if not product:
             abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
 
-        app.logger.info("Returning product: %s", product.name)
+        current_app.logger.info("Returning product: %s", product.name)
         return product.serialize(), status.HTTP_200_OK
 
 
@@ -225,3 +393,331 @@ class TestProductRoutes(TestCase):
         data = response.get_json()
         self.assertIn("was not found", data["message"])
 
+
+    # ----------------------------------------------------------
+    # TEST LIST
+    # ----------------------------------------------------------
+    def _get_all_pages(self, url: str) -> list:
+        """Follows the next cursor until the last page and returns all rows"""
+        results = []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(response.get_json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                self.assertNotIn("Link", response.headers)
+                return results
+            self.assertIn('rel="next"', response.headers["Link"])
+            separator = "&" if "?" in url else "?"
+            response = self.client.get(f"{url}{separator}cursor={next_cursor}")
+
+    def test_list_products_in_pages(self):
+        """It should List all Products one page at a time"""
+        products = self._create_products(5)
+        response = self.client.get(f"{BASE_URL}?limit=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_json()), 2)
+        self.assertIn("X-Next-Cursor", response.headers)
+
+        data = self._get_all_pages(f"{BASE_URL}?limit=2")
+        ids = [product["id"] for product in data]
+        self.assertEqual(ids, sorted(product.id for product in products))
+
+    def test_list_products_sorted_by_price(self):
+        """It should page through filtered Products ordered by price"""
+        products = self._create_products(10)
+        available = [product for product in products if product.available]
+        data = self._get_all_pages(f"{BASE_URL}?available=true&sort=price&limit=3")
+        self.assertEqual(len(data), len(available))
+        prices = [Decimal(product["price"]) for product in data]
+        self.assertEqual(prices, sorted(prices))
+        for product in data:
+            self.assertTrue(product["available"])
+
+    def test_list_products_by_category(self):
+        """It should List Products filtered by category"""
+        products = self._create_products(10)
+        category = products[0].category
+        data = self._get_all_pages(f"{BASE_URL}?category={category.name}&limit=2")
+        expected = [product for product in products if product.category == category]
+        self.assertEqual(len(data), len(expected))
+        for product in data:
+            self.assertEqual(product["category"], category.name)
+
+    def test_list_products_with_combined_filters(self):
+        """It should List Products that match every filter given"""
+        products = self._create_products(20)
+        category = products[0].category
+        available = products[0].available
+        url = f"{BASE_URL}?category={category.name}&available={str(available).lower()}"
+        data = self._get_all_pages(url)
+        expected = [p for p in products if p.category == category and p.available == available]
+        self.assertEqual(len(data), len(expected))
+        for product in data:
+            self.assertEqual(product["category"], category.name)
+            self.assertEqual(product["available"], available)
+
+        response = self.client.get(f"{BASE_URL}?price=free")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_products_bad_paging(self):
+        """It should not List Products with a bad limit, sort or cursor"""
+        for query in ("limit=0", "limit=ten", "sort=description", "cursor=not-a-cursor", "category=GADGETS"):
+            response = self.client.get(f"{BASE_URL}?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+    def test_list_products_bad_sort(self):
+        """It should not List Products sorted by something that is not a sort key"""
+        self._create_products(1)
+        for sort in ("create", "query", "__class__", "version", "description"):
+            response = self.client.get(f"{BASE_URL}?sort={sort}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, sort)
+
+    def test_list_products_cursor_for_other_sort(self):
+        """It should not accept a cursor issued for another sort key"""
+        self._create_products(3)
+        response = self.client.get(f"{BASE_URL}?limit=1&sort=name")
+        next_cursor = response.headers["X-Next-Cursor"]
+        response = self.client.get(f"{BASE_URL}?limit=1&sort=price&cursor={next_cursor}")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_changed_products(self):
+        """It should List the Products changed since a time, with tombstones for deletes"""
+        self.app.config["DELTA_SETTLE_SECONDS"] = 0
+        self.addCleanup(self.app.config.update, DELTA_SETTLE_SECONDS=5)
+        old = self._create_products(2)
+        since = db_utcnow()
+        new = self._create_products(3)
+        data = old[0].serialize()
+        data["name"] = "Renamed"
+        self.assertEqual(self.client.put(f"{BASE_URL}/{old[0].id}", json=data).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.delete(f"{BASE_URL}/{new[0].id}").status_code, status.HTTP_204_NO_CONTENT)
+
+        rows = self._get_all_pages(f"{BASE_URL}?updated_since={since.isoformat()}Z&limit=2")
+        self.assertEqual(
+            [(row["id"], row["deleted"]) for row in rows],
+            [(new[1].id, False), (new[2].id, False), (old[0].id, False), (new[0].id, True)],
+        )
+        self.assertEqual(rows[2]["name"], "Renamed")
+        self.assertEqual(set(rows[3]), {"id", "deleted", "updated_at"})
+        # the next sync starts from the last updated_at and finds nothing new
+        response = self.client.get(f"{BASE_URL}?updated_since={rows[-1]['updated_at']}")
+        self.assertEqual(response.get_json(), [])
+        # seconds since the epoch work too
+        response = self.client.get(f"{BASE_URL}?updated_since={since.timestamp() - 3600}")
+        self.assertGreaterEqual(len(response.get_json()), 5)
+
+    def test_list_changed_products_settle(self):
+        """It should leave the changes of the last seconds for the next sync"""
+        since = db_utcnow()
+        self._create_products(1)
+        response = self.client.get(f"{BASE_URL}?updated_since={since.isoformat()}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), [])
+
+    def test_list_changed_products_bad_request(self):
+        """It should not List changed Products with a bad time or other filters"""
+        for query in ("updated_since=yesterday", "updated_since=0&category=FOOD", "updated_since=0&sort=name"):
+            response = self.client.get(f"{BASE_URL}?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+    def test_stream_products(self):
+        """It should stream all Products as NDJSON"""
+        products = self._create_products(5)
+        for kwargs in ({"path": f"{BASE_URL}?stream=1"},
+                       {"path": BASE_URL, "headers": {"Accept": "application/x-ndjson"}}):
+            response = self.client.get(**kwargs)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.mimetype, "application/x-ndjson")
+            lines = response.get_data(as_text=True).splitlines()
+            data = [json.loads(line) for line in lines]
+            self.assertEqual([row["id"] for row in data], [product.id for product in products])
+
+    def test_stream_products_with_filter(self):
+        """It should stream only the Products that match the filters"""
+        products = self._create_products(10)
+        name = products[0].name
+        response = self.client.get(f"{BASE_URL}?stream=1&name={quote_plus(name)}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(data), len([product for product in products if product.name == name]))
+        for row in data:
+            self.assertEqual(row["name"], name)
+
+    # ----------------------------------------------------------
+    # TEST CONDITIONAL GET
+    # ----------------------------------------------------------
+    def test_get_product_not_modified(self):
+        """It should return 304 when the client has the current Product"""
+        product = self._create_products()[0]
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+
+        response = self.client.get(f"{BASE_URL}/{product.id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(len(response.data), 0)
+
+        response = self.client.get(f"{BASE_URL}/{product.id}", headers={"If-Modified-Since": last_modified})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        found = Product.find(product.id)
+        found.description = "changed"
+        found.update()
+        response = self.client.get(f"{BASE_URL}/{product.id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.get_json()["description"], "changed")
+
+    def test_get_product_fields_etag(self):
+        """It should give a sparse fieldset an ETag of its own"""
+        product = self._create_products()[0]
+        full = self.client.get(f"{BASE_URL}/{product.id}").headers["ETag"]
+        response = self.client.get(f"{BASE_URL}/{product.id}?fields=name,id")
+        sparse = response.headers["ETag"]
+        self.assertNotEqual(sparse, full)
+        self.assertEqual(set(response.get_json()), {"id", "name"})
+        # the fields are normalized, so the order they are asked in does not matter
+        response = self.client.get(f"{BASE_URL}/{product.id}?fields=id,name", headers={"If-None-Match": sparse})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # the full ETag does not validate a sparse body, nor the other way around
+        response = self.client.get(f"{BASE_URL}/{product.id}?fields=id,name", headers={"If-None-Match": full})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f"{BASE_URL}/{product.id}", headers={"If-None-Match": sparse})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # every field is the full representation
+        response = self.client.get(f"{BASE_URL}/{product.id}?fields=id,name,description,price,available,category")
+        self.assertEqual(response.headers["ETag"], full)
+        # it still names the version for If-Match
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=product.serialize(), headers={"If-Match": sparse})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_products_not_modified(self):
+        """It should return 304 until any matching Product changes"""
+        products = self._create_products(3)
+        response = self.client.get(BASE_URL)
+        etag = response.headers["ETag"]
+        response = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(f"{BASE_URL}?limit=1", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        found = Product.find(products[1].id)
+        found.price = found.price + 1
+        found.update()
+        response = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.headers["ETag"]
+
+        Product.find(products[2].id).delete()
+        response = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_products_etag_of_page(self):
+        """It should make the ETag of a page from its rows, not from the whole table"""
+        self._create_products(3)
+        response = self.client.get(f"{BASE_URL}?limit=2")
+        etag = response.headers["ETag"]
+        # more Products after the page change neither its rows nor its cursor
+        self._create_products(20)
+        response = self.client.get(f"{BASE_URL}?limit=2", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers["X-DB-Queries"], "1")
+        self.assertEqual(self.client.get(f"{BASE_URL}?limit=2").headers["ETag"], etag)
+
+    def test_list_products_compressed(self):
+        """It should gzip large lists and still revalidate them"""
+        self._create_products(20)
+        plain = self.client.get(BASE_URL)
+        response = self.client.get(BASE_URL, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        etag = response.headers["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+        response = self.client.get(BASE_URL, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(f"{BASE_URL}?stream=true", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(len(gzip.decompress(response.data).splitlines()), 20)
+
+        # the rows of the first batch can be decoded before the next one is read
+        self.app.config["STREAM_BATCH_SIZE"] = 8
+        self.addCleanup(self.app.config.update, STREAM_BATCH_SIZE=1000)
+        response = self.client.get(f"{BASE_URL}?stream=true", headers={"Accept-Encoding": "gzip"}, buffered=False)
+        decoder = zlib.decompressobj(31)
+        first = decoder.decompress(next(response.response))
+        self.assertEqual(len(first.splitlines()), 8)
+        response.close()
+
+    # ----------------------------------------------------------
+    # TEST SPARSE FIELDSETS
+    # ----------------------------------------------------------
+    def test_list_products_with_fields(self):
+        """It should List only the requested fields of Products"""
+        products = self._create_products(5)
+        data = self._get_all_pages(f"{BASE_URL}?fields=name,price&sort=price&limit=2")
+        self.assertEqual(len(data), 5)
+        for row in data:
+            self.assertEqual(set(row), {"name", "price"})
+        self.assertEqual(sorted(row["name"] for row in data), sorted(p.name for p in products))
+
+        response = self.client.get(f"{BASE_URL}?fields=id,description&stream=1")
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([row["id"] for row in rows], [p.id for p in products])
+        for row in rows:
+            self.assertEqual(set(row), {"id", "description"})
+
+    def test_get_product_with_fields(self):
+        """It should Read only the requested fields of a Product"""
+        product = self._create_products()[0]
+        response = self.client.get(f"{BASE_URL}/{product.id}?fields=id,available")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), {"id": product.id, "available": product.available})
+
+    def test_bad_fields(self):
+        """It should not accept fields that Products do not have"""
+        product = self._create_products()[0]
+        for url in (f"{BASE_URL}?fields=id,color", f"{BASE_URL}/{product.id}?fields=secret"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # ----------------------------------------------------------
+    # TEST STATISTICS
+    # ----------------------------------------------------------
+    def test_product_stats(self):
+        """It should return aggregate statistics of the Products"""
+        products = self._create_products(20)
+        response = self.client.get(f"{BASE_URL}/stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(data["count"], 20)
+        available = len([product for product in products if product.available])
+        self.assertEqual(data["availability"], {"available": available, "unavailable": 20 - available})
+        for category in Category:
+            expected = len([product for product in products if product.category == category])
+            self.assertEqual(data["categories"][category.name], expected)
+        prices = [product.price for product in products]
+        self.assertEqual(Decimal(data["price"]["min"]), min(prices))
+        self.assertEqual(Decimal(data["price"]["max"]), max(prices))
+        average = (sum(prices) / len(prices)).quantize(Decimal("0.01"))
+        self.assertEqual(Decimal(data["price"]["avg"]), average)
+
+    def test_product_stats_with_filters(self):
+        """It should return statistics of only the filtered Products"""
+        products = self._create_products(10)
+        category = products[0].category
+        response = self.client.get(f"{BASE_URL}/stats?category={category.name}&available=true")
+        data = response.get_json()
+        expected = [p for p in products if p.category == category and p.available]
+        self.assertEqual(data["count"], len(expected))
+        self.assertEqual(data["availability"]["unavailable"], 0)
+
+        response = self.client.get(f"{BASE_URL}/stats?name=nothing-has-this-name")
+        data = response.get_json()
+        self.assertEqual(data["count"], 0)
+        self.assertEqual(data["price"], {"min": None, "max": None, "avg": None})
@@ -0,0 +1,57 @@
+"""
+Test cases for the Catalog Seeder
+"""
+from collections import Counter
+from service.models import Product, Category, db
+from service.common import seeder
+from tests.base import FileDatabaseTestCase
+
+
+class TestSeeder(FileDatabaseTestCase):
+    """Test Cases for generating synthetic Products"""
+
+    def test_deterministic(self):
+        """It should draw the same batches for the same seed"""
+        self.assertEqual(seeder.Generator(7).batch(3, 100), seeder.Generator(7).batch(3, 100))
+        self.assertNotEqual(seeder.Generator(7).batch(3, 100), seeder.Generator(8).batch(3, 100))
+        self.assertNotEqual(seeder.Generator(7).batch(3, 100), seeder.Generator(7).batch(4, 100))
+
+    def test_valid_rows(self):
+        """It should draw rows that deserialize as Products"""
+        for row in seeder.Generator().batch(0, 200):
+            data = dict(row, price=str(row["price"]), category=row["category"].name)
+            Product().deserialize(data)
+            self.assertGreater(row["price"], 0)
+            self.assertEqual(row["price"], round(row["price"], 2))
+
+    def test_skew(self):
+        """It should skew categories by rank, or draw them uniformly with a skew of 0"""
+        skewed = Counter(row["category"] for row in seeder.Generator(skew=1.5).batch(0, 6000))
+        self.assertEqual(skewed.most_common(1)[0][0], Category.CLOTHS)
+        self.assertGreater(skewed[Category.CLOTHS], 4 * skewed[Category.UNKNOWN])
+        uniform = Counter(row["category"] for row in seeder.Generator(skew=0).batch(0, 6000))
+        self.assertLess(max(uniform.values()) - min(uniform.values()), 400)
+
+    def test_available_ratio(self):
+        """It should make the asked share of Products available"""
+        rows = seeder.Generator(available_ratio=0.25).batch(0, 4000)
+        self.assertAlmostEqual(sum(row["available"] for row in rows) / len(rows), 0.25, delta=0.03)
+
+    def test_seed_in_parallel(self):
+        """It should write the same catalog with one worker or several"""
+        stats = seeder.seed_products(1000, seed=5, batch_size=90)
+        self.assertEqual(stats.rows, 1000)
+        serial = sorted((p.name, p.price, p.available, p.category) for p in Product.all())
+        db.session.query(Product).delete()
+        db.session.commit()
+        stats = seeder.seed_products(1000, seed=5, batch_size=90, workers=3)
+        self.assertEqual(stats.rows, 1000)
+        parallel = sorted((p.name, p.price, p.available, p.category) for p in Product.all())
+        self.assertEqual(parallel, serial)
+
+    def test_cli(self):
+        """It should seed with flask seed-products"""
+        result = self.app.test_cli_runner().invoke(args=["seed-products", "--count", "250", "--batch-size", "100"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Seeded 250 products", result.output)
+        self.assertEqual(Product.query.count(), 250)
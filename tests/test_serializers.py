@@ -0,0 +1,71 @@
+"""
+Test cases for the Product Serializers
+"""
+from decimal import Decimal
+from unittest import TestCase
+from service import create_app
+from service.models import Product, Category, DataValidationError
+from service.common.serializers import COLUMNS, ProductEncoder, parse_fields
+from tests.factories import ProductFactory
+
+
+def as_row(product: Product) -> tuple:
+    """Returns the row tuple of a Product"""
+    return tuple(getattr(product, name) for name in COLUMNS)
+
+
+class TestProductEncoder(TestCase):
+    """Test Cases for ProductEncoder"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app(overrides={
+            "TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:", "SQLALCHEMY_ENGINE_OPTIONS": {},
+        })
+
+    def setUp(self):
+        self.products = ProductFactory.build_batch(20)
+        self.products.append(
+            Product(id=999, name='Café "Noir" \\ 7\x7f', description="tab\tnew\nline ☃ \U0001F600",
+                    price=Decimal("0.10"), available=False, category=Category.FOOD)
+        )
+
+    def expected(self, products) -> bytes:
+        """Returns what jsonify() writes for a list of Products"""
+        return self.app.json.response([product.serialize() for product in products]).get_data()
+
+    def test_encode_list_like_jsonify(self):
+        """It should encode a list exactly like jsonify() with and without orjson"""
+        rows = [as_row(product) for product in self.products]
+        for use_orjson in (True, False):
+            encoder = ProductEncoder(COLUMNS, use_orjson)
+            self.assertEqual(encoder.encode_list(rows), self.expected(self.products))
+            self.assertEqual(encoder.encode_list(rows[:-1]), self.expected(self.products[:-1]))
+            self.assertEqual(encoder.encode_list([]), self.expected([]))
+
+    def test_encode_line(self):
+        """It should encode one row as a line of NDJSON"""
+        encoder = ProductEncoder.for_fields(COLUMNS)
+        for product in self.products:
+            line = encoder.encode_line(as_row(product))
+            self.assertTrue(line.endswith(b"\n"))
+            self.assertEqual(line[:-1], self.expected([product])[1:-2])
+
+    def test_encoders_are_shared(self):
+        """It should compile each set of fields only once"""
+        self.assertIs(ProductEncoder.for_fields(COLUMNS), ProductEncoder.for_fields(COLUMNS))
+
+    def test_encode_some_fields(self):
+        """It should write only the requested fields of wider rows"""
+        fields = ("name", "price")
+        rows = [as_row(product) for product in self.products]
+        for use_orjson in (True, False):
+            encoder = ProductEncoder(fields, use_orjson, COLUMNS)
+            expected = self.app.json.response([product.serialize(fields) for product in self.products]).get_data()
+            self.assertEqual(encoder.encode_list(rows), expected)
+
+    def test_parse_fields(self):
+        """It should parse a list of fields into COLUMNS order"""
+        self.assertEqual(parse_fields(None), COLUMNS)
+        self.assertEqual(parse_fields("price, id,price"), ("id", "price"))
+        self.assertRaises(DataValidationError, parse_fields, "id,weight")